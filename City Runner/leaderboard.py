@@ -0,0 +1,504 @@
+import asyncio
+import json
+import os
+import sys
+import time
+import bisect
+import logging
+import argparse
+import tempfile
+import random
+import socket
+import threading
+
+# Shared high-score table for a LAN of cabinets.
+#
+# Clients keep one TCP connection open and speak newline-delimited JSON:
+#   {"op": "submit", "scores": [{"arena": ..., "character": ..., "name": ..., "score": ...}, ...]}
+#   {"op": "top", "arena": ..., "character": ..., "k": 10}
+# Every request gets exactly one reply line, in order. Scores are appended to a
+# log on disk (one JSON entry per line) and the best LEADERBOARD_KEEP per
+# arena and character are kept sorted in memory, so top-K is a slice. Disk
+# writes are group-committed: whatever arrives while a write is in flight goes
+# out in the next one, and a submit is acknowledged once its line is written.
+
+LEADERBOARD_HOST = "0.0.0.0"
+LEADERBOARD_PORT = 7531
+LEADERBOARD_FILE = "leaderboard.jsonl"
+LEADERBOARD_KEEP = 1000
+MAX_LINE = 1 << 20
+MAX_NAME = 16
+
+logger = logging.getLogger("city_runner.leaderboard")
+
+def clean_entry(entry):
+    # A validated copy of a submitted score, or None if it is malformed
+    try:
+        arena = str(entry["arena"])
+        character = str(entry["character"])
+        score = int(entry["score"])
+        name = str(entry.get("name", ""))[:MAX_NAME]
+    except (KeyError, TypeError, ValueError):
+        return None
+    if score < 0 or not arena or not character:
+        return None
+    return {"arena": arena, "character": character, "name": name, "score": score}
+
+class LeaderboardServer:
+    def __init__(self, path=LEADERBOARD_FILE, keep=LEADERBOARD_KEEP):
+        self.path = path
+        self.keep = keep
+        # (arena, character) -> [(-score, sequence, name)] in ascending order
+        self.boards = {}
+        self.sequence = 0
+        self.pending = []
+        self.waiters = []
+        self.wakeup = None
+        self.file = None
+        self.submitted = 0
+        self.writes = 0
+
+    def load(self):
+        # Rebuild the index from the log, then rewrite the log with only the
+        # entries that are still on a board so it doesn't grow forever
+        kept = 0
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        entry = clean_entry(json.loads(line))
+                    except ValueError:
+                        entry = None
+                    if entry is not None:
+                        self.index(entry)
+            kept = sum(len(board) for board in self.boards.values())
+            compacted = self.path + ".tmp"
+            with open(compacted, "w", encoding="utf-8") as file:
+                for (arena, character), board in self.boards.items():
+                    for negative_score, sequence, name in board:
+                        file.write(json.dumps({"arena": arena, "character": character,
+                                               "name": name, "score": -negative_score}) + "\n")
+            os.replace(compacted, self.path)
+        logger.info("Leaderboard loaded %d scores on %d boards from %s", kept, len(self.boards), self.path)
+
+    def index(self, entry):
+        board = self.boards.setdefault((entry["arena"], entry["character"]), [])
+        self.sequence += 1
+        item = (-entry["score"], self.sequence, entry["name"])
+        if len(board) >= self.keep and item >= board[-1]:
+            return
+        bisect.insort(board, item)
+        if len(board) > self.keep:
+            board.pop()
+
+    def top(self, arena, character, k=10):
+        board = self.boards.get((arena, character), [])
+        return [{"name": name, "score": -negative_score} for negative_score, sequence, name in board[:k]]
+
+    def write_lines(self, lines):
+        self.file.write("".join(lines))
+        self.file.flush()
+
+    async def writer(self):
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            lines, self.pending = self.pending, []
+            waiters, self.waiters = self.waiters, []
+            try:
+                await asyncio.to_thread(self.write_lines, lines)
+                self.writes += 1
+            except OSError as error:
+                logger.error("Leaderboard write failed: %s", error)
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(error)
+                continue
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+
+    async def submit(self, scores):
+        accepted = 0
+        for entry in scores:
+            entry = clean_entry(entry)
+            if entry is None:
+                continue
+            self.index(entry)
+            self.pending.append(json.dumps(entry) + "\n")
+            accepted += 1
+        if accepted:
+            waiter = asyncio.get_running_loop().create_future()
+            self.waiters.append(waiter)
+            self.wakeup.set()
+            await waiter
+        self.submitted += accepted
+        return accepted
+
+    async def reply(self, request):
+        op = request.get("op")
+        if op == "submit":
+            scores = request.get("scores")
+            if not isinstance(scores, list):
+                return {"ok": False, "error": "scores must be a list"}
+            return {"ok": True, "accepted": await self.submit(scores)}
+        if op == "top":
+            k = max(1, min(int(request.get("k", 10)), self.keep))
+            return {"ok": True, "scores": self.top(str(request.get("arena")), str(request.get("character")), k)}
+        return {"ok": False, "error": f"unknown op {op!r}"}
+
+    async def handle(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    response = await self.reply(request)
+                except (ValueError, TypeError, AttributeError) as error:
+                    response = {"ok": False, "error": str(error)}
+                except OSError:
+                    # Not the request's fault: the client should send it again later
+                    response = {"ok": False, "error": "storage unavailable", "retry": True}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            logger.info("Leaderboard client %s dropped", peer)
+        finally:
+            writer.close()
+
+    async def start(self, host=LEADERBOARD_HOST, port=LEADERBOARD_PORT):
+        self.load()
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.wakeup = asyncio.Event()
+        self.writer_task = asyncio.create_task(self.writer())
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_LINE)
+        logger.info("Leaderboard listening on %s", ", ".join(str(s.getsockname()) for s in server.sockets))
+        return server
+
+    async def serve(self, host=LEADERBOARD_HOST, port=LEADERBOARD_PORT):
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+# --- Score client ---
+# What the game uses to submit scores. submit() only appends a line to a queue
+# file and returns; a background thread sends everything not yet acknowledged
+# in batches over one kept-alive connection, reconnecting with exponential
+# backoff while the server is unreachable. The queue survives restarts, and a
+# batch is only marked sent once the server acknowledges it (so a reply lost
+# in flight means the batch is sent again). A batch the server refuses is
+# retried score by score, and the scores it still refuses are moved to a
+# dead-letter file instead of blocking the queue behind them.
+LEADERBOARD_SERVER = os.environ.get("CITY_RUNNER_LEADERBOARD", f"127.0.0.1:{LEADERBOARD_PORT}")
+SCORE_QUEUE_FILE = "score_queue.jsonl"
+SUBMIT_BATCH = 100
+CONNECT_TIMEOUT = 2.0
+REPLY_TIMEOUT = 5.0
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 60.0
+
+class RequestRejected(Exception):
+    # The server answered and refused the request; sending it again won't help
+    pass
+
+class ScoreClient:
+    def __init__(self, server=LEADERBOARD_SERVER, queue_path=SCORE_QUEUE_FILE, name=None, batch=SUBMIT_BATCH):
+        host, _, port = server.rpartition(":")
+        self.address = (host or "127.0.0.1", int(port))
+        self.queue_path = queue_path
+        self.offset_path = queue_path + ".sent"
+        self.rejected_path = queue_path + ".rejected"
+        self.name = (name or os.environ.get("CITY_RUNNER_NAME") or socket.gethostname())[:MAX_NAME]
+        self.batch = batch
+        self.lock = threading.Lock()
+        self.connection_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.thread = None
+        self.connection = None
+        self.replies = None
+        self.sent = 0
+        self.rejected = 0
+        self.failures = 0
+        self.last_error = None
+        self.offset = self.read_offset()
+        self.pending = self.count_pending()
+
+    def read_offset(self):
+        try:
+            with open(self.offset_path, "r") as file:
+                return int(file.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def count_pending(self):
+        try:
+            with open(self.queue_path, "rb") as file:
+                file.seek(self.offset)
+                return sum(1 for line in file)
+        except OSError:
+            return 0
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="score-client", daemon=True)
+        self.thread.start()
+        # Anything left over from an earlier session goes out straight away
+        self.wakeup.set()
+        return self
+
+    def stop(self, timeout=1.0):
+        self.stopping.set()
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+        self.disconnect()
+
+    def submit(self, arena, character, score):
+        # Never blocks on the network: one short append and a wake-up
+        line = json.dumps({"arena": arena, "character": character, "name": self.name, "score": score}) + "\n"
+        with self.lock:
+            with open(self.queue_path, "ab") as file:
+                file.write(line.encode())
+            self.pending += 1
+        self.wakeup.set()
+
+    def status(self):
+        if self.pending == 0:
+            return f"all scores sent, {self.rejected} refused" if self.rejected else "all scores sent"
+        if self.failures:
+            return f"{self.pending} waiting, server unreachable"
+        return f"{self.pending} waiting to send"
+
+    def run(self):
+        delay = 0
+        while not self.stopping.is_set():
+            if delay:
+                self.stopping.wait(delay)
+            else:
+                self.wakeup.wait()
+                self.wakeup.clear()
+            try:
+                while not self.stopping.is_set() and self.send_batch():
+                    pass
+                self.failures = 0
+                delay = 0
+            except (OSError, ValueError) as error:
+                self.disconnect()
+                self.failures += 1
+                self.last_error = error
+                delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (self.failures - 1)) * random.uniform(0.5, 1.0)
+                logger.info("Score submission failed (%s), retrying in %.1f s", error, delay)
+
+    def send_batch(self):
+        # Sends the oldest unacknowledged scores; False once the queue is empty
+        with self.lock:
+            try:
+                with open(self.queue_path, "rb") as file:
+                    file.seek(self.offset)
+                    lines = [line for line, _ in zip(file, range(self.batch))]
+            except FileNotFoundError:
+                lines = []
+            if not lines:
+                self.compact()
+                return False
+        # submit() only flushed to the OS; make it durable before relying on it.
+        # Outside the lock, so a game over submit() never waits on the disk;
+        # only this thread ever truncates the queue.
+        with open(self.queue_path, "ab") as file:
+            os.fsync(file.fileno())
+        scores = []
+        rejected = []
+        for line in lines:
+            try:
+                scores.append((line, json.loads(line)))
+            except ValueError:
+                # A line torn by a crash mid-append; the server would reject it anyway
+                rejected.append(line)
+        if scores:
+            try:
+                self.request({"op": "submit", "scores": [score for _, score in scores]})
+            except RequestRejected as error:
+                logger.warning("Leaderboard rejected a batch of %d scores (%s), sending them one by one",
+                               len(scores), error)
+                for line, score in scores:
+                    try:
+                        self.request({"op": "submit", "scores": [score]})
+                    except RequestRejected:
+                        rejected.append(line)
+        if rejected:
+            self.dead_letter(rejected)
+        with self.lock:
+            self.offset += sum(len(line) for line in lines)
+            self.pending = max(0, self.pending - len(lines))
+            self.write_offset()
+        self.sent += len(lines) - len(rejected)
+        return True
+
+    def dead_letter(self, lines):
+        # Durable before the offset moves past them, like the queue itself
+        with open(self.rejected_path, "ab") as file:
+            file.write(b"".join(line if line.endswith(b"\n") else line + b"\n" for line in lines))
+            file.flush()
+            os.fsync(file.fileno())
+        self.rejected += len(lines)
+        logger.warning("%d scores the leaderboard will not take moved to %s", len(lines), self.rejected_path)
+
+    def compact(self):
+        # Called with the lock held: once everything is acknowledged the queue starts over
+        if self.offset and os.path.exists(self.queue_path) and os.path.getsize(self.queue_path) <= self.offset:
+            open(self.queue_path, "wb").close()
+            self.offset = 0
+            self.pending = 0
+            try:
+                os.remove(self.offset_path)
+            except FileNotFoundError:
+                pass
+
+    def write_offset(self):
+        partial = self.offset_path + ".tmp"
+        with open(partial, "w") as file:
+            file.write(str(self.offset))
+        os.replace(partial, self.offset_path)
+
+    def connect(self):
+        if self.connection is None:
+            connection = socket.create_connection(self.address, timeout=CONNECT_TIMEOUT)
+            connection.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection.settimeout(REPLY_TIMEOUT)
+            self.connection = connection
+            self.replies = connection.makefile("rb")
+        return self.connection
+
+    def disconnect(self):
+        if self.connection is not None:
+            try:
+                self.replies.close()
+                self.connection.close()
+            except OSError:
+                pass
+        self.connection = None
+        self.replies = None
+
+    def request(self, message):
+        with self.connection_lock:
+            connection = self.connect()
+            connection.sendall(json.dumps(message).encode() + b"\n")
+            line = self.replies.readline(MAX_LINE)
+        if not line:
+            raise ConnectionResetError("leaderboard closed the connection")
+        response = json.loads(line)
+        if not response.get("ok"):
+            error = response.get("error", "rejected")
+            if response.get("retry"):
+                raise ConnectionError(f"leaderboard: {error}")
+            raise RequestRejected(error)
+        return response
+
+    def top(self, arena, character, k=10):
+        # Blocking query, for tools rather than the game loop
+        return self.request({"op": "top", "arena": arena, "character": character, "k": k})["scores"]
+
+# --- Load generator ---
+# Many clients, each on one persistent connection, submitting batches as fast
+# as the server acknowledges them, with a top-K query every few batches.
+ARENAS = ["giza", "london", "paris", "rome", "newyork"]
+LOAD_CHARACTERS = ["default", "ninja", "robot", "alien", "superhero", "flash",
+                   "wizard", "spy", "pirate", "zombie", "curly_girl"]
+
+def percentile(values, fraction):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+async def load_client(host, port, number, batch, deadline, stats):
+    reader, writer = await asyncio.open_connection(host, port, limit=MAX_LINE)
+    sent = 0
+    try:
+        while time.perf_counter() < deadline:
+            scores = [{"arena": ARENAS[(number + i) % len(ARENAS)],
+                       "character": LOAD_CHARACTERS[(sent + i) % len(LOAD_CHARACTERS)],
+                       "name": f"cab{number}", "score": (sent + i) * 7919 % 500}
+                      for i in range(batch)]
+            start = time.perf_counter()
+            writer.write(json.dumps({"op": "submit", "scores": scores}).encode() + b"\n")
+            await writer.drain()
+            response = json.loads(await reader.readline())
+            stats["submit_ms"].append((time.perf_counter() - start) * 1000)
+            stats["submitted"] += response.get("accepted", 0)
+            sent += batch
+            if sent // batch % 10 == 0:
+                start = time.perf_counter()
+                writer.write(json.dumps({"op": "top", "arena": ARENAS[number % len(ARENAS)],
+                                         "character": "default", "k": 10}).encode() + b"\n")
+                await writer.drain()
+                json.loads(await reader.readline())
+                stats["top_ms"].append((time.perf_counter() - start) * 1000)
+    finally:
+        writer.close()
+
+async def load_test(host=None, port=LEADERBOARD_PORT, clients=32, batch=50, seconds=5.0):
+    # With no host, runs against a throwaway in-process server
+    server = None
+    if host is None:
+        directory = tempfile.mkdtemp(prefix="leaderboard-")
+        local = LeaderboardServer(os.path.join(directory, LEADERBOARD_FILE))
+        server = await local.start("127.0.0.1", 0)
+        host, port = "127.0.0.1", server.sockets[0].getsockname()[1]
+    stats = {"submitted": 0, "submit_ms": [], "top_ms": []}
+    start = time.perf_counter()
+    deadline = start + seconds
+    await asyncio.gather(*(load_client(host, port, n, batch, deadline, stats) for n in range(clients)))
+    elapsed = time.perf_counter() - start
+    if server is not None:
+        server.close()
+        await server.wait_closed()
+        local.writer_task.cancel()
+        local.file.close()
+        logger.info("Server made %d disk writes for %d submissions", local.writes, local.submitted)
+    report = {
+        "clients": clients,
+        "batch": batch,
+        "seconds": round(elapsed, 2),
+        "submitted": stats["submitted"],
+        "submissions_per_second": round(stats["submitted"] / elapsed),
+        "submit_p50_ms": round(percentile(stats["submit_ms"], 0.5), 2),
+        "submit_p99_ms": round(percentile(stats["submit_ms"], 0.99), 2),
+        "top_p50_ms": round(percentile(stats["top_ms"], 0.5), 2),
+        "top_p99_ms": round(percentile(stats["top_ms"], 0.99), 2)
+    }
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="City Runner LAN leaderboard")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="run the leaderboard server")
+    serve.add_argument("--host", default=LEADERBOARD_HOST)
+    serve.add_argument("--port", type=int, default=LEADERBOARD_PORT)
+    serve.add_argument("--file", default=LEADERBOARD_FILE)
+    serve.add_argument("--keep", type=int, default=LEADERBOARD_KEEP, help="scores kept per arena and character")
+    load = commands.add_parser("load", help="measure submission throughput")
+    load.add_argument("--host", help="server to load (default: a throwaway local one)")
+    load.add_argument("--port", type=int, default=LEADERBOARD_PORT)
+    load.add_argument("--clients", type=int, default=32)
+    load.add_argument("--batch", type=int, default=50)
+    load.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.command == "serve":
+        try:
+            asyncio.run(LeaderboardServer(args.file, args.keep).serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+        return 0
+    report = asyncio.run(load_test(args.host, args.port, args.clients, args.batch, args.seconds))
+    print(json.dumps(report, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
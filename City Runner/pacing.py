@@ -0,0 +1,183 @@
+import sys
+import time
+import logging
+import argparse
+
+import pygame
+
+# Frame pacing for the game loop.
+#
+# pygame's Clock.tick() sleeps with SDL_Delay, whose wake-up is only as good as
+# the OS scheduler, so frame intervals wander by several milliseconds; and
+# Clock.tick_busy_loop() hits the deadline but burns a whole core doing it. The
+# hybrid strategy sleeps in short slices until SPIN_MARGIN before the deadline
+# and spins only for the rest. Every strategy records a histogram of frame
+# intervals and how much CPU time its waiting cost, so they can be compared on
+# the actual cabinet hardware with `python pacing.py`.
+
+STRATEGIES = ("tick", "busy", "hybrid")
+TARGET_FPS = (60, 75, 120, 144)
+SPIN_MARGIN = 0.002
+SLEEP_SLICE = 0.001
+BUCKET_MS = 0.25
+BUCKETS = 160
+
+logger = logging.getLogger("city_runner.pacing")
+
+class FramePacer:
+    def __init__(self, fps=60, strategy="hybrid", clock=None):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"unknown pacing strategy {strategy!r}")
+        self.strategy = strategy
+        self.clock = clock if clock is not None else pygame.time.Clock()
+        self.set_fps(fps)
+        self.reset_stats()
+
+    def set_fps(self, fps):
+        self.fps = fps
+        self.frame_time = 1.0 / fps
+        self.deadline = None
+
+    def reset_stats(self):
+        # Interval histogram in BUCKET_MS steps; the last bucket collects everything longer
+        self.histogram = [0] * BUCKETS
+        self.frames = 0
+        self.interval_sum = 0.0
+        self.interval_squares = 0.0
+        self.late = 0
+        self.wait_wall = 0.0
+        self.wait_cpu = 0.0
+        self.last_frame = None
+        self.started = None
+
+    def wait(self, poll=None):
+        # Block until the next frame is due. With the hybrid strategy `poll`
+        # is called between sleep slices, so input keeps flowing in while the
+        # frame waits; tick and busy wait inside SDL and cannot do that.
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        if self.strategy == "tick":
+            self.clock.tick(self.fps)
+        elif self.strategy == "busy":
+            self.clock.tick_busy_loop(self.fps)
+        else:
+            self.hybrid_wait(poll)
+        now = time.perf_counter()
+        self.wait_wall += now - wall
+        self.wait_cpu += time.process_time() - cpu
+        self.record(now)
+        return now
+
+    def hybrid_wait(self, poll):
+        if self.deadline is None:
+            self.deadline = time.perf_counter() + self.frame_time
+        deadline = self.deadline
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= SPIN_MARGIN:
+                break
+            time.sleep(min(remaining - SPIN_MARGIN, SLEEP_SLICE))
+            if poll is not None:
+                poll()
+        while time.perf_counter() < deadline:
+            pass
+        now = time.perf_counter()
+        # After a long frame start over instead of rushing to catch up
+        self.deadline = deadline + self.frame_time if now - deadline < self.frame_time else now + self.frame_time
+        # Keeps Clock.get_fps() meaningful for anything that reads it
+        self.clock.tick()
+
+    def record(self, now):
+        if self.last_frame is None:
+            self.started = now
+        else:
+            interval = (now - self.last_frame) * 1000
+            self.histogram[min(int(interval / BUCKET_MS), BUCKETS - 1)] += 1
+            self.frames += 1
+            self.interval_sum += interval
+            self.interval_squares += interval * interval
+            if interval > self.frame_time * 1000 * 1.5:
+                self.late += 1
+        self.last_frame = now
+
+    def percentile(self, fraction):
+        target = fraction * self.frames
+        seen = 0
+        for bucket, count in enumerate(self.histogram):
+            seen += count
+            if count and seen >= target:
+                return (bucket + 1) * BUCKET_MS
+        return 0.0
+
+    def stats(self):
+        frames = max(self.frames, 1)
+        mean = self.interval_sum / frames
+        variance = max(self.interval_squares / frames - mean * mean, 0.0)
+        elapsed = max((self.last_frame or 0) - (self.started or 0), 1e-9)
+        return {
+            "strategy": self.strategy,
+            "target_fps": self.fps,
+            "frames": self.frames,
+            "mean_ms": mean,
+            "stdev_ms": variance ** 0.5,
+            "p1_ms": self.percentile(0.01),
+            "p99_ms": self.percentile(0.99),
+            "late_frames": self.late,
+            # CPU spent waiting, per frame and as a share of one core over the whole run
+            "wait_cpu_ms": self.wait_cpu * 1000 / frames,
+            "wait_cpu_percent": 100.0 * self.wait_cpu / elapsed,
+            "wait_ms": self.wait_wall * 1000 / frames,
+        }
+
+    def report(self):
+        s = self.stats()
+        lines = [f"Pacing {s['strategy']} at {s['target_fps']} fps: {s['frames']} frames, "
+                 f"mean {s['mean_ms']:.2f} ms, stdev {s['stdev_ms']:.2f} ms, p1 {s['p1_ms']:.2f} ms, "
+                 f"p99 {s['p99_ms']:.2f} ms, {s['late_frames']} late, "
+                 f"waiting cost {s['wait_cpu_ms']:.2f} ms CPU per frame ({s['wait_cpu_percent']:.0f}% of a core)"]
+        peak = max(self.histogram) or 1
+        for bucket, count in enumerate(self.histogram):
+            if count:
+                low = bucket * BUCKET_MS
+                bar = "#" * max(1, round(40 * count / peak))
+                label = f"{low:6.2f}+" if bucket == BUCKETS - 1 else f"{low:6.2f}"
+                lines.append(f"  {label} ms {count:6d} {bar}")
+        return lines
+
+def simulate_frame(work_ms):
+    # Stand-in for update and draw: spin for work_ms of CPU
+    end = time.perf_counter() + work_ms / 1000
+    while time.perf_counter() < end:
+        pass
+
+def compare(strategies, targets, seconds, work_ms):
+    results = []
+    for fps in targets:
+        for strategy in strategies:
+            pacer = FramePacer(fps, strategy)
+            pacer.wait()
+            pacer.reset_stats()
+            end = time.perf_counter() + seconds
+            while time.perf_counter() < end:
+                simulate_frame(work_ms)
+                pacer.wait()
+            for line in pacer.report():
+                print(line)
+            results.append(pacer.stats())
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare City Runner frame pacing strategies")
+    parser.add_argument("--strategy", choices=STRATEGIES, action="append", help="strategy to test (default: all)")
+    parser.add_argument("--fps", type=int, choices=TARGET_FPS, action="append", help="target to test (default: all)")
+    parser.add_argument("--seconds", type=float, default=5.0, help="per strategy and target")
+    parser.add_argument("--work-ms", type=float, default=4.0, help="simulated update and draw time per frame")
+    args = parser.parse_args(argv)
+
+    pygame.init()
+    compare(args.strategy or STRATEGIES, args.fps or TARGET_FPS, args.seconds, args.work_ms)
+    pygame.quit()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
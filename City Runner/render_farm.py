@@ -0,0 +1,135 @@
+import os
+import sys
+import time
+import random
+import shutil
+import logging
+import argparse
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Offline rendering of recorded runs (see Replays in stickruncode.py).
+#
+# A replay is a seed plus its jumps, so any frame can be reproduced by
+# re-simulating up to it. The run is split into frame ranges and each range
+# goes to a worker process running SDL's dummy video driver: the worker
+# replays the inputs up to its first frame without drawing (simulation is
+# cheap next to rendering), then draws and saves every frame of its range.
+# Frames are numbered by their position in the run, so the segments land in
+# one directory in order and ffmpeg can read them as a single sequence.
+
+IMAGE_FORMATS = ("png", "bmp", "tga", "jpg")
+# Some background art is scattered with the global generator when it is
+# baked; every worker seeds it the same way so the segments match
+BAKE_SEED = 0
+
+logger = logging.getLogger("city_runner.render_farm")
+
+def start_worker():
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+def split_frames(total, parts):
+    # Contiguous [start, end) ranges covering 0..total
+    parts = max(1, min(parts, total))
+    bounds = [total * i // parts for i in range(parts + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(parts) if bounds[i] < bounds[i + 1]]
+
+def frame_path(directory, frame, image_format):
+    return os.path.join(directory, f"frame_{frame:06d}.{image_format}")
+
+def render_range(replay, start, end, directory, scale, image_format):
+    import pygame
+    import stickruncode as game
+
+    # convert() needs a display format; sound is never wanted here
+    game.init_video(hidden=True)
+    # Every worker maps the same baked asset bundle, if there is one
+    game.load_asset_bundle()
+    began = time.perf_counter()
+    cpu = time.process_time()
+    random.seed(BAKE_SEED)
+    driver = game.ReplayDriver(replay)
+    driver.skip_to(start)
+    simulated = time.perf_counter()
+
+    surface = pygame.Surface((int(game.WIDTH * scale), int(game.HEIGHT * scale))).convert()
+    tier = game.QUALITY_TIERS[0]
+    for frame in range(start, end):
+        # Image N shows the run after step N + 1, as the game draws it
+        driver.step()
+        driver.run.draw(surface, tier, 0.0, scale)
+        driver.run.draw_hud(surface, scale)
+        pygame.image.save(surface, frame_path(directory, frame, image_format))
+    finished = time.perf_counter()
+    return {"start": start, "end": end, "resimulate_s": simulated - began, "render_s": finished - simulated,
+            "cpu_s": time.process_time() - cpu}
+
+def render_replay(replay, directory, scale=2.0, jobs=None, ranges=None, image_format="png"):
+    jobs = jobs or os.cpu_count() or 1
+    total = replay["frames"]
+    segments = split_frames(total, ranges or jobs * 2)
+    os.makedirs(directory, exist_ok=True)
+    logger.info("Rendering %d frames of %s/%s at %dx%d in %d ranges on %d workers",
+                total, replay["arena"], replay["character"], int(1024 * scale), int(768 * scale), len(segments), jobs)
+
+    started = time.perf_counter()
+    results = []
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(jobs, mp_context=context, initializer=start_worker) as pool:
+        futures = [pool.submit(render_range, replay, start, end, directory, scale, image_format)
+                   for start, end in segments]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            logger.info("Frames %d-%d done: %.1f s re-simulating, %.1f s rendering",
+                        result["start"], result["end"] - 1, result["resimulate_s"], result["render_s"])
+    elapsed = time.perf_counter() - started
+
+    missing = [frame for frame in range(total) if not os.path.exists(frame_path(directory, frame, image_format))]
+    if missing:
+        raise RuntimeError(f"{len(missing)} frames missing, first {missing[0]}")
+    # Worker CPU time over wall time: how many cores' worth of work ran at once
+    busy = sum(result["cpu_s"] for result in results)
+    report = {"frames": total, "seconds": elapsed, "fps": total / elapsed, "workers": jobs,
+              "ranges": len(segments), "cores_busy": busy / elapsed,
+              "resimulate_share": sum(result["resimulate_s"] for result in results) /
+                                  sum(result["resimulate_s"] + result["render_s"] for result in results)}
+    logger.info("%d frames in %.1f s (%.1f fps, %.2fx real time), %.2f cores busy on average, "
+                "%.0f%% of worker time spent re-simulating",
+                total, elapsed, report["fps"], report["fps"] / 60, report["cores_busy"],
+                100 * report["resimulate_share"])
+    return report
+
+def encode_video(directory, output, image_format, fps=60):
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        logger.error("ffmpeg not found; the frames are in %s", directory)
+        return False
+    command = [ffmpeg, "-y", "-loglevel", "error", "-framerate", str(fps),
+               "-i", os.path.join(directory, f"frame_%06d.{image_format}"), "-pix_fmt", "yuv420p", output]
+    return subprocess.run(command).returncode == 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render a City Runner replay to images or video")
+    parser.add_argument("replay", help="replay file, e.g. replays/last_run.json")
+    parser.add_argument("--out", default="render", help="directory for the image sequence")
+    parser.add_argument("--scale", type=float, default=2.0, help="multiple of 1024x768")
+    parser.add_argument("--jobs", type=int, help="worker processes (default: one per core)")
+    parser.add_argument("--ranges", type=int, help="frame ranges to split into (default: two per worker)")
+    parser.add_argument("--format", choices=IMAGE_FORMATS, default="png")
+    parser.add_argument("--video", help="also encode the frames into this file with ffmpeg")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    from stickruncode import load_replay
+    replay = load_replay(args.replay)
+    render_replay(replay, args.out, args.scale, args.jobs, args.ranges, args.format)
+    if args.video and not encode_video(args.out, args.video, args.format):
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    start_worker()
+    sys.exit(main())
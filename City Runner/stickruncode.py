@@ -4,13 +4,36 @@ import sys
 import os
 from pygame import gfxdraw
 import math
+import copy
+import time
+import logging
+import ast
+import json
+import gc
+import tracemalloc
+import threading
+import struct
+import queue
+import atexit
+import platform
+import argparse
+import tempfile
+import shutil
+import mmap
+import wave
+import hashlib
+from collections import deque, OrderedDict, namedtuple
+from array import array
 import numpy as np
+from leaderboard import ScoreClient
+from pacing import FramePacer, TARGET_FPS, STRATEGIES
 
-pygame.init()
-pygame.mixer.init()
 WIDTH, HEIGHT = 1024, 768
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("City Runner")
+# Menus are laid out on this fixed WIDTH x HEIGHT canvas and present() fits it
+# into the window; runs draw straight into the window (see Window below).
+# Nothing opens a window or the mixer at import: init_video() and
+# init_audio() are called by the commands that need them (see command_line).
+screen = None
 
 
 GROUND_HEIGHT = HEIGHT - 100
@@ -34,43 +57,77 @@ PLAYING = 1
 GAME_OVER = 2
 SHOP = 3
 ARENA_SELECT = 4
+TWO_PLAYER = 5
 
 # load sounds 
+class DummySound:
+    def play(self, *args): pass
+
 def load_sound(filename):
+    # Decoded samples from the asset bundle when there is one
+    sound = asset_bundle.sound(filename) if asset_bundle is not None else None
+    if sound is not None:
+        return sound
     try:
         return pygame.mixer.Sound(filename)
     except:
-        class DummySound:
-            def play(self): pass
         return DummySound()
 
-try:
-    jump_sound = load_sound("jump.wav")
-    coin_sound = load_sound("coin.wav")
-    lose_sound = load_sound("lose.wav")
-    high_score_sound = load_sound("high_score.wav")
-    background_music = load_sound("background.wav")
-    if hasattr(background_music, 'play'):
-        try:
-            background_music.play(-1)  # Loop background music
-        except TypeError:
+# Silent until init_audio() opens the mixer
+jump_sound = coin_sound = lose_sound = high_score_sound = background_music = DummySound()
+
+def init_audio():
+    global jump_sound, coin_sound, lose_sound, high_score_sound, background_music
+    try:
+        pygame.mixer.init()
+    except pygame.error as error:
+        logger.warning("No audio: %s", error)
+        return
+    try:
+        jump_sound = load_sound("jump.wav")
+        coin_sound = load_sound("coin.wav")
+        lose_sound = load_sound("lose.wav")
+        high_score_sound = load_sound("high_score.wav")
+        background_music = load_sound("background.wav")
+        if hasattr(background_music, 'play'):
             try:
-                background_music.play()
-            except Exception:
-                pass
-except:
-    pass
+                background_music.play(-1)  # Loop background music
+            except TypeError:
+                try:
+                    background_music.play()
+                except Exception:
+                    pass
+    except:
+        pass
 
 clock = pygame.time.Clock()
-font = pygame.font.Font(None, 36)
-small_font = pygame.font.Font(None, 24)
-shop_title_font = pygame.font.Font(None, 48)
+# Runs are paced by this; the simulation stays at FPS whatever the display rate
+pacer = FramePacer(FPS, "hybrid", clock)
+logger = logging.getLogger("city_runner")
+# Loaded by init_video() along with the window
+font = small_font = shop_title_font = None
+
+def init_video(hidden=False):
+    # The window, the menu canvas and the fonts. A hidden window is enough
+    # for commands that only need convert() to have a pixel format.
+    global screen, font, small_font, shop_title_font
+    pygame.display.init()
+    pygame.font.init()
+    pygame.display.set_mode((WIDTH, HEIGHT), pygame.HIDDEN if hidden else pygame.RESIZABLE)
+    pygame.display.set_caption("City Runner")
+    screen = pygame.Surface((WIDTH, HEIGHT)).convert()
+    font = pygame.font.Font(None, 36)
+    small_font = pygame.font.Font(None, 24)
+    shop_title_font = pygame.font.Font(None, 48)
+    filter_events()
 
 
 # loading
+DATA_FILE = "gamedata.txt"
+
 def load_data():
     try:
-        with open("gamedata.txt", "r") as file:
+        with open(DATA_FILE, "r") as file:
             data = file.read().split(',')
             highscore = int(data[0])
             coins = int(data[1])
@@ -82,12 +139,321 @@ def load_data():
         return 0, 0, {"default"}
 
 def save_data(highscore, coins, owned_characters):
-    with open("gamedata.txt", "w") as file:
+    with open(DATA_FILE, "w") as file:
         owned_string = ",".join(owned_characters)
         file.write(f"{highscore},{coins},{owned_string}")
 
 highscore, total_coins, owned_characters = load_data()
 
+# --- Surface Cache ---
+# Every baked surface (background layers, sprite art, HUD glyphs, thumbnails)
+# lives in one LRU cache with a byte budget, so the whole game's cached memory
+# is bounded in one place. Entries are costed at w * h * bytes per pixel.
+# CITY_RUNNER_CACHE_MB overrides the budget for smaller kiosks.
+SURFACE_CACHE_BUDGET = int(os.environ.get("CITY_RUNNER_CACHE_MB", "96")) * 1024 * 1024
+
+def cache_bytes(value):
+    if isinstance(value, pygame.Surface):
+        width, height = value.get_size()
+        return width * height * value.get_bytesize()
+    if isinstance(value, (list, tuple)):
+        return sum(cache_bytes(item) for item in value)
+    if hasattr(value, "cache_bytes"):
+        return value.cache_bytes()
+    return 0
+
+class SurfaceCache:
+    def __init__(self, budget=SURFACE_CACHE_BUDGET):
+        self.budget = budget
+        self.bytes = 0
+        self.entries = OrderedDict()  # (namespace, key) -> (value, bytes), oldest first
+        self.stats = {}
+        # The background baker fills the cache from its own thread
+        self.lock = threading.RLock()
+
+    def namespace_stats(self, namespace):
+        stats = self.stats.get(namespace)
+        if stats is None:
+            stats = {"hits": 0, "misses": 0, "entries": 0, "bytes": 0, "evictions": 0}
+            self.stats[namespace] = stats
+        return stats
+
+    def get(self, namespace, key):
+        with self.lock:
+            entry = self.entries.get((namespace, key))
+            stats = self.namespace_stats(namespace)
+            if entry is None:
+                stats["misses"] += 1
+                return None
+            stats["hits"] += 1
+            self.entries.move_to_end((namespace, key))
+            return entry[0]
+
+    def contains(self, namespace, key):
+        # A lookup that leaves the statistics and the LRU order alone
+        return (namespace, key) in self.entries
+
+    def keys(self, namespace):
+        with self.lock:
+            return [key for entry_namespace, key in self.entries if entry_namespace == namespace]
+
+    def put(self, namespace, key, value):
+        size = cache_bytes(value)
+        with self.lock:
+            self.discard(namespace, key)
+            self.entries[(namespace, key)] = (value, size)
+            stats = self.namespace_stats(namespace)
+            stats["entries"] += 1
+            stats["bytes"] += size
+            self.bytes += size
+            self.evict()
+        return value
+
+    def discard(self, namespace, key):
+        with self.lock:
+            entry = self.entries.pop((namespace, key), None)
+            if entry is not None:
+                stats = self.stats[namespace]
+                stats["entries"] -= 1
+                stats["bytes"] -= entry[1]
+                self.bytes -= entry[1]
+            return entry
+
+    def evict(self):
+        # Least recently used first, but never the entry that was just added
+        while self.bytes > self.budget and len(self.entries) > 1:
+            namespace, key = next(iter(self.entries))
+            self.discard(namespace, key)
+            self.stats[namespace]["evictions"] += 1
+
+    def clear(self, namespace=None):
+        with self.lock:
+            for entry_namespace, key in list(self.entries):
+                if namespace is None or entry_namespace == namespace:
+                    self.discard(entry_namespace, key)
+
+    def count(self, namespace):
+        return self.namespace_stats(namespace)["entries"]
+
+    def full(self):
+        # Once anything has been evicted the cache stays at its budget
+        return any(stats["evictions"] for stats in list(self.stats.values()))
+
+    def report(self):
+        # One line per namespace: entries, KB and hit rate
+        lines = []
+        for namespace, stats in sorted(list(self.stats.items())):
+            lookups = stats["hits"] + stats["misses"]
+            hit_rate = 100.0 * stats["hits"] / lookups if lookups else 0.0
+            lines.append(f"{namespace}: {stats['entries']} / {stats['bytes'] // 1024} KB / {hit_rate:.1f}% hit / {stats['evictions']} evicted")
+        lines.append(f"total: {self.bytes // 1024} KB of {self.budget // 1024} KB")
+        return lines
+
+surface_cache = SurfaceCache()
+
+# --- Display Lists ---
+# Character and obstacle art is recorded once, relative to the sprite origin,
+# into a compact command buffer and then replayed at any (x, y) every frame.
+DL_RECT, DL_CIRCLE, DL_LINE, DL_LINES, DL_POLYGON, DL_ELLIPSE, DL_ARC = range(7)
+
+def replay_rect(surface, color, g, x, y, rect=pygame.draw.rect):
+    rect(surface, color, (g[0] + x, g[1] + y, g[2], g[3]), g[4], g[5])
+
+def replay_circle(surface, color, g, x, y, circle=pygame.draw.circle):
+    circle(surface, color, (g[0] + x, g[1] + y), g[2], g[3])
+
+def replay_line(surface, color, g, x, y, line=pygame.draw.line):
+    line(surface, color, (g[0] + x, g[1] + y), (g[2] + x, g[3] + y), g[4])
+
+def replay_lines(surface, color, g, x, y, lines=pygame.draw.lines):
+    lines(surface, color, g[0], [(px + x, py + y) for px, py in g[1]], g[2])
+
+def replay_polygon(surface, color, g, x, y, polygon=pygame.draw.polygon):
+    polygon(surface, color, [(px + x, py + y) for px, py in g[0]], g[1])
+
+def replay_ellipse(surface, color, g, x, y, ellipse=pygame.draw.ellipse):
+    ellipse(surface, color, (g[0] + x, g[1] + y, g[2], g[3]), g[4])
+
+def replay_arc(surface, color, g, x, y, arc=pygame.draw.arc):
+    arc(surface, color, (g[0] + x, g[1] + y, g[2], g[3]), g[4], g[5], g[6])
+
+DL_REPLAY = (replay_rect, replay_circle, replay_line, replay_lines, replay_polygon, replay_ellipse, replay_arc)
+
+class DisplayList:
+    def __init__(self):
+        # One entry per command: opcode, packed RGBA color and where its
+        # numbers start in the shared float buffer
+        self.ops = array('B')
+        self.colors = array('I')
+        self.starts = array('I')
+        self.data = array('f')
+        self.program = None
+        self.scaled_lists = {}
+
+    def cache_bytes(self):
+        buffers = (self.ops, self.colors, self.starts, self.data)
+        own = sum(buffer.itemsize * len(buffer) for buffer in buffers)
+        return own + sum(scaled_list.cache_bytes() for scaled_list in self.scaled_lists.values())
+
+    def add(self, op, color, values):
+        color = pygame.Color(color)
+        self.ops.append(op)
+        self.colors.append((color.r << 24) | (color.g << 16) | (color.b << 8) | color.a)
+        self.starts.append(len(self.data))
+        self.data.extend(values)
+        self.program = None
+
+    def commands(self):
+        ends = list(self.starts[1:]) + [len(self.data)]
+        for op, color, start, end in zip(self.ops, self.colors, self.starts, ends):
+            yield op, color, self.data[start:end]
+
+    def compile(self):
+        # Unpack the buffer once into (replay function, color, geometry) so
+        # replay never has to decode or branch on the opcode
+        program = []
+        for op, packed, v in self.commands():
+            color = ((packed >> 24) & 255, (packed >> 16) & 255, (packed >> 8) & 255)
+            if op == DL_RECT:
+                g = (v[0], v[1], v[2], v[3], int(v[4]), int(v[5]))
+            elif op == DL_CIRCLE:
+                g = (v[0], v[1], v[2], int(v[3]))
+            elif op == DL_LINE:
+                g = (v[0], v[1], v[2], v[3], int(v[4]))
+            elif op == DL_LINES:
+                count = int(v[1])
+                points = tuple((v[2 + i * 2], v[3 + i * 2]) for i in range(count))
+                g = (bool(v[0]), points, int(v[2 + count * 2]))
+            elif op == DL_POLYGON:
+                count = int(v[0])
+                points = tuple((v[1 + i * 2], v[2 + i * 2]) for i in range(count))
+                g = (points, int(v[1 + count * 2]))
+            elif op == DL_ELLIPSE:
+                g = (v[0], v[1], v[2], v[3], int(v[4]))
+            else:
+                g = (v[0], v[1], v[2], v[3], v[4], v[5], int(v[6]))
+            program.append((DL_REPLAY[op], color, g))
+        self.program = tuple(program)
+        return self.program
+
+    def replay(self, surface, x, y):
+        program = self.program or self.compile()
+        for replay_command, color, g in program:
+            replay_command(surface, color, g, x, y)
+
+    def scaled(self, scale):
+        scaled_list = self.scaled_lists.get(scale)
+        if scaled_list is not None:
+            return scaled_list
+
+        def stroke(width):
+            # Keep filled shapes filled and never let an outline vanish
+            return 0 if width == 0 else max(1, round(width * scale))
+
+        scaled_list = DisplayList()
+        for op, packed, v in self.commands():
+            v = list(v)
+            if op == DL_RECT:
+                v = [c * scale for c in v[:4]] + [stroke(v[4]), round(v[5] * scale)]
+            elif op == DL_CIRCLE:
+                v = [v[0] * scale, v[1] * scale, v[2] * scale, stroke(v[3])]
+            elif op == DL_LINE:
+                v = [c * scale for c in v[:4]] + [stroke(v[4])]
+            elif op == DL_LINES:
+                v = v[:2] + [c * scale for c in v[2:-1]] + [stroke(v[-1])]
+            elif op == DL_POLYGON:
+                v = v[:1] + [c * scale for c in v[1:-1]] + [stroke(v[-1])]
+            elif op == DL_ELLIPSE:
+                v = [c * scale for c in v[:4]] + [stroke(v[4])]
+            else:
+                v = [c * scale for c in v[:4]] + [v[4], v[5], stroke(v[6])]
+            scaled_list.ops.append(op)
+            scaled_list.colors.append(packed)
+            scaled_list.starts.append(len(scaled_list.data))
+            scaled_list.data.extend(v)
+        self.scaled_lists[scale] = scaled_list
+        return scaled_list
+
+    def render(self, surface, x, y, scale=1):
+        if scale == 1:
+            self.replay(surface, x, y)
+        else:
+            self.scaled(scale).replay(surface, x, y)
+
+class DisplayListRecorder:
+    # Stands in for both the target surface and pygame.draw while a draw_*
+    # method runs, recording every primitive instead of rasterizing it
+    def __init__(self):
+        self.display_list = DisplayList()
+
+    def rect(self, surface, color, rect, width=0, border_radius=0):
+        x, y, w, h = rect
+        self.display_list.add(DL_RECT, color, (x, y, w, h, width, border_radius))
+
+    def circle(self, surface, color, center, radius, width=0):
+        self.display_list.add(DL_CIRCLE, color, (center[0], center[1], radius, width))
+
+    def line(self, surface, color, start_pos, end_pos, width=1):
+        self.display_list.add(DL_LINE, color, (start_pos[0], start_pos[1], end_pos[0], end_pos[1], width))
+
+    def lines(self, surface, color, closed, points, width=1):
+        values = [1 if closed else 0, len(points)]
+        for px, py in points:
+            values += [px, py]
+        self.display_list.add(DL_LINES, color, values + [width])
+
+    def polygon(self, surface, color, points, width=0):
+        values = [len(points)]
+        for px, py in points:
+            values += [px, py]
+        self.display_list.add(DL_POLYGON, color, values + [width])
+
+    def ellipse(self, surface, color, rect, width=0):
+        x, y, w, h = rect
+        self.display_list.add(DL_ELLIPSE, color, (x, y, w, h, width))
+
+    def arc(self, surface, color, rect, start_angle, stop_angle, width=1):
+        x, y, w, h = rect
+        self.display_list.add(DL_ARC, color, (x, y, w, h, start_angle, stop_angle, width))
+
+def record_display_list(draw_method):
+    recorder = DisplayListRecorder()
+    draw_method(recorder, recorder)
+    return recorder.display_list
+
+def get_character_display_list(character_type, leg_frame):
+    key = (character_type, leg_frame)
+    display_list = surface_cache.get("characters", key)
+    if display_list is None:
+        model = CartoonCharacter(x=0, y=0)
+        model.set_character_type(character_type)
+        model.run_animation_frame = leg_frame
+        display_list = surface_cache.put("characters", key, record_display_list(model.draw_art))
+    return display_list
+
+def get_obstacle_display_list(obstacle):
+    key = (obstacle.arena_type, obstacle.type, obstacle.width, obstacle.height)
+    display_list = surface_cache.get("obstacles", key)
+    if display_list is None:
+        model = copy.copy(obstacle)
+        model.x = 0
+        model.y = 0
+        display_list = surface_cache.put("obstacles", key, record_display_list(model.draw_art))
+    return display_list
+
+def render_sprite(display_list, size, origin, scale=1):
+    # Rasterizes a display list onto a colorkeyed canvas with the sprite
+    # origin at origin and crops it to what was drawn. Returns the image and
+    # where its top left sits relative to the origin.
+    canvas = pygame.Surface((int(size[0] * scale), int(size[1] * scale))).convert()
+    canvas.fill(PARALLAX_COLORKEY)
+    display_list.render(canvas, origin[0], origin[1], scale)
+    canvas.set_colorkey(PARALLAX_COLORKEY)
+    bounds = canvas.get_bounding_rect()
+    image = canvas.subsurface(bounds).copy()
+    image.set_colorkey(PARALLAX_COLORKEY, pygame.RLEACCEL)
+    return image, (bounds.x - int(origin[0] * scale), bounds.y - int(origin[1] * scale))
+
 # Cartoon Character Class
 class CartoonCharacter:
     def __init__(self, x=100, y=GROUND_HEIGHT - 40):
@@ -99,12 +465,14 @@ class CartoonCharacter:
         self.on_ground = True
         self.jump_count = 0
         self.max_jumps = 2
-        self.character_type = "default"
+        self.set_character_type("default")
         self.run_animation_frame = 0
         self.run_animation_speed = 0.2
         self.shield_active = False
         self.shield_timer = 0
         self.double_jump = False
+        # GameRun hands in its own generator so a seeded run replays exactly
+        self.rng = random
         
     def reset(self):
         self.x = 100 
@@ -116,25 +484,31 @@ class CartoonCharacter:
         self.shield_active = False
         self.shield_timer = 0
         self.double_jump = False
+    
+    def set_character_type(self, character_type):
+        # Everything that differs between runners is bound here, once, so
+        # jumping, physics and drawing never look at the type again
+        ability = CHARACTER_ABILITIES.get(character_type, CHARACTER_ABILITIES["default"])
+        self.character_type = character_type
+        self.gravity = ability["gravity"]
+        self.jump_strength = ability["jump_strength"]
+        self.double_jump_strength = ability["double_jump_strength"]
+        self.refills_double_jump = ability["refills_double_jump"]
+        self.jump_behavior = ability["jump"]
+        self.on_coin_pickup = ability["on_coin_pickup"]
+        self.renderer = ability["renderer"]
         
-    def jump(self):
-        if self.character_type == "alien":
-            self.velocity_y = JUMP_STRENGTH * 0.7
-        elif self.character_type == "superhero" and not self.on_ground and self.double_jump:
-            self.velocity_y = JUMP_STRENGTH * 1.2
-            self.double_jump = False
-            jump_sound.play()
-        elif self.jump_count < self.max_jumps:
-            self.velocity_y = JUMP_STRENGTH
-            self.on_ground = False
-            self.jump_count += 1
-            jump_sound.play()
+    def jump(self, lead=0.0):
+        velocity = self.velocity_y
+        self.jump_behavior(self)
+        if lead and self.velocity_y != velocity:
+            # The key went down `lead` of a frame before this step, so the
+            # jump has already been under way for that long
+            self.y += self.velocity_y * lead
+            self.velocity_y += self.gravity * lead
     
     def update(self):
-        if self.character_type == "alien":
-            self.velocity_y += GRAVITY * 0.3
-        else:
-            self.velocity_y += GRAVITY
+        self.velocity_y += self.gravity
             
         self.y += self.velocity_y
         
@@ -143,8 +517,7 @@ class CartoonCharacter:
             self.velocity_y = 0
             self.on_ground = True
             self.jump_count = 0
-            if self.character_type == "superhero":
-                self.double_jump = True
+            self.double_jump = self.refills_double_jump
                 
         if self.shield_active:
             self.shield_timer -= 1
@@ -154,358 +527,349 @@ class CartoonCharacter:
         if self.on_ground:
             self.run_animation_frame = (self.run_animation_frame + self.run_animation_speed) % 4
     
-    def draw(self, screen):
-        if self.character_type == "default":
-            self.draw_default_character(screen)
-        elif self.character_type == "ninja":
-            self.draw_ninja_character(screen)
-        elif self.character_type == "robot":
-            self.draw_robot_character(screen)
-        elif self.character_type == "alien":
-            self.draw_alien_character(screen)
-        elif self.character_type == "superhero":
-            self.draw_superhero_character(screen)
-        elif self.character_type == "flash":
-            self.draw_flash_character(screen)
-        elif self.character_type == "wizard":
-            self.draw_wizard_character(screen)
-        elif self.character_type == "spy":
-            self.draw_spy_character(screen)
-        elif self.character_type == "pirate":
-            self.draw_pirate_character(screen)
-        elif self.character_type == "zombie":
-            self.draw_zombie_character(screen)
-        elif self.character_type == "curly_girl":
-            self.draw_curly_girl_character(screen)
+    def draw(self, screen, scale=1, shield_glow=True, dy=0):
+        y = self.y + dy
+        sprite = None
+        if scale == 1 and asset_bundle is not None:
+            sprite = asset_bundle.sprite(character_asset_name(self.character_type, int(self.run_animation_frame)))
+        if sprite is not None:
+            image, (sprite_dx, sprite_dy) = sprite
+            screen.blit(image, (self.x + sprite_dx, y + sprite_dy))
+        else:
+            display_list = get_character_display_list(self.character_type, int(self.run_animation_frame))
+            display_list.render(screen, self.x * scale, y * scale, scale)
             
         # Draw shield if active
-        if self.shield_active:
+        if self.shield_active and shield_glow:
             pygame.draw.circle(screen, (100, 200, 255, 100), 
-                             (self.x + self.width//2, self.y + self.height//2), 
-                             self.width + 15, 2)
+                             ((self.x + self.width//2) * scale, (y + self.height//2) * scale), 
+                             (self.width + 15) * scale, max(1, round(2 * scale)))
     
-    def draw_default_character(self, screen):
+    def draw_art(self, screen, draw=pygame.draw):
+        self.renderer(self, screen, draw)
+    
+    def draw_default_character(self, screen, draw=pygame.draw):
         # Head
-        pygame.draw.circle(screen, (255, 218, 185), (self.x, self.y - 25), 12)
+        draw.circle(screen, (255, 218, 185), (self.x, self.y - 25), 12)
         
         # Body
-        pygame.draw.rect(screen, (65, 105, 225), (self.x - 10, self.y - 15, 20, 25))
+        draw.rect(screen, (65, 105, 225), (self.x - 10, self.y - 15, 20, 25))
         
         # Legs (animated running)
         leg_frame = int(self.run_animation_frame)
         if leg_frame == 0:
-            pygame.draw.line(screen, BLACK, (self.x - 5, self.y + 10), (self.x - 10, self.y + 30), 3)
-            pygame.draw.line(screen, BLACK, (self.x + 5, self.y + 10), (self.x, self.y + 30), 3)
+            draw.line(screen, BLACK, (self.x - 5, self.y + 10), (self.x - 10, self.y + 30), 3)
+            draw.line(screen, BLACK, (self.x + 5, self.y + 10), (self.x, self.y + 30), 3)
         elif leg_frame == 1:
-            pygame.draw.line(screen, BLACK, (self.x - 5, self.y + 10), (self.x - 15, self.y + 25), 3)
-            pygame.draw.line(screen, BLACK, (self.x + 5, self.y + 10), (self.x + 5, self.y + 30), 3)
+            draw.line(screen, BLACK, (self.x - 5, self.y + 10), (self.x - 15, self.y + 25), 3)
+            draw.line(screen, BLACK, (self.x + 5, self.y + 10), (self.x + 5, self.y + 30), 3)
         elif leg_frame == 2:
-            pygame.draw.line(screen, BLACK, (self.x - 5, self.y + 10), (self.x, self.y + 30), 3)
-            pygame.draw.line(screen, BLACK, (self.x + 5, self.y + 10), (self.x + 10, self.y + 30), 3)
+            draw.line(screen, BLACK, (self.x - 5, self.y + 10), (self.x, self.y + 30), 3)
+            draw.line(screen, BLACK, (self.x + 5, self.y + 10), (self.x + 10, self.y + 30), 3)
         else:
-            pygame.draw.line(screen, BLACK, (self.x - 5, self.y + 10), (self.x - 5, self.y + 30), 3)
-            pygame.draw.line(screen, BLACK, (self.x + 5, self.y + 10), (self.x + 15, self.y + 25), 3)
+            draw.line(screen, BLACK, (self.x - 5, self.y + 10), (self.x - 5, self.y + 30), 3)
+            draw.line(screen, BLACK, (self.x + 5, self.y + 10), (self.x + 15, self.y + 25), 3)
         
         # Arms
-        pygame.draw.line(screen, BLACK, (self.x - 10, self.y - 5), (self.x - 20, self.y), 3)
-        pygame.draw.line(screen, BLACK, (self.x + 10, self.y - 5), (self.x + 20, self.y), 3)
+        draw.line(screen, BLACK, (self.x - 10, self.y - 5), (self.x - 20, self.y), 3)
+        draw.line(screen, BLACK, (self.x + 10, self.y - 5), (self.x + 20, self.y), 3)
         
         # Eyes
-        pygame.draw.circle(screen, WHITE, (self.x - 5, self.y - 28), 3)
-        pygame.draw.circle(screen, WHITE, (self.x + 5, self.y - 28), 3)
-        pygame.draw.circle(screen, BLACK, (self.x - 5, self.y - 28), 1)
-        pygame.draw.circle(screen, BLACK, (self.x + 5, self.y - 28), 1)
+        draw.circle(screen, WHITE, (self.x - 5, self.y - 28), 3)
+        draw.circle(screen, WHITE, (self.x + 5, self.y - 28), 3)
+        draw.circle(screen, BLACK, (self.x - 5, self.y - 28), 1)
+        draw.circle(screen, BLACK, (self.x + 5, self.y - 28), 1)
         
         # Smile
-        pygame.draw.arc(screen, BLACK, (self.x - 8, self.y - 22, 16, 10), 0.2, 2.9, 2)
+        draw.arc(screen, BLACK, (self.x - 8, self.y - 22, 16, 10), 0.2, 2.9, 2)
     
-    def draw_ninja_character(self, screen):
+    def draw_ninja_character(self, screen, draw=pygame.draw):
         # Head (with mask)
-        pygame.draw.circle(screen, (50, 50, 50), (self.x, self.y - 25), 12)
+        draw.circle(screen, (50, 50, 50), (self.x, self.y - 25), 12)
         
         # Body
-        pygame.draw.rect(screen, (30, 30, 30), (self.x - 10, self.y - 15, 20, 25))
+        draw.rect(screen, (30, 30, 30), (self.x - 10, self.y - 15, 20, 25))
         
         # Legs
         leg_frame = int(self.run_animation_frame)
         if leg_frame == 0:
-            pygame.draw.line(screen, (20, 20, 20), (self.x - 5, self.y + 10), (self.x - 10, self.y + 30), 4)
-            pygame.draw.line(screen, (20, 20, 20), (self.x + 5, self.y + 10), (self.x, self.y + 30), 4)
+            draw.line(screen, (20, 20, 20), (self.x - 5, self.y + 10), (self.x - 10, self.y + 30), 4)
+            draw.line(screen, (20, 20, 20), (self.x + 5, self.y + 10), (self.x, self.y + 30), 4)
         elif leg_frame == 1:
-            pygame.draw.line(screen, (20, 20, 20), (self.x - 5, self.y + 10), (self.x - 15, self.y + 25), 4)
-            pygame.draw.line(screen, (20, 20, 20), (self.x + 5, self.y + 10), (self.x + 5, self.y + 30), 4)
+            draw.line(screen, (20, 20, 20), (self.x - 5, self.y + 10), (self.x - 15, self.y + 25), 4)
+            draw.line(screen, (20, 20, 20), (self.x + 5, self.y + 10), (self.x + 5, self.y + 30), 4)
         elif leg_frame == 2:
-            pygame.draw.line(screen, (20, 20, 20), (self.x - 5, self.y + 10), (self.x, self.y + 30), 4)
-            pygame.draw.line(screen, (20, 20, 20), (self.x + 5, self.y + 10), (self.x + 10, self.y + 30), 4)
+            draw.line(screen, (20, 20, 20), (self.x - 5, self.y + 10), (self.x, self.y + 30), 4)
+            draw.line(screen, (20, 20, 20), (self.x + 5, self.y + 10), (self.x + 10, self.y + 30), 4)
         else:
-            pygame.draw.line(screen, (20, 20, 20), (self.x - 5, self.y + 10), (self.x - 5, self.y + 30), 4)
-            pygame.draw.line(screen, (20, 20, 20), (self.x + 5, self.y + 10), (self.x + 15, self.y + 25), 4)
+            draw.line(screen, (20, 20, 20), (self.x - 5, self.y + 10), (self.x - 5, self.y + 30), 4)
+            draw.line(screen, (20, 20, 20), (self.x + 5, self.y + 10), (self.x + 15, self.y + 25), 4)
         
         # Eyes
-        pygame.draw.rect(screen, (200, 0, 0), (self.x - 8, self.y - 30, 16, 4))
+        draw.rect(screen, (200, 0, 0), (self.x - 8, self.y - 30, 16, 4))
         
         # Sword on back
-        pygame.draw.line(screen, (150, 150, 150), (self.x + 15, self.y - 10), (self.x + 15, self.y + 5), 3)
+        draw.line(screen, (150, 150, 150), (self.x + 15, self.y - 10), (self.x + 15, self.y + 5), 3)
     
-    def draw_robot_character(self, screen):
+    def draw_robot_character(self, screen, draw=pygame.draw):
         # Head
-        pygame.draw.rect(screen, (200, 200, 200), (self.x - 10, self.y - 35, 20, 15))
+        draw.rect(screen, (200, 200, 200), (self.x - 10, self.y - 35, 20, 15))
         
         # Body
-        pygame.draw.rect(screen, (150, 150, 150), (self.x - 12, self.y - 15, 24, 25))
+        draw.rect(screen, (150, 150, 150), (self.x - 12, self.y - 15, 24, 25))
         
         # Legs
         leg_frame = int(self.run_animation_frame)
         if leg_frame == 0:
-            pygame.draw.rect(screen, (100, 100, 100), (self.x - 12, self.y + 10, 8, 20))
-            pygame.draw.rect(screen, (100, 100, 100), (self.x + 4, self.y + 10, 8, 20))
+            draw.rect(screen, (100, 100, 100), (self.x - 12, self.y + 10, 8, 20))
+            draw.rect(screen, (100, 100, 100), (self.x + 4, self.y + 10, 8, 20))
         elif leg_frame == 1:
-            pygame.draw.rect(screen, (100, 100, 100), (self.x - 15, self.y + 10, 8, 15))
-            pygame.draw.rect(screen, (100, 100, 100), (self.x + 4, self.y + 10, 8, 20))
+            draw.rect(screen, (100, 100, 100), (self.x - 15, self.y + 10, 8, 15))
+            draw.rect(screen, (100, 100, 100), (self.x + 4, self.y + 10, 8, 20))
         elif leg_frame == 2:
-            pygame.draw.rect(screen, (100, 100, 100), (self.x - 12, self.y + 10, 8, 20))
-            pygame.draw.rect(screen, (100, 100, 100), (self.x + 7, self.y + 10, 8, 20))
+            draw.rect(screen, (100, 100, 100), (self.x - 12, self.y + 10, 8, 20))
+            draw.rect(screen, (100, 100, 100), (self.x + 7, self.y + 10, 8, 20))
         else:
-            pygame.draw.rect(screen, (100, 100, 100), (self.x - 12, self.y + 10, 8, 20))
-            pygame.draw.rect(screen, (100, 100, 100), (self.x + 4, self.y + 10, 8, 15))
+            draw.rect(screen, (100, 100, 100), (self.x - 12, self.y + 10, 8, 20))
+            draw.rect(screen, (100, 100, 100), (self.x + 4, self.y + 10, 8, 15))
         
         # Arms
-        pygame.draw.rect(screen, (120, 120, 120), (self.x - 20, self.y - 10, 8, 20))
-        pygame.draw.rect(screen, (120, 120, 120), (self.x + 12, self.y - 10, 8, 20))
+        draw.rect(screen, (120, 120, 120), (self.x - 20, self.y - 10, 8, 20))
+        draw.rect(screen, (120, 120, 120), (self.x + 12, self.y - 10, 8, 20))
         
         # Eyes
-        pygame.draw.rect(screen, (0, 200, 200), (self.x - 6, self.y - 30, 4, 4))
-        pygame.draw.rect(screen, (0, 200, 200), (self.x + 2, self.y - 30, 4, 4))
+        draw.rect(screen, (0, 200, 200), (self.x - 6, self.y - 30, 4, 4))
+        draw.rect(screen, (0, 200, 200), (self.x + 2, self.y - 30, 4, 4))
     
-    def draw_alien_character(self, screen):
+    def draw_alien_character(self, screen, draw=pygame.draw):
         # Head
-        pygame.draw.ellipse(screen, (0, 200, 0), (self.x - 12, self.y - 35, 24, 30))
+        draw.ellipse(screen, (0, 200, 0), (self.x - 12, self.y - 35, 24, 30))
         
         # Body
-        pygame.draw.rect(screen, (0, 180, 0), (self.x - 10, self.y - 15, 20, 25))
+        draw.rect(screen, (0, 180, 0), (self.x - 10, self.y - 15, 20, 25))
         
         # Legs
         leg_frame = int(self.run_animation_frame)
         if leg_frame == 0:
-            pygame.draw.line(screen, (0, 160, 0), (self.x - 5, self.y + 10), (self.x - 10, self.y + 30), 4)
-            pygame.draw.line(screen, (0, 160, 0), (self.x + 5, self.y + 10), (self.x, self.y + 30), 4)
+            draw.line(screen, (0, 160, 0), (self.x - 5, self.y + 10), (self.x - 10, self.y + 30), 4)
+            draw.line(screen, (0, 160, 0), (self.x + 5, self.y + 10), (self.x, self.y + 30), 4)
         elif leg_frame == 1:
-            pygame.draw.line(screen, (0, 160, 0), (self.x - 5, self.y + 10), (self.x - 15, self.y + 25), 4)
-            pygame.draw.line(screen, (0, 160, 0), (self.x + 5, self.y + 10), (self.x + 5, self.y + 30), 4)
+            draw.line(screen, (0, 160, 0), (self.x - 5, self.y + 10), (self.x - 15, self.y + 25), 4)
+            draw.line(screen, (0, 160, 0), (self.x + 5, self.y + 10), (self.x + 5, self.y + 30), 4)
         elif leg_frame == 2:
-            pygame.draw.line(screen, (0, 160, 0), (self.x - 5, self.y + 10), (self.x, self.y + 30), 4)
-            pygame.draw.line(screen, (0, 160, 0), (self.x + 5, self.y + 10), (self.x + 10, self.y + 30), 4)
+            draw.line(screen, (0, 160, 0), (self.x - 5, self.y + 10), (self.x, self.y + 30), 4)
+            draw.line(screen, (0, 160, 0), (self.x + 5, self.y + 10), (self.x + 10, self.y + 30), 4)
         else:
-            pygame.draw.line(screen, (0, 160, 0), (self.x - 5, self.y + 10), (self.x - 5, self.y + 30), 4)
-            pygame.draw.line(screen, (0, 160, 0), (self.x + 5, self.y + 10), (self.x + 15, self.y + 25), 4)
+            draw.line(screen, (0, 160, 0), (self.x - 5, self.y + 10), (self.x - 5, self.y + 30), 4)
+            draw.line(screen, (0, 160, 0), (self.x + 5, self.y + 10), (self.x + 15, self.y + 25), 4)
         
         # Eyes
-        pygame.draw.circle(screen, (255, 0, 0), (self.x - 5, self.y - 28), 4)
-        pygame.draw.circle(screen, (255, 0, 0), (self.x + 5, self.y - 28), 4)
-        pygame.draw.circle(screen, BLACK, (self.x - 5, self.y - 28), 2)
-        pygame.draw.circle(screen, BLACK, (self.x + 5, self.y - 28), 2)
+        draw.circle(screen, (255, 0, 0), (self.x - 5, self.y - 28), 4)
+        draw.circle(screen, (255, 0, 0), (self.x + 5, self.y - 28), 4)
+        draw.circle(screen, BLACK, (self.x - 5, self.y - 28), 2)
+        draw.circle(screen, BLACK, (self.x + 5, self.y - 28), 2)
         
         # Antenna
-        pygame.draw.line(screen, (0, 200, 0), (self.x - 8, self.y - 35), (self.x - 15, self.y - 50), 2)
-        pygame.draw.line(screen, (0, 200, 0), (self.x + 8, self.y - 35), (self.x + 15, self.y - 50), 2)
-        pygame.draw.circle(screen, (255, 0, 0), (self.x - 15, self.y - 50), 3)
-        pygame.draw.circle(screen, (255, 0, 0), (self.x + 15, self.y - 50), 3)
+        draw.line(screen, (0, 200, 0), (self.x - 8, self.y - 35), (self.x - 15, self.y - 50), 2)
+        draw.line(screen, (0, 200, 0), (self.x + 8, self.y - 35), (self.x + 15, self.y - 50), 2)
+        draw.circle(screen, (255, 0, 0), (self.x - 15, self.y - 50), 3)
+        draw.circle(screen, (255, 0, 0), (self.x + 15, self.y - 50), 3)
     
-    def draw_superhero_character(self, screen):
+    def draw_superhero_character(self, screen, draw=pygame.draw):
         # Cape
-        pygame.draw.polygon(screen, (200, 0, 0), 
+        draw.polygon(screen, (200, 0, 0), 
                           [(self.x - 15, self.y - 10), (self.x - 20, self.y + 20), 
                            (self.x, self.y + 10), (self.x + 20, self.y + 20), 
                            (self.x + 15, self.y - 10)])
         
         # Head
-        pygame.draw.circle(screen, (255, 218, 185), (self.x, self.y - 25), 12)
+        draw.circle(screen, (255, 218, 185), (self.x, self.y - 25), 12)
         
         # Body
-        pygame.draw.rect(screen, (0, 0, 200), (self.x - 10, self.y - 15, 20, 25))
+        draw.rect(screen, (0, 0, 200), (self.x - 10, self.y - 15, 20, 25))
         
         # Legs
         leg_frame = int(self.run_animation_frame)
         if leg_frame == 0:
-            pygame.draw.line(screen, (0, 0, 150), (self.x - 5, self.y + 10), (self.x - 10, self.y + 30), 4)
-            pygame.draw.line(screen, (0, 0, 150), (self.x + 5, self.y + 10), (self.x, self.y + 30), 4)
+            draw.line(screen, (0, 0, 150), (self.x - 5, self.y + 10), (self.x - 10, self.y + 30), 4)
+            draw.line(screen, (0, 0, 150), (self.x + 5, self.y + 10), (self.x, self.y + 30), 4)
         elif leg_frame == 1:
-            pygame.draw.line(screen, (0, 0, 150), (self.x - 5, self.y + 10), (self.x - 15, self.y + 25), 4)
-            pygame.draw.line(screen, (0, 0, 150), (self.x + 5, self.y + 10), (self.x + 5, self.y + 30), 4)
+            draw.line(screen, (0, 0, 150), (self.x - 5, self.y + 10), (self.x - 15, self.y + 25), 4)
+            draw.line(screen, (0, 0, 150), (self.x + 5, self.y + 10), (self.x + 5, self.y + 30), 4)
         elif leg_frame == 2:
-            pygame.draw.line(screen, (0, 0, 150), (self.x - 5, self.y + 10), (self.x, self.y + 30), 4)
-            pygame.draw.line(screen, (0, 0, 150), (self.x + 5, self.y + 10), (self.x + 10, self.y + 30), 4)
+            draw.line(screen, (0, 0, 150), (self.x - 5, self.y + 10), (self.x, self.y + 30), 4)
+            draw.line(screen, (0, 0, 150), (self.x + 5, self.y + 10), (self.x + 10, self.y + 30), 4)
         else:
-            pygame.draw.line(screen, (0, 0, 150), (self.x - 5, self.y + 10), (self.x - 5, self.y + 30), 4)
-            pygame.draw.line(screen, (0, 0, 150), (self.x + 5, self.y + 10), (self.x + 15, self.y + 25), 4)
+            draw.line(screen, (0, 0, 150), (self.x - 5, self.y + 10), (self.x - 5, self.y + 30), 4)
+            draw.line(screen, (0, 0, 150), (self.x + 5, self.y + 10), (self.x + 15, self.y + 25), 4)
         
         # Mask
-        pygame.draw.rect(screen, (0, 0, 150), (self.x - 12, self.y - 35, 24, 15))
-        pygame.draw.circle(screen, (0, 0, 150), (self.x, self.y - 20), 12)
+        draw.rect(screen, (0, 0, 150), (self.x - 12, self.y - 35, 24, 15))
+        draw.circle(screen, (0, 0, 150), (self.x, self.y - 20), 12)
         
         # Eyes
-        pygame.draw.circle(screen, WHITE, (self.x - 5, self.y - 28), 4)
-        pygame.draw.circle(screen, WHITE, (self.x + 5, self.y - 28), 4)
+        draw.circle(screen, WHITE, (self.x - 5, self.y - 28), 4)
+        draw.circle(screen, WHITE, (self.x + 5, self.y - 28), 4)
     
-    def draw_flash_character(self, screen):
+    def draw_flash_character(self, screen, draw=pygame.draw):
         # Head
-        pygame.draw.circle(screen, (255, 218, 185), (self.x, self.y - 25), 12)
+        draw.circle(screen, (255, 218, 185), (self.x, self.y - 25), 12)
         
         # Body
-        pygame.draw.rect(screen, (200, 0, 0), (self.x - 10, self.y - 15, 20, 25))
+        draw.rect(screen, (200, 0, 0), (self.x - 10, self.y - 15, 20, 25))
         
         # Legs
         leg_frame = int(self.run_animation_frame)
         if leg_frame == 0:
-            pygame.draw.line(screen, (150, 0, 0), (self.x - 5, self.y + 10), (self.x - 10, self.y + 30), 4)
-            pygame.draw.line(screen, (150, 0, 0), (self.x + 5, self.y + 10), (self.x, self.y + 30), 4)
+            draw.line(screen, (150, 0, 0), (self.x - 5, self.y + 10), (self.x - 10, self.y + 30), 4)
+            draw.line(screen, (150, 0, 0), (self.x + 5, self.y + 10), (self.x, self.y + 30), 4)
         elif leg_frame == 1:
-            pygame.draw.line(screen, (150, 0, 0), (self.x - 5, self.y + 10), (self.x - 15, self.y + 25), 4)
-            pygame.draw.line(screen, (150, 0, 0), (self.x + 5, self.y + 10), (self.x + 5, self.y + 30), 4)
+            draw.line(screen, (150, 0, 0), (self.x - 5, self.y + 10), (self.x - 15, self.y + 25), 4)
+            draw.line(screen, (150, 0, 0), (self.x + 5, self.y + 10), (self.x + 5, self.y + 30), 4)
         elif leg_frame == 2:
-            pygame.draw.line(screen, (150, 0, 0), (self.x - 5, self.y + 10), (self.x, self.y + 30), 4)
-            pygame.draw.line(screen, (150, 0, 0), (self.x + 5, self.y + 10), (self.x + 10, self.y + 30), 4)
+            draw.line(screen, (150, 0, 0), (self.x - 5, self.y + 10), (self.x, self.y + 30), 4)
+            draw.line(screen, (150, 0, 0), (self.x + 5, self.y + 10), (self.x + 10, self.y + 30), 4)
         else:
-            pygame.draw.line(screen, (150, 0, 0), (self.x - 5, self.y + 10), (self.x - 5, self.y + 30), 4)
-            pygame.draw.line(screen, (150, 0, 0), (self.x + 5, self.y + 10), (self.x + 15, self.y + 25), 4)
+            draw.line(screen, (150, 0, 0), (self.x - 5, self.y + 10), (self.x - 5, self.y + 30), 4)
+            draw.line(screen, (150, 0, 0), (self.x + 5, self.y + 10), (self.x + 15, self.y + 25), 4)
         
         # Lightning bolt symbol
-        pygame.draw.polygon(screen, YELLOW, 
+        draw.polygon(screen, YELLOW, 
                           [(self.x, self.y - 10), (self.x - 5, self.y - 5), 
                            (self.x + 5, self.y + 5), (self.x, self.y), 
                            (self.x + 5, self.y - 5), (self.x - 5, self.y + 5)])
     
-    def draw_wizard_character(self, screen):
+    def draw_wizard_character(self, screen, draw=pygame.draw):
         # Hat
-        pygame.draw.polygon(screen, (100, 0, 100), 
+        draw.polygon(screen, (100, 0, 100), 
                           [(self.x - 15, self.y - 25), (self.x + 15, self.y - 25), 
                            (self.x, self.y - 50)])
         
         # Head
-        pygame.draw.circle(screen, (255, 218, 185), (self.x, self.y - 25), 12)
+        draw.circle(screen, (255, 218, 185), (self.x, self.y - 25), 12)
         
         # Robe
-        pygame.draw.rect(screen, (70, 0, 70), (self.x - 12, self.y - 15, 24, 25))
+        draw.rect(screen, (70, 0, 70), (self.x - 12, self.y - 15, 24, 25))
         
         # Legs
         leg_frame = int(self.run_animation_frame)
         if leg_frame == 0:
-            pygame.draw.line(screen, (50, 0, 50), (self.x - 5, self.y + 10), (self.x - 10, self.y + 30), 4)
-            pygame.draw.line(screen, (50, 0, 50), (self.x + 5, self.y + 10), (self.x, self.y + 30), 4)
+            draw.line(screen, (50, 0, 50), (self.x - 5, self.y + 10), (self.x - 10, self.y + 30), 4)
+            draw.line(screen, (50, 0, 50), (self.x + 5, self.y + 10), (self.x, self.y + 30), 4)
         elif leg_frame == 1:
-            pygame.draw.line(screen, (50, 0, 50), (self.x - 5, self.y + 10), (self.x - 15, self.y + 25), 4)
-            pygame.draw.line(screen, (50, 0, 50), (self.x + 5, self.y + 10), (self.x + 5, self.y + 30), 4)
+            draw.line(screen, (50, 0, 50), (self.x - 5, self.y + 10), (self.x - 15, self.y + 25), 4)
+            draw.line(screen, (50, 0, 50), (self.x + 5, self.y + 10), (self.x + 5, self.y + 30), 4)
         elif leg_frame == 2:
-            pygame.draw.line(screen, (50, 0, 50), (self.x - 5, self.y + 10), (self.x, self.y + 30), 4)
-            pygame.draw.line(screen, (50, 0, 50), (self.x + 5, self.y + 10), (self.x + 10, self.y + 30), 4)
+            draw.line(screen, (50, 0, 50), (self.x - 5, self.y + 10), (self.x, self.y + 30), 4)
+            draw.line(screen, (50, 0, 50), (self.x + 5, self.y + 10), (self.x + 10, self.y + 30), 4)
         else:
-            pygame.draw.line(screen, (50, 0, 50), (self.x - 5, self.y + 10), (self.x - 5, self.y + 30), 4)
-            pygame.draw.line(screen, (50, 0, 50), (self.x + 5, self.y + 10), (self.x + 15, self.y + 25), 4)
+            draw.line(screen, (50, 0, 50), (self.x - 5, self.y + 10), (self.x - 5, self.y + 30), 4)
+            draw.line(screen, (50, 0, 50), (self.x + 5, self.y + 10), (self.x + 15, self.y + 25), 4)
         
         # Staff
-        pygame.draw.line(screen, BROWN, (self.x + 20, self.y - 40), (self.x + 20, self.y + 20), 3)
-        pygame.draw.circle(screen, (200, 200, 0), (self.x + 20, self.y - 40), 8)
+        draw.line(screen, BROWN, (self.x + 20, self.y - 40), (self.x + 20, self.y + 20), 3)
+        draw.circle(screen, (200, 200, 0), (self.x + 20, self.y - 40), 8)
         
         # Beard
-        pygame.draw.arc(screen, (150, 150, 150), (self.x - 10, self.y - 15, 20, 20), 0, 3.14, 2)
+        draw.arc(screen, (150, 150, 150), (self.x - 10, self.y - 15, 20, 20), 0, 3.14, 2)
     
-    def draw_spy_character(self, screen):
+    def draw_spy_character(self, screen, draw=pygame.draw):
         # Head
-        pygame.draw.circle(screen, (255, 218, 185), (self.x, self.y - 25), 12)
+        draw.circle(screen, (255, 218, 185), (self.x, self.y - 25), 12)
         
         # Sunglasses
-        pygame.draw.rect(screen, (0, 0, 0), (self.x - 12, self.y - 28, 24, 8))
-        pygame.draw.line(screen, (100, 100, 100), (self.x - 5, self.y - 28), (self.x + 5, self.y - 28), 2)
+        draw.rect(screen, (0, 0, 0), (self.x - 12, self.y - 28, 24, 8))
+        draw.line(screen, (100, 100, 100), (self.x - 5, self.y - 28), (self.x + 5, self.y - 28), 2)
         
         # Trench coat
-        pygame.draw.rect(screen, (0, 0, 0), (self.x - 15, self.y - 15, 30, 25))
+        draw.rect(screen, (0, 0, 0), (self.x - 15, self.y - 15, 30, 25))
         
         # Legs
         leg_frame = int(self.run_animation_frame)
         if leg_frame == 0:
-            pygame.draw.line(screen, (20, 20, 20), (self.x - 5, self.y + 10), (self.x - 10, self.y + 30), 4)
-            pygame.draw.line(screen, (20, 20, 20), (self.x + 5, self.y + 10), (self.x, self.y + 30), 4)
+            draw.line(screen, (20, 20, 20), (self.x - 5, self.y + 10), (self.x - 10, self.y + 30), 4)
+            draw.line(screen, (20, 20, 20), (self.x + 5, self.y + 10), (self.x, self.y + 30), 4)
         elif leg_frame == 1:
-            pygame.draw.line(screen, (20, 20, 20), (self.x - 5, self.y + 10), (self.x - 15, self.y + 25), 4)
-            pygame.draw.line(screen, (20, 20, 20), (self.x + 5, self.y + 10), (self.x + 5, self.y + 30), 4)
+            draw.line(screen, (20, 20, 20), (self.x - 5, self.y + 10), (self.x - 15, self.y + 25), 4)
+            draw.line(screen, (20, 20, 20), (self.x + 5, self.y + 10), (self.x + 5, self.y + 30), 4)
         elif leg_frame == 2:
-            pygame.draw.line(screen, (20, 20, 20), (self.x - 5, self.y + 10), (self.x, self.y + 30), 4)
-            pygame.draw.line(screen, (20, 20, 20), (self.x + 5, self.y + 10), (self.x + 10, self.y + 30), 4)
+            draw.line(screen, (20, 20, 20), (self.x - 5, self.y + 10), (self.x, self.y + 30), 4)
+            draw.line(screen, (20, 20, 20), (self.x + 5, self.y + 10), (self.x + 10, self.y + 30), 4)
         else:
-            pygame.draw.line(screen, (20, 20, 20), (self.x - 5, self.y + 10), (self.x - 5, self.y + 30), 4)
-            pygame.draw.line(screen, (20, 20, 20), (self.x + 5, self.y + 10), (self.x + 15, self.y + 25), 4)
+            draw.line(screen, (20, 20, 20), (self.x - 5, self.y + 10), (self.x - 5, self.y + 30), 4)
+            draw.line(screen, (20, 20, 20), (self.x + 5, self.y + 10), (self.x + 15, self.y + 25), 4)
         
         # Briefcase
-        pygame.draw.rect(screen, (50, 50, 50), (self.x + 15, self.y, 15, 10))
-        pygame.draw.line(screen, (70, 70, 70), (self.x + 15, self.y + 2), (self.x + 30, self.y + 2), 1)
+        draw.rect(screen, (50, 50, 50), (self.x + 15, self.y, 15, 10))
+        draw.line(screen, (70, 70, 70), (self.x + 15, self.y + 2), (self.x + 30, self.y + 2), 1)
 
-    def draw_pirate_character(self, screen):
+    def draw_pirate_character(self, screen, draw=pygame.draw):
         # Head
-        pygame.draw.circle(screen, (255, 218, 185), (self.x, self.y - 25), 12)
+        draw.circle(screen, (255, 218, 185), (self.x, self.y - 25), 12)
 
         # Pirate Hat
-        pygame.draw.rect(screen, BLACK, (self.x - 15, self.y - 40, 30, 8))
-        pygame.draw.rect(screen, BLACK, (self.x - 8, self.y - 45, 16, 10))
+        draw.rect(screen, BLACK, (self.x - 15, self.y - 40, 30, 8))
+        draw.rect(screen, BLACK, (self.x - 8, self.y - 45, 16, 10))
 
         # Eyepatch
-        pygame.draw.rect(screen, BLACK, (self.x + 2, self.y - 30, 8, 6))
-        pygame.draw.line(screen, BLACK, (self.x - 10, self.y-35), (self.x + 10, self.y-25), 1)
+        draw.rect(screen, BLACK, (self.x + 2, self.y - 30, 8, 6))
+        draw.line(screen, BLACK, (self.x - 10, self.y-35), (self.x + 10, self.y-25), 1)
 
         # Body (Vest)
-        pygame.draw.rect(screen, (139, 0, 0), (self.x - 10, self.y - 15, 20, 25)) # Red vest
-        pygame.draw.rect(screen, WHITE, (self.x - 5, self.y - 15, 10, 20)) # White shirt
+        draw.rect(screen, (139, 0, 0), (self.x - 10, self.y - 15, 20, 25)) # Red vest
+        draw.rect(screen, WHITE, (self.x - 5, self.y - 15, 10, 20)) # White shirt
 
         # Legs
         leg_frame = int(self.run_animation_frame)
         if leg_frame % 2 == 0:
-            pygame.draw.line(screen, (50, 50, 50), (self.x - 5, self.y + 10), (self.x - 10, self.y + 30), 4)
-            pygame.draw.line(screen, (50, 50, 50), (self.x + 5, self.y + 10), (self.x, self.y + 30), 4)
+            draw.line(screen, (50, 50, 50), (self.x - 5, self.y + 10), (self.x - 10, self.y + 30), 4)
+            draw.line(screen, (50, 50, 50), (self.x + 5, self.y + 10), (self.x, self.y + 30), 4)
         else:
-            pygame.draw.line(screen, (50, 50, 50), (self.x - 5, self.y + 10), (self.x, self.y + 30), 4)
-            pygame.draw.line(screen, (50, 50, 50), (self.x + 5, self.y + 10), (self.x + 10, self.y + 30), 4)
+            draw.line(screen, (50, 50, 50), (self.x - 5, self.y + 10), (self.x, self.y + 30), 4)
+            draw.line(screen, (50, 50, 50), (self.x + 5, self.y + 10), (self.x + 10, self.y + 30), 4)
         
         # Cutlass at side
-        pygame.draw.line(screen, (100,100,100), (self.x + 15, self.y - 5), (self.x + 25, self.y + 10), 3)
-        pygame.draw.rect(screen, BROWN, (self.x + 12, self.y - 8, 5, 5))
+        draw.line(screen, (100,100,100), (self.x + 15, self.y - 5), (self.x + 25, self.y + 10), 3)
+        draw.rect(screen, BROWN, (self.x + 12, self.y - 8, 5, 5))
 
-    def draw_zombie_character(self, screen):
+    def draw_zombie_character(self, screen, draw=pygame.draw):
         # Head (Greenish skin)
-        pygame.draw.circle(screen, (150, 200, 150), (self.x, self.y - 25), 12)
+        draw.circle(screen, (150, 200, 150), (self.x, self.y - 25), 12)
 
         # Eyes (dull)
-        pygame.draw.circle(screen, WHITE, (self.x - 5, self.y - 28), 3)
-        pygame.draw.circle(screen, WHITE, (self.x + 5, self.y - 28), 3)
+        draw.circle(screen, WHITE, (self.x - 5, self.y - 28), 3)
+        draw.circle(screen, WHITE, (self.x + 5, self.y - 28), 3)
 
         # Body (tattered clothes)
-        pygame.draw.rect(screen, (101, 67, 33), (self.x - 10, self.y - 15, 20, 25)) # Brown shirt
-        pygame.draw.polygon(screen, (101, 67, 33), [(self.x - 10, self.y + 10), (self.x - 12, self.y + 15), (self.x-5, self.y+10)]) # Jagged edge
+        draw.rect(screen, (101, 67, 33), (self.x - 10, self.y - 15, 20, 25)) # Brown shirt
+        draw.polygon(screen, (101, 67, 33), [(self.x - 10, self.y + 10), (self.x - 12, self.y + 15), (self.x-5, self.y+10)]) # Jagged edge
 
         # Legs (tattered pants)
         leg_frame = int(self.run_animation_frame)
         zombie_blue = (0, 50, 100)
         # Shambling animation
         if leg_frame == 0:
-            pygame.draw.line(screen, zombie_blue, (self.x - 5, self.y + 10), (self.x - 10, self.y + 30), 4)
-            pygame.draw.line(screen, zombie_blue, (self.x + 5, self.y + 10), (self.x, self.y + 25), 4)
+            draw.line(screen, zombie_blue, (self.x - 5, self.y + 10), (self.x - 10, self.y + 30), 4)
+            draw.line(screen, zombie_blue, (self.x + 5, self.y + 10), (self.x, self.y + 25), 4)
         elif leg_frame == 1:
-            pygame.draw.line(screen, zombie_blue, (self.x - 5, self.y + 10), (self.x - 5, self.y + 30), 4)
-            pygame.draw.line(screen, zombie_blue, (self.x + 5, self.y + 10), (self.x + 5, self.y + 25), 4)
+            draw.line(screen, zombie_blue, (self.x - 5, self.y + 10), (self.x - 5, self.y + 30), 4)
+            draw.line(screen, zombie_blue, (self.x + 5, self.y + 10), (self.x + 5, self.y + 25), 4)
         elif leg_frame == 2:
-            pygame.draw.line(screen, zombie_blue, (self.x - 5, self.y + 10), (self.x, self.y + 30), 4)
-            pygame.draw.line(screen, zombie_blue, (self.x + 5, self.y + 10), (self.x + 10, self.y + 25), 4)
+            draw.line(screen, zombie_blue, (self.x - 5, self.y + 10), (self.x, self.y + 30), 4)
+            draw.line(screen, zombie_blue, (self.x + 5, self.y + 10), (self.x + 10, self.y + 25), 4)
         else:
-            pygame.draw.line(screen, zombie_blue, (self.x - 5, self.y + 10), (self.x - 5, self.y + 30), 4)
-            pygame.draw.line(screen, zombie_blue, (self.x + 5, self.y + 10), (self.x + 15, self.y + 25), 4)
+            draw.line(screen, zombie_blue, (self.x - 5, self.y + 10), (self.x - 5, self.y + 30), 4)
+            draw.line(screen, zombie_blue, (self.x + 5, self.y + 10), (self.x + 15, self.y + 25), 4)
 
         # Arms
-        pygame.draw.line(screen, (150, 200, 150), (self.x - 10, self.y - 5), (self.x - 20, self.y), 3)
-        pygame.draw.line(screen, (150, 200, 150), (self.x + 10, self.y - 5), (self.x + 20, self.y), 3)
+        draw.line(screen, (150, 200, 150), (self.x - 10, self.y - 5), (self.x - 20, self.y), 3)
+        draw.line(screen, (150, 200, 150), (self.x + 10, self.y - 5), (self.x + 20, self.y), 3)
 
    
         
 
     
-    def draw_curly_girl_character(self, screen):
+    def draw_curly_girl_character(self, screen, draw=pygame.draw):
         # Colors
         SKIN = (255, 218, 185)
         HAIR = (101, 67, 33)
@@ -523,55 +887,55 @@ class CartoonCharacter:
         x, y = self.x, self.y
 
         # Head
-        pygame.draw.ellipse(screen, SKIN, (x - 12, y - 38, 24, 28))
+        draw.ellipse(screen, SKIN, (x - 12, y - 38, 24, 28))
 
         # Hair with curls and highlights
-        pygame.draw.ellipse(screen, HAIR, (x - 20, y - 48, 40, 20))
+        draw.ellipse(screen, HAIR, (x - 20, y - 48, 40, 20))
         curl_positions = [
             (x - 15, y - 40), (x - 5, y - 45), (x + 5, y - 45), (x + 15, y - 40),
             (x - 18, y - 30), (x + 18, y - 30), (x - 20, y - 20), (x + 20, y - 20)
         ]
         for cx, cy in curl_positions:
-            pygame.draw.circle(screen, HAIR, (cx, cy), 8)
-            pygame.draw.circle(screen, HAIR_HIGHLIGHT, (cx + 2, cy - 2), 3)
+            draw.circle(screen, HAIR, (cx, cy), 8)
+            draw.circle(screen, HAIR_HIGHLIGHT, (cx + 2, cy - 2), 3)
 
         # Eyes
-        pygame.draw.ellipse(screen, EYE_WHITE, (x - 10, y - 28, 8, 5))
-        pygame.draw.ellipse(screen, EYE_WHITE, (x + 2, y - 28, 8, 5))
-        pygame.draw.ellipse(screen, IRIS, (x - 8, y - 26, 4, 4))
-        pygame.draw.ellipse(screen, IRIS, (x + 4, y - 26, 4, 4))
-        pygame.draw.ellipse(screen, (0, 0, 0), (x - 7, y - 25, 2, 2))
-        pygame.draw.ellipse(screen, (0, 0, 0), (x + 5, y - 25, 2, 2))
+        draw.ellipse(screen, EYE_WHITE, (x - 10, y - 28, 8, 5))
+        draw.ellipse(screen, EYE_WHITE, (x + 2, y - 28, 8, 5))
+        draw.ellipse(screen, IRIS, (x - 8, y - 26, 4, 4))
+        draw.ellipse(screen, IRIS, (x + 4, y - 26, 4, 4))
+        draw.ellipse(screen, (0, 0, 0), (x - 7, y - 25, 2, 2))
+        draw.ellipse(screen, (0, 0, 0), (x + 5, y - 25, 2, 2))
 
         # Eyelashes
         lashes_left = [(x - 10, y - 28), (x - 12, y - 30), (x - 8, y - 28), (x - 10, y - 30)]
         lashes_right = [(x + 10, y - 28), (x + 12, y - 30), (x + 8, y - 28), (x + 10, y - 30)]
         for i in range(0, len(lashes_left), 2):
-            pygame.draw.line(screen, EYELASHES, lashes_left[i], lashes_left[i + 1], 1)
-            pygame.draw.line(screen, EYELASHES, lashes_right[i], lashes_right[i + 1], 1)
+            draw.line(screen, EYELASHES, lashes_left[i], lashes_left[i + 1], 1)
+            draw.line(screen, EYELASHES, lashes_right[i], lashes_right[i + 1], 1)
 
         # Blush
-        pygame.draw.circle(screen, BLUSH, (x - 14, y - 20), 3, 1)
-        pygame.draw.circle(screen, BLUSH, (x + 14, y - 20), 3, 1)
+        draw.circle(screen, BLUSH, (x - 14, y - 20), 3, 1)
+        draw.circle(screen, BLUSH, (x + 14, y - 20), 3, 1)
 
         # Smiley mouth
-        pygame.draw.arc(screen, MOUTH, (x - 8, y - 14, 16, 10), math.pi + 0.2, 2 * math.pi - 0.2, 2)
+        draw.arc(screen, MOUTH, (x - 8, y - 14, 16, 10), math.pi + 0.2, 2 * math.pi - 0.2, 2)
 
         # Dress — elegant flare
-        pygame.draw.rect(screen, DRESS, (x - 12, y - 10, 24, 15))  # Bodice
-        pygame.draw.polygon(screen, DRESS, [  # Flared skirt
+        draw.rect(screen, DRESS, (x - 12, y - 10, 24, 15))  # Bodice
+        draw.polygon(screen, DRESS, [  # Flared skirt
             (x - 12, y + 5),
             (x - 25, y + 35),
             (x + 25, y + 35),
             (x + 12, y + 5)
         ])
-        pygame.draw.line(screen, (200, 120, 0), (x - 12, y + 5), (x + 12, y + 5), 2)  # Waistband
+        draw.line(screen, (200, 120, 0), (x - 12, y + 5), (x + 12, y + 5), 2)  # Waistband
 
         # Arms
         left_hand = (x - 25, y + 8)
         right_hand = (x + 25, y + 8)
-        pygame.draw.line(screen, SKIN, (x - 12, y), left_hand, 3)
-        pygame.draw.line(screen, SKIN, (x + 12, y), right_hand, 3)
+        draw.line(screen, SKIN, (x - 12, y), left_hand, 3)
+        draw.line(screen, SKIN, (x + 12, y), right_hand, 3)
 
         # Cigarette in right hand with brown filter and smoke
         filter_x = right_hand[0]
@@ -580,9 +944,9 @@ class CartoonCharacter:
         smoke_start_x = tip_x + 2
         smoke_start_y = right_hand[1]
 
-        pygame.draw.rect(screen, (139, 69, 19), (filter_x, right_hand[1], 3, 2))         # Brown filter
-        pygame.draw.rect(screen, (255, 255, 255), (body_x, right_hand[1], 6, 2))         # White body
-        pygame.draw.rect(screen, (255, 0, 0), (tip_x, right_hand[1], 2, 2))              # Lit red tip
+        draw.rect(screen, (139, 69, 19), (filter_x, right_hand[1], 3, 2))         # Brown filter
+        draw.rect(screen, (255, 255, 255), (body_x, right_hand[1], 6, 2))         # White body
+        draw.rect(screen, (255, 0, 0), (tip_x, right_hand[1], 2, 2))              # Lit red tip
 
         # Smoke trail
         smoke_path = [
@@ -593,415 +957,861 @@ class CartoonCharacter:
             (smoke_start_x, smoke_start_y - 32)
         ]
         for (sx, sy) in smoke_path:
-            pygame.draw.circle(screen, SMOKE, (sx, sy), 3)
+            draw.circle(screen, SMOKE, (sx, sy), 3)
 
         # Legs animation
         frame = int(self.run_animation_frame)
         if frame == 0:
-            pygame.draw.line(screen, LEGS, (x - 7, y + 20), (x - 10, y + 40), 3)
-            pygame.draw.line(screen, LEGS, (x + 7, y + 20), (x + 4, y + 40), 3)
+            draw.line(screen, LEGS, (x - 7, y + 20), (x - 10, y + 40), 3)
+            draw.line(screen, LEGS, (x + 7, y + 20), (x + 4, y + 40), 3)
         elif frame == 1:
-            pygame.draw.line(screen, LEGS, (x - 7, y + 20), (x - 12, y + 35), 3)
-            pygame.draw.line(screen, LEGS, (x + 7, y + 20), (x + 7, y + 40), 3)
+            draw.line(screen, LEGS, (x - 7, y + 20), (x - 12, y + 35), 3)
+            draw.line(screen, LEGS, (x + 7, y + 20), (x + 7, y + 40), 3)
         elif frame == 2:
-            pygame.draw.line(screen, LEGS, (x - 7, y + 20), (x - 4, y + 40), 3)
-            pygame.draw.line(screen, LEGS, (x + 7, y + 20), (x + 10, y + 40), 3)
+            draw.line(screen, LEGS, (x - 7, y + 20), (x - 4, y + 40), 3)
+            draw.line(screen, LEGS, (x + 7, y + 20), (x + 10, y + 40), 3)
         else:
-            pygame.draw.line(screen, LEGS, (x - 7, y + 20), (x - 7, y + 40), 3)
-            pygame.draw.line(screen, LEGS, (x + 7, y + 20), (x + 12, y + 35), 3)
+            draw.line(screen, LEGS, (x - 7, y + 20), (x - 7, y + 40), 3)
+            draw.line(screen, LEGS, (x + 7, y + 20), (x + 12, y + 35), 3)
 
         # Shoes
-        pygame.draw.ellipse(screen, (0, 0, 0), (x - 12, y + 38, 10, 5))
-        pygame.draw.ellipse(screen, (0, 0, 0), (x + 2, y + 38, 10, 5))
-        pygame.draw.ellipse(screen, (50, 50, 50), (x - 10, y + 39, 6, 3))
-        pygame.draw.ellipse(screen, (50, 50, 50), (x + 4, y + 39, 6, 3))
+        draw.ellipse(screen, (0, 0, 0), (x - 12, y + 38, 10, 5))
+        draw.ellipse(screen, (0, 0, 0), (x + 2, y + 38, 10, 5))
+        draw.ellipse(screen, (50, 50, 50), (x - 10, y + 39, 6, 3))
+        draw.ellipse(screen, (50, 50, 50), (x + 4, y + 39, 6, 3))
+
+
+
+# --- Character Abilities ---
+# One entry per runner: its physics constants, what a jump does, what
+# happens when it picks up a coin and how it is drawn.  Anything left out
+# falls back to DEFAULT_ABILITY.
+def standard_jump(character):
+    if character.jump_count < character.max_jumps:
+        character.velocity_y = character.jump_strength
+        character.on_ground = False
+        character.jump_count += 1
+        jump_sound.play()
+
+def float_jump(character):
+    # Can always push off again, however high it already is
+    character.velocity_y = character.jump_strength
+
+def boosted_double_jump(character):
+    if not character.on_ground and character.double_jump:
+        character.velocity_y = character.double_jump_strength
+        character.double_jump = False
+        jump_sound.play()
+    else:
+        standard_jump(character)
 
+def shield_on_coin(character):
+    if character.rng.random() < 0.1:
+        character.shield_active = True
+        character.shield_timer = 180
 
+DEFAULT_ABILITY = {
+    "gravity": GRAVITY,
+    "jump_strength": JUMP_STRENGTH,
+    "double_jump_strength": JUMP_STRENGTH,
+    "refills_double_jump": False,
+    "jump": standard_jump,
+    "on_coin_pickup": None
+}
+
+CHARACTER_ABILITIES = {
+    "default": {"renderer": CartoonCharacter.draw_default_character},
+    "ninja": {"renderer": CartoonCharacter.draw_ninja_character, "on_coin_pickup": shield_on_coin},
+    "robot": {"renderer": CartoonCharacter.draw_robot_character},
+    "alien": {"renderer": CartoonCharacter.draw_alien_character, "gravity": GRAVITY * 0.3,
+              "jump_strength": JUMP_STRENGTH * 0.7, "jump": float_jump},
+    "superhero": {"renderer": CartoonCharacter.draw_superhero_character, "double_jump_strength": JUMP_STRENGTH * 1.2,
+                  "refills_double_jump": True, "jump": boosted_double_jump},
+    "flash": {"renderer": CartoonCharacter.draw_flash_character},
+    "wizard": {"renderer": CartoonCharacter.draw_wizard_character},
+    "spy": {"renderer": CartoonCharacter.draw_spy_character},
+    "pirate": {"renderer": CartoonCharacter.draw_pirate_character},
+    "zombie": {"renderer": CartoonCharacter.draw_zombie_character},
+    "curly_girl": {"renderer": CartoonCharacter.draw_curly_girl_character}
+}
+
+for ability in CHARACTER_ABILITIES.values():
+    for key, value in DEFAULT_ABILITY.items():
+        ability.setdefault(key, value)
+
+# --- Swept Collision ---
+# Collisions are tested over the whole step rather than at its end: the
+# runner moves vertically and obstacles and coins move horizontally, so each
+# frame is a pair of boxes sliding along straight lines and the first moment
+# they overlap can be solved exactly.  Nothing tunnels through a thin
+# obstacle however coarse the step, and a step of n frames finds exactly the
+# hits that n single-frame steps would.
+def swept_time_of_impact(ax, ay, aw, ah, adx, ady, bx, by, bw, bh, bdx, bdy):
+    # Earliest t in [0, 1] at which box a moving by (adx, ady) overlaps box b
+    # moving by (bdx, bdy), or None if they stay apart
+    entry, leave = 0.0, 1.0
+    for a, a_size, b, b_size, d in ((ax, aw, bx, bw, adx - bdx), (ay, ah, by, bh, ady - bdy)):
+        if d == 0:
+            if not (a < b + b_size and a + a_size > b):
+                return None
+            continue
+        t1 = (b - (a + a_size)) / d
+        t2 = (b + b_size - a) / d
+        if t1 > t2:
+            t1, t2 = t2, t1
+        entry = max(entry, t1)
+        leave = min(leave, t2)
+    # Touching edges don't count, matching the strict AABB test
+    if entry < leave:
+        return entry
+    return None
+
+def sweep_runner(character, path, speeds, x, y, width, height, shield_blocks=False):
+    # path holds the runner's (y, shield_active) before and after each frame
+    # of the step and speeds how far the world scrolled in each one; x is
+    # where the box started.  Returns the time of impact in frames from the
+    # start of the step, or None.
+    if x - sum(speeds) >= character.x + character.width or x + width <= character.x:
+        return None
+    for frame, speed in enumerate(speeds):
+        y0 = path[frame][0]
+        y1, shielded = path[frame + 1]
+        if not (shield_blocks and shielded):
+            t = swept_time_of_impact(character.x, y0, character.width, character.height, 0, y1 - y0,
+                                     x, y, width, height, -speed, 0)
+            if t is not None:
+                return frame + t
+        x -= speed
+    return None
+
+def shield_after(shield, frames):
+    # (shield_active, shield_timer) as CartoonCharacter.update leaves them
+    # after that many more frames
+    active, timer = shield
+    if active and frames > 0:
+        if frames >= max(timer, 1):
+            return False, timer - max(timer, 1)
+        return True, timer - frames
+    return shield
+
+def random_obstacle_shape(rng):
+    width = rng.randint(25, 45)
+    height = rng.randint(35, 55)
+    kind = rng.choice(["car", "trashcan", "bench", "box", "cone", "barrier"])
+    lift = 0
+    if rng.random() < 0.3 and height > 40:
+        lift = rng.randint(10, 20)
+    return width, height, kind, lift
 
 #  city-themed obstacles class
 class Obstacle:
-    def __init__(self, last_obstacle_time, arena_type="giza"):
-        self.width = random.randint(25, 45)
-        self.height = random.randint(35, 55)
+    def __init__(self, last_obstacle_time, arena_type="giza", shape=None):
+        # shape is (width, height, type, lift) when the obstacle comes from a chunk
+        if shape is None:
+            shape = random_obstacle_shape(random)
+        self.width, self.height, self.type, lift = shape
         self.x = WIDTH
-        self.y = GROUND_HEIGHT - self.height
-        self.type = random.choice(["car", "trashcan", "bench", "box", "cone", "barrier"])
+        self.y = GROUND_HEIGHT - self.height - lift
         self.passed = False
         self.arena_type = arena_type
-
-        if random.random() < 0.3 and self.height > 40:
-            self.y -= random.randint(10, 20)
+        self.display_list = None
     
-    def update(self):
-        self.x -= SPEED
+    def update(self, distance=None):
+        self.x -= SPEED if distance is None else distance
     
-    def draw(self, screen):
+    def draw(self, screen, scale=1, dx=0):
+        if scale == 1 and asset_bundle is not None:
+            sprite = asset_bundle.sprite(obstacle_asset_name(self.arena_type, self.type, self.width, self.height))
+            if sprite is not None:
+                image, (sprite_dx, sprite_dy) = sprite
+                screen.blit(image, (self.x + dx + sprite_dx, self.y + sprite_dy))
+                return
+        if self.display_list is None:
+            self.display_list = get_obstacle_display_list(self)
+        self.display_list.render(screen, (self.x + dx) * scale, self.y * scale, scale)
+    
+    def draw_art(self, screen, draw=pygame.draw):
         if self.arena_type == "giza":
-            self.draw_giza_obstacle(screen)
+            self.draw_giza_obstacle(screen, draw)
         elif self.arena_type == "london":
-            self.draw_london_obstacle(screen)
+            self.draw_london_obstacle(screen, draw)
         elif self.arena_type == "paris":
-            self.draw_paris_obstacle(screen)
+            self.draw_paris_obstacle(screen, draw)
         elif self.arena_type == "rome":
-            self.draw_rome_obstacle(screen)
+            self.draw_rome_obstacle(screen, draw)
         elif self.arena_type == "newyork":
-            self.draw_newyork_obstacle(screen)
+            self.draw_newyork_obstacle(screen, draw)
     
-    def draw_giza_obstacle(self, screen):
+    def draw_giza_obstacle(self, screen, draw=pygame.draw):
         if self.type == "car":
             # More detailed taxi
-            pygame.draw.rect(screen, (200, 200, 0), (self.x, self.y, self.width, self.height), border_radius=8)
-            pygame.draw.rect(screen, BLACK, (self.x + 5, self.y + 5, self.width - 10, 10), border_radius=4)
+            draw.rect(screen, (200, 200, 0), (self.x, self.y, self.width, self.height), border_radius=8)
+            draw.rect(screen, BLACK, (self.x + 5, self.y + 5, self.width - 10, 10), border_radius=4)
             # Windows
-            pygame.draw.rect(screen, (150, 200, 255), (self.x + 5, self.y + 15, 10, 10), border_radius=2)
-            pygame.draw.rect(screen, (150, 200, 255), (self.x + self.width - 15, self.y + 15, 10, 10), border_radius=2)
+            draw.rect(screen, (150, 200, 255), (self.x + 5, self.y + 15, 10, 10), border_radius=2)
+            draw.rect(screen, (150, 200, 255), (self.x + self.width - 15, self.y + 15, 10, 10), border_radius=2)
             # Headlights
-            pygame.draw.circle(screen, YELLOW, (int(self.x + 5), int(self.y + self.height - 3)), 3)
-            pygame.draw.circle(screen, YELLOW, (int(self.x + self.width - 5), int(self.y + self.height - 3)), 3)
+            draw.circle(screen, YELLOW, (int(self.x + 5), int(self.y + self.height - 3)), 3)
+            draw.circle(screen, YELLOW, (int(self.x + self.width - 5), int(self.y + self.height - 3)), 3)
             # Wheels
-            pygame.draw.circle(screen, BLACK, (int(self.x + 10), int(self.y + self.height - 5)), 5)
-            pygame.draw.circle(screen, BLACK, (int(self.x + self.width - 10), int(self.y + self.height - 5)), 5)
-            pygame.draw.circle(screen, (120,120,120), (int(self.x + 10), int(self.y + self.height - 5)), 2)
-            pygame.draw.circle(screen, (120,120,120), (int(self.x + self.width - 10), int(self.y + self.height - 5)), 2)
+            draw.circle(screen, BLACK, (int(self.x + 10), int(self.y + self.height - 5)), 5)
+            draw.circle(screen, BLACK, (int(self.x + self.width - 10), int(self.y + self.height - 5)), 5)
+            draw.circle(screen, (120,120,120), (int(self.x + 10), int(self.y + self.height - 5)), 2)
+            draw.circle(screen, (120,120,120), (int(self.x + self.width - 10), int(self.y + self.height - 5)), 2)
         elif self.type == "trashcan":
             # More detailed trash can
-            pygame.draw.rect(screen, (100, 100, 100), (self.x, self.y, self.width, self.height), border_radius=4)
-            pygame.draw.rect(screen, (150, 150, 150), (self.x + 2, self.y + 2, self.width - 4, 5), border_radius=2)
+            draw.rect(screen, (100, 100, 100), (self.x, self.y, self.width, self.height), border_radius=4)
+            draw.rect(screen, (150, 150, 150), (self.x + 2, self.y + 2, self.width - 4, 5), border_radius=2)
             # Lid
-            pygame.draw.ellipse(screen, (80, 80, 80), (self.x, self.y - 5, self.width, 10))
+            draw.ellipse(screen, (80, 80, 80), (self.x, self.y - 5, self.width, 10))
             # Handles
-            pygame.draw.rect(screen, (120,120,120), (self.x + 2, self.y - 8, self.width - 4, 3), border_radius=2)
+            draw.rect(screen, (120,120,120), (self.x + 2, self.y - 8, self.width - 4, 3), border_radius=2)
         elif self.type == "bench":
             # More detailed bench
-            pygame.draw.rect(screen, BROWN, (self.x, self.y, self.width, 10), border_radius=3)
+            draw.rect(screen, BROWN, (self.x, self.y, self.width, 10), border_radius=3)
             # Slats
             for i in range(3):
-                pygame.draw.line(screen, (160, 82, 45), (self.x, self.y + 3 + i*3), (self.x + self.width, self.y + 3 + i*3), 2)
+                draw.line(screen, (160, 82, 45), (self.x, self.y + 3 + i*3), (self.x + self.width, self.y + 3 + i*3), 2)
             # Legs
-            pygame.draw.rect(screen, BROWN, (self.x, self.y + 10, 5, 20), border_radius=2)
-            pygame.draw.rect(screen, BROWN, (self.x + self.width - 5, self.y + 10, 5, 20), border_radius=2)
+            draw.rect(screen, BROWN, (self.x, self.y + 10, 5, 20), border_radius=2)
+            draw.rect(screen, BROWN, (self.x + self.width - 5, self.y + 10, 5, 20), border_radius=2)
         else:  # cone
             # More detailed traffic cone
-            pygame.draw.polygon(screen, ORANGE, 
+            draw.polygon(screen, ORANGE, 
                               [(self.x + self.width//2, self.y), 
                                (self.x, self.y + self.height), 
                                (self.x + self.width, self.y + self.height)])
-            pygame.draw.lines(screen, WHITE, False, 
+            draw.lines(screen, WHITE, False, 
                             [(self.x + self.width//2, self.y + 5), 
                              (self.x + 5, self.y + self.height - 5), 
                              (self.x + self.width - 5, self.y + self.height - 5)], 2)
             # Base
-            pygame.draw.rect(screen, (180, 100, 0), (self.x, self.y + self.height - 5, self.width, 5), border_radius=2)
+            draw.rect(screen, (180, 100, 0), (self.x, self.y + self.height - 5, self.width, 5), border_radius=2)
     
-    def draw_london_obstacle(self, screen):
+    def draw_london_obstacle(self, screen, draw=pygame.draw):
         if self.type == "car":
             # More detailed black cab
-            pygame.draw.rect(screen, BLACK, (self.x, self.y, self.width, self.height), border_radius=8)
-            pygame.draw.rect(screen, (60, 60, 60), (self.x + 5, self.y + 5, self.width - 10, 10), border_radius=4)
+            draw.rect(screen, BLACK, (self.x, self.y, self.width, self.height), border_radius=8)
+            draw.rect(screen, (60, 60, 60), (self.x + 5, self.y + 5, self.width - 10, 10), border_radius=4)
             # Windows
-            pygame.draw.rect(screen, (150, 200, 255), (self.x + 5, self.y + 5, 10, 10), border_radius=2)
-            pygame.draw.rect(screen, (150, 200, 255), (self.x + self.width - 15, self.y + 5, 10, 10), border_radius=2)
+            draw.rect(screen, (150, 200, 255), (self.x + 5, self.y + 5, 10, 10), border_radius=2)
+            draw.rect(screen, (150, 200, 255), (self.x + self.width - 15, self.y + 5, 10, 10), border_radius=2)
             # Headlights
-            pygame.draw.circle(screen, (255,255,180), (int(self.x + 5), int(self.y + self.height - 3)), 3)
-            pygame.draw.circle(screen, (255,255,180), (int(self.x + self.width - 5), int(self.y + self.height - 3)), 3)
+            draw.circle(screen, (255,255,180), (int(self.x + 5), int(self.y + self.height - 3)), 3)
+            draw.circle(screen, (255,255,180), (int(self.x + self.width - 5), int(self.y + self.height - 3)), 3)
             # Wheels
-            pygame.draw.circle(screen, (50, 50, 50), (int(self.x + 10), int(self.y + self.height - 5)), 5)
-            pygame.draw.circle(screen, (50, 50, 50), (int(self.x + self.width - 10), int(self.y + self.height - 5)), 5)
-            pygame.draw.circle(screen, (180,180,180), (int(self.x + 10), int(self.y + self.height - 5)), 2)
-            pygame.draw.circle(screen, (180,180,180), (int(self.x + self.width - 10), int(self.y + self.height - 5)), 2)
+            draw.circle(screen, (50, 50, 50), (int(self.x + 10), int(self.y + self.height - 5)), 5)
+            draw.circle(screen, (50, 50, 50), (int(self.x + self.width - 10), int(self.y + self.height - 5)), 5)
+            draw.circle(screen, (180,180,180), (int(self.x + 10), int(self.y + self.height - 5)), 2)
+            draw.circle(screen, (180,180,180), (int(self.x + self.width - 10), int(self.y + self.height - 5)), 2)
         elif self.type == "trashcan":
             # More detailed UK-style trash can
-            pygame.draw.rect(screen, (0, 100, 0), (self.x, self.y, self.width, self.height), border_radius=4)
-            pygame.draw.rect(screen, (0, 150, 0), (self.x + 2, self.y + 2, self.width - 4, 5), border_radius=2)
+            draw.rect(screen, (0, 100, 0), (self.x, self.y, self.width, self.height), border_radius=4)
+            draw.rect(screen, (0, 150, 0), (self.x + 2, self.y + 2, self.width - 4, 5), border_radius=2)
             # Gold band
-            pygame.draw.rect(screen, (200, 180, 0), (self.x, self.y + self.height//2, self.width, 4))
+            draw.rect(screen, (200, 180, 0), (self.x, self.y + self.height//2, self.width, 4))
         elif self.type == "bench":
             # More detailed park bench
-            pygame.draw.rect(screen, (139, 69, 19), (self.x, self.y, self.width, 10), border_radius=3)
+            draw.rect(screen, (139, 69, 19), (self.x, self.y, self.width, 10), border_radius=3)
             # Back
-            pygame.draw.rect(screen, (139, 69, 19), (self.x, self.y - 20, 5, 20), border_radius=2)
-            pygame.draw.rect(screen, (139, 69, 19), (self.x + self.width - 5, self.y - 20, 5, 20), border_radius=2)
-            pygame.draw.rect(screen, (139, 69, 19), (self.x, self.y - 20, self.width, 5), border_radius=2)
+            draw.rect(screen, (139, 69, 19), (self.x, self.y - 20, 5, 20), border_radius=2)
+            draw.rect(screen, (139, 69, 19), (self.x + self.width - 5, self.y - 20, 5, 20), border_radius=2)
+            draw.rect(screen, (139, 69, 19), (self.x, self.y - 20, self.width, 5), border_radius=2)
             # Slats
             for i in range(2):
-                pygame.draw.line(screen, (160, 82, 45), (self.x, self.y + 3 + i*3), (self.x + self.width, self.y + 3 + i*3), 2)
+                draw.line(screen, (160, 82, 45), (self.x, self.y + 3 + i*3), (self.x + self.width, self.y + 3 + i*3), 2)
         else:  # barrier
             # More detailed police barrier
-            pygame.draw.rect(screen, (200, 0, 0), (self.x, self.y, self.width, 15), border_radius=3)
-            pygame.draw.rect(screen, WHITE, (self.x, self.y, self.width, 5), border_radius=2)
-            pygame.draw.rect(screen, WHITE, (self.x, self.y + 10, self.width, 5), border_radius=2)
+            draw.rect(screen, (200, 0, 0), (self.x, self.y, self.width, 15), border_radius=3)
+            draw.rect(screen, WHITE, (self.x, self.y, self.width, 5), border_radius=2)
+            draw.rect(screen, WHITE, (self.x, self.y + 10, self.width, 5), border_radius=2)
             # Posts
-            pygame.draw.rect(screen, (80,80,80), (self.x, self.y-10, 5, 10), border_radius=2)
-            pygame.draw.rect(screen, (80,80,80), (self.x+self.width-5, self.y-10, 5, 10), border_radius=2)
+            draw.rect(screen, (80,80,80), (self.x, self.y-10, 5, 10), border_radius=2)
+            draw.rect(screen, (80,80,80), (self.x+self.width-5, self.y-10, 5, 10), border_radius=2)
     
-    def draw_paris_obstacle(self, screen):
+    def draw_paris_obstacle(self, screen, draw=pygame.draw):
         if self.type == "car":
             # More detailed small European car
-            pygame.draw.rect(screen, (200, 0, 0), (self.x, self.y, self.width, self.height), border_radius=8)
-            pygame.draw.rect(screen, (120, 0, 0), (self.x + 5, self.y + 5, self.width - 10, 10), border_radius=4)
+            draw.rect(screen, (200, 0, 0), (self.x, self.y, self.width, self.height), border_radius=8)
+            draw.rect(screen, (120, 0, 0), (self.x + 5, self.y + 5, self.width - 10, 10), border_radius=4)
             # Windows
-            pygame.draw.rect(screen, (150, 200, 255), (self.x + 5, self.y + 5, 10, 10), border_radius=2)
-            pygame.draw.rect(screen, (150, 200, 255), (self.x + self.width - 15, self.y + 5, 10, 10), border_radius=2)
+            draw.rect(screen, (150, 200, 255), (self.x + 5, self.y + 5, 10, 10), border_radius=2)
+            draw.rect(screen, (150, 200, 255), (self.x + self.width - 15, self.y + 5, 10, 10), border_radius=2)
             # Headlights
-            pygame.draw.circle(screen, (255,255,180), (int(self.x + 5), int(self.y + self.height - 3)), 3)
-            pygame.draw.circle(screen, (255,255,180), (int(self.x + self.width - 5), int(self.y + self.height - 3)), 3)
+            draw.circle(screen, (255,255,180), (int(self.x + 5), int(self.y + self.height - 3)), 3)
+            draw.circle(screen, (255,255,180), (int(self.x + self.width - 5), int(self.y + self.height - 3)), 3)
             # Wheels
-            pygame.draw.circle(screen, (50, 50, 50), (int(self.x + 10), int(self.y + self.height - 5)), 5)
-            pygame.draw.circle(screen, (50, 50, 50), (int(self.x + self.width - 10), int(self.y + self.height - 5)), 5)
-            pygame.draw.circle(screen, (180,180,180), (int(self.x + 10), int(self.y + self.height - 5)), 2)
-            pygame.draw.circle(screen, (180,180,180), (int(self.x + self.width - 10), int(self.y + self.height - 5)), 2)
+            draw.circle(screen, (50, 50, 50), (int(self.x + 10), int(self.y + self.height - 5)), 5)
+            draw.circle(screen, (50, 50, 50), (int(self.x + self.width - 10), int(self.y + self.height - 5)), 5)
+            draw.circle(screen, (180,180,180), (int(self.x + 10), int(self.y + self.height - 5)), 2)
+            draw.circle(screen, (180,180,180), (int(self.x + self.width - 10), int(self.y + self.height - 5)), 2)
         elif self.type == "trashcan":
             # More detailed Parisian trash can
-            pygame.draw.rect(screen, (150, 150, 150), (self.x, self.y, self.width, self.height), border_radius=4)
+            draw.rect(screen, (150, 150, 150), (self.x, self.y, self.width, self.height), border_radius=4)
             # Green top
-            pygame.draw.rect(screen, (0, 100, 0), (self.x, self.y, self.width, 5), border_radius=2)
+            draw.rect(screen, (0, 100, 0), (self.x, self.y, self.width, 5), border_radius=2)
             # Handles
-            pygame.draw.rect(screen, (120,120,120), (self.x + 2, self.y - 8, self.width - 4, 3), border_radius=2)
+            draw.rect(screen, (120,120,120), (self.x + 2, self.y - 8, self.width - 4, 3), border_radius=2)
         elif self.type == "bench":
             # More detailed ornate bench
-            pygame.draw.rect(screen, (100, 100, 100), (self.x, self.y, self.width, 10), border_radius=3)
+            draw.rect(screen, (100, 100, 100), (self.x, self.y, self.width, 10), border_radius=3)
             # Ornate legs
-            pygame.draw.rect(screen, (150, 150, 150), (self.x, self.y + 10, 5, 20), border_radius=2)
-            pygame.draw.rect(screen, (150, 150, 150), (self.x + self.width - 5, self.y + 10, 5, 20), border_radius=2)
+            draw.rect(screen, (150, 150, 150), (self.x, self.y + 10, 5, 20), border_radius=2)
+            draw.rect(screen, (150, 150, 150), (self.x + self.width - 5, self.y + 10, 5, 20), border_radius=2)
             # Decorative elements
-            pygame.draw.circle(screen, (200, 200, 200), (int(self.x + self.width//2), int(self.y + 5)), 3)
+            draw.circle(screen, (200, 200, 200), (int(self.x + self.width//2), int(self.y + 5)), 3)
             # Slats
             for i in range(2):
-                pygame.draw.line(screen, (180, 180, 180), (self.x, self.y + 3 + i*3), (self.x + self.width, self.y + 3 + i*3), 2)
+                draw.line(screen, (180, 180, 180), (self.x, self.y + 3 + i*3), (self.x + self.width, self.y + 3 + i*3), 2)
         else:  # cafe table
             # More detailed small cafe table
-            pygame.draw.rect(screen, BROWN, (self.x, self.y, self.width, 5), border_radius=2)
+            draw.rect(screen, BROWN, (self.x, self.y, self.width, 5), border_radius=2)
             # Leg
-            pygame.draw.rect(screen, BROWN, (self.x + self.width//2 - 2, self.y + 5, 4, 20), border_radius=2)
+            draw.rect(screen, BROWN, (self.x + self.width//2 - 2, self.y + 5, 4, 20), border_radius=2)
             # Table top
-            pygame.draw.ellipse(screen, (180, 180, 180), (self.x-2, self.y-4, self.width+4, 8))
+            draw.ellipse(screen, (180, 180, 180), (self.x-2, self.y-4, self.width+4, 8))
     
-    def draw_rome_obstacle(self, screen):
+    def draw_rome_obstacle(self, screen, draw=pygame.draw):
         if self.type == "car":
             # More detailed small Italian car
-            pygame.draw.rect(screen, (0, 0, 200), (self.x, self.y, self.width, self.height), border_radius=8)
-            pygame.draw.rect(screen, (0, 0, 120), (self.x + 5, self.y + 5, self.width - 10, 10), border_radius=4)
+            draw.rect(screen, (0, 0, 200), (self.x, self.y, self.width, self.height), border_radius=8)
+            draw.rect(screen, (0, 0, 120), (self.x + 5, self.y + 5, self.width - 10, 10), border_radius=4)
             # Windows
-            pygame.draw.rect(screen, (150, 200, 255), (self.x + 5, self.y + 5, 10, 10), border_radius=2)
-            pygame.draw.rect(screen, (150, 200, 255), (self.x + self.width - 15, self.y + 5, 10, 10), border_radius=2)
+            draw.rect(screen, (150, 200, 255), (self.x + 5, self.y + 5, 10, 10), border_radius=2)
+            draw.rect(screen, (150, 200, 255), (self.x + self.width - 15, self.y + 5, 10, 10), border_radius=2)
             # Headlights
-            pygame.draw.circle(screen, (255,255,180), (int(self.x + 5), int(self.y + self.height - 3)), 3)
-            pygame.draw.circle(screen, (255,255,180), (int(self.x + self.width - 5), int(self.y + self.height - 3)), 3)
+            draw.circle(screen, (255,255,180), (int(self.x + 5), int(self.y + self.height - 3)), 3)
+            draw.circle(screen, (255,255,180), (int(self.x + self.width - 5), int(self.y + self.height - 3)), 3)
             # Wheels
-            pygame.draw.circle(screen, (50, 50, 50), (int(self.x + 10), int(self.y + self.height - 5)), 5)
-            pygame.draw.circle(screen, (50, 50, 50), (int(self.x + self.width - 10), int(self.y + self.height - 5)), 5)
-            pygame.draw.circle(screen, (180,180,180), (int(self.x + 10), int(self.y + self.height - 5)), 2)
-            pygame.draw.circle(screen, (180,180,180), (int(self.x + self.width - 10), int(self.y + self.height - 5)), 2)
+            draw.circle(screen, (50, 50, 50), (int(self.x + 10), int(self.y + self.height - 5)), 5)
+            draw.circle(screen, (50, 50, 50), (int(self.x + self.width - 10), int(self.y + self.height - 5)), 5)
+            draw.circle(screen, (180,180,180), (int(self.x + 10), int(self.y + self.height - 5)), 2)
+            draw.circle(screen, (180,180,180), (int(self.x + self.width - 10), int(self.y + self.height - 5)), 2)
         elif self.type == "trashcan":
             # More detailed Roman trash can
-            pygame.draw.rect(screen, (100, 100, 100), (self.x, self.y, self.width, self.height), border_radius=4)
+            draw.rect(screen, (100, 100, 100), (self.x, self.y, self.width, self.height), border_radius=4)
             # Decorative stripes
-            pygame.draw.rect(screen, (200, 200, 200), (self.x, self.y, self.width, 3), border_radius=2)
-            pygame.draw.rect(screen, (200, 200, 200), (self.x, self.y + self.height - 3, self.width, 3), border_radius=2)
+            draw.rect(screen, (200, 200, 200), (self.x, self.y, self.width, 3), border_radius=2)
+            draw.rect(screen, (200, 200, 200), (self.x, self.y + self.height - 3, self.width, 3), border_radius=2)
             # Handles
-            pygame.draw.rect(screen, (120,120,120), (self.x + 2, self.y - 8, self.width - 4, 3), border_radius=2)
+            draw.rect(screen, (120,120,120), (self.x + 2, self.y - 8, self.width - 4, 3), border_radius=2)
         elif self.type == "bench":
             # More detailed stone bench
-            pygame.draw.rect(screen, (150, 150, 150), (self.x, self.y, self.width, 15), border_radius=4)
+            draw.rect(screen, (150, 150, 150), (self.x, self.y, self.width, 15), border_radius=4)
             # Carved details
-            pygame.draw.line(screen, (100, 100, 100), (self.x + 5, self.y + 5), (self.x + self.width - 5, self.y + 5), 2)
+            draw.line(screen, (100, 100, 100), (self.x + 5, self.y + 5), (self.x + self.width - 5, self.y + 5), 2)
             # Slats
             for i in range(2):
-                pygame.draw.line(screen, (180, 180, 180), (self.x, self.y + 8 + i*3), (self.x + self.width, self.y + 8 + i*3), 2)
+                draw.line(screen, (180, 180, 180), (self.x, self.y + 8 + i*3), (self.x + self.width, self.y + 8 + i*3), 2)
         else:  # column
             # More detailed broken column piece
-            pygame.draw.rect(screen, (200, 200, 200), (self.x, self.y, self.width, self.height), border_radius=3)
+            draw.rect(screen, (200, 200, 200), (self.x, self.y, self.width, self.height), border_radius=3)
             # Carved lines
             for i in range(3):
-                pygame.draw.line(screen, (150, 150, 150), 
+                draw.line(screen, (150, 150, 150), 
                                (self.x, self.y + 5 + i*10), 
                                (self.x + self.width, self.y + 5 + i*10), 2)
             # Top
-            pygame.draw.ellipse(screen, (180,180,180), (self.x, self.y-5, self.width, 10))
+            draw.ellipse(screen, (180,180,180), (self.x, self.y-5, self.width, 10))
     
-    def draw_newyork_obstacle(self, screen):
+    def draw_newyork_obstacle(self, screen, draw=pygame.draw):
         if self.type == "car":
             # More detailed yellow taxi
-            pygame.draw.rect(screen, YELLOW, (self.x, self.y, self.width, self.height), border_radius=8)
-            pygame.draw.rect(screen, BLACK, (self.x + 5, self.y + 5, self.width - 10, 10), border_radius=4)
+            draw.rect(screen, YELLOW, (self.x, self.y, self.width, self.height), border_radius=8)
+            draw.rect(screen, BLACK, (self.x + 5, self.y + 5, self.width - 10, 10), border_radius=4)
             # Windows
-            pygame.draw.rect(screen, (150, 200, 255), (self.x + 5, self.y + 15, 10, 10), border_radius=2)
-            pygame.draw.rect(screen, (150, 200, 255), (self.x + self.width - 15, self.y + 15, 10, 10), border_radius=2)
+            draw.rect(screen, (150, 200, 255), (self.x + 5, self.y + 15, 10, 10), border_radius=2)
+            draw.rect(screen, (150, 200, 255), (self.x + self.width - 15, self.y + 15, 10, 10), border_radius=2)
             # Headlights
-            pygame.draw.circle(screen, (255,255,180), (int(self.x + 5), int(self.y + self.height - 3)), 3)
-            pygame.draw.circle(screen, (255,255,180), (int(self.x + self.width - 5), int(self.y + self.height - 3)), 3)
+            draw.circle(screen, (255,255,180), (int(self.x + 5), int(self.y + self.height - 3)), 3)
+            draw.circle(screen, (255,255,180), (int(self.x + self.width - 5), int(self.y + self.height - 3)), 3)
             # Wheels
-            pygame.draw.circle(screen, BLACK, (int(self.x + 10), int(self.y + self.height - 5)), 5)
-            pygame.draw.circle(screen, BLACK, (int(self.x + self.width - 10), int(self.y + self.height - 5)), 5)
-            pygame.draw.circle(screen, (180,180,180), (int(self.x + 10), int(self.y + self.height - 5)), 2)
-            pygame.draw.circle(screen, (180,180,180), (int(self.x + self.width - 10), int(self.y + self.height - 5)), 2)
+            draw.circle(screen, BLACK, (int(self.x + 10), int(self.y + self.height - 5)), 5)
+            draw.circle(screen, BLACK, (int(self.x + self.width - 10), int(self.y + self.height - 5)), 5)
+            draw.circle(screen, (180,180,180), (int(self.x + 10), int(self.y + self.height - 5)), 2)
+            draw.circle(screen, (180,180,180), (int(self.x + self.width - 10), int(self.y + self.height - 5)), 2)
         elif self.type == "trashcan":
             # More detailed NYC trash can
-            pygame.draw.rect(screen, (50, 50, 50), (self.x, self.y, self.width, self.height), border_radius=4)
+            draw.rect(screen, (50, 50, 50), (self.x, self.y, self.width, self.height), border_radius=4)
             # Green lid
-            pygame.draw.rect(screen, (0, 100, 0), (self.x, self.y, self.width, 5), border_radius=2)
+            draw.rect(screen, (0, 100, 0), (self.x, self.y, self.width, 5), border_radius=2)
             # Handles
-            pygame.draw.rect(screen, (120,120,120), (self.x + 2, self.y - 8, self.width - 4, 3), border_radius=2)
+            draw.rect(screen, (120,120,120), (self.x + 2, self.y - 8, self.width - 4, 3), border_radius=2)
         elif self.type == "bench":
             # More detailed park bench
-            pygame.draw.rect(screen, (100, 100, 100), (self.x, self.y, self.width, 10), border_radius=3)
+            draw.rect(screen, (100, 100, 100), (self.x, self.y, self.width, 10), border_radius=3)
             # Legs
-            pygame.draw.rect(screen, (150, 150, 150), (self.x, self.y + 10, 5, 20), border_radius=2)
-            pygame.draw.rect(screen, (150, 150, 150), (self.x + self.width - 5, self.y + 10, 5, 20), border_radius=2)
+            draw.rect(screen, (150, 150, 150), (self.x, self.y + 10, 5, 20), border_radius=2)
+            draw.rect(screen, (150, 150, 150), (self.x + self.width - 5, self.y + 10, 5, 20), border_radius=2)
             # Slats
             for i in range(2):
-                pygame.draw.line(screen, (180, 180, 180), (self.x, self.y + 3 + i*3), (self.x + self.width, self.y + 3 + i*3), 2)
+                draw.line(screen, (180, 180, 180), (self.x, self.y + 3 + i*3), (self.x + self.width, self.y + 3 + i*3), 2)
         else:  # hydrant
             # More detailed fire hydrant
-            pygame.draw.rect(screen, (200, 0, 0), (self.x, self.y, 15, 25), border_radius=4)
+            draw.rect(screen, (200, 0, 0), (self.x, self.y, 15, 25), border_radius=4)
             # Top
-            pygame.draw.rect(screen, (150, 150, 150), (self.x - 5, self.y, 25, 5), border_radius=2)
+            draw.rect(screen, (150, 150, 150), (self.x - 5, self.y, 25, 5), border_radius=2)
             # Side nozzles
-            pygame.draw.circle(screen, (150, 150, 150), (int(self.x + 2), int(self.y + 10)), 3)
-            pygame.draw.circle(screen, (150, 150, 150), (int(self.x + 13), int(self.y + 10)), 3)
+            draw.circle(screen, (150, 150, 150), (int(self.x + 2), int(self.y + 10)), 3)
+            draw.circle(screen, (150, 150, 150), (int(self.x + 13), int(self.y + 10)), 3)
     
     def off_screen(self):
         return self.x + self.width < 0
     
-    def collide(self, character):
-        if character.shield_active:
-            return False
-            
-        return (self.x < character.x + character.width and 
-                self.x + self.width > character.x and
-                self.y < character.y + character.height and 
-                self.y + self.height > character.y)
+    def collide(self, character, path, speeds):
+        # Time of impact within the step, or None; an active shield only
+        # protects the frames it covers
+        return sweep_runner(character, path, speeds, self.x, self.y, self.width, self.height, shield_blocks=True)
 
 # Coin Class
 class Coin:
-    def __init__(self):
+    def __init__(self, y=None):
         self.x = WIDTH
-        self.y = random.randint(100, GROUND_HEIGHT - 30)
+        self.y = random.randint(100, GROUND_HEIGHT - 30) if y is None else y
         self.width = 15
         self.height = 15
         self.collected = False
         self.animation_frame = 0
         self.animation_speed = 0.2
         
-    def update(self):
-        self.x -= SPEED
+    def update(self, distance=None):
+        self.x -= SPEED if distance is None else distance
         self.animation_frame += self.animation_speed
         if self.animation_frame >= 8:  
             self.animation_frame = 0
     
-    def draw(self, screen):
+    def draw(self, screen, scale=1, dx=0):
         if self.collected:
             return
             
+        x, y = (self.x + dx) * scale, self.y * scale
         frame = int(self.animation_frame)
         if frame < 4:
-            pygame.draw.ellipse(screen, GOLD, (self.x, self.y, self.width, self.height))
+            pygame.draw.ellipse(screen, GOLD, (x, y, self.width * scale, self.height * scale))
         else:
-            pygame.draw.circle(screen, GOLD, (self.x + self.width//2, self.y + self.height//2), self.width//2)
+            pygame.draw.circle(screen, GOLD, (x + self.width//2 * scale, y + self.height//2 * scale), self.width//2 * scale)
 
-        pygame.draw.ellipse(screen, YELLOW, (self.x + 3, self.y + 3, 5, 5))
+        pygame.draw.ellipse(screen, YELLOW, (x + 3 * scale, y + 3 * scale, 5 * scale, 5 * scale))
     
     def off_screen(self):
         return self.x + self.width < 0
     
-    def collide(self, character):
+    def collide(self, character, path, speeds):
+        # Time of pickup within the step, or None
         if self.collected:
-            return False
+            return None
             
-        if character.character_type == "ninja" and random.random() < 0.1:        
-            character.shield_active = True
-            character.shield_timer = 180   
-            
-        return (self.x < character.x + character.width and 
-                self.x + self.width > character.x and
-                self.y < character.y + character.height and 
-                self.y + self.height > character.y)
+        return sweep_runner(character, path, speeds, self.x, self.y, self.width, self.height)
 
 #  Class decoration
 class Cloud:
-    def __init__(self):
+    def __init__(self, rng=random):
         self.x = WIDTH
-        self.y = random.randint(50, 150)
-        self.width = random.randint(50, 100)
-        self.speed = random.uniform(1, 3)
+        self.y = rng.randint(50, 150)
+        self.width = rng.randint(50, 100)
+        self.speed = rng.uniform(1, 3)
     
-    def update(self):
-        self.x -= self.speed
+    def update(self, frames=1):
+        self.x -= self.speed * frames
         
-    def draw(self, screen):
-        pygame.draw.ellipse(screen, WHITE, (self.x, self.y, self.width, 30))
-        pygame.draw.ellipse(screen, WHITE, (self.x + 20, self.y - 15, self.width - 20, 40))
+    def draw(self, screen, scale=1, dx=0):
+        x = self.x + dx
+        pygame.draw.ellipse(screen, WHITE, (x * scale, self.y * scale, self.width * scale, 30 * scale))
+        pygame.draw.ellipse(screen, WHITE, ((x + 20) * scale, (self.y - 15) * scale, (self.width - 20) * scale, 40 * scale))
     
     def off_screen(self):
         return self.x + self.width < 0
 
-def draw_flag(nation):
+# --- Particles ---
+# Coin sparkles, running dust and arena weather all live in one set of
+# fixed-capacity NumPy arrays.  Live particles are packed at the front, so
+# update, culling and drawing are a handful of vectorized operations and the
+# cost per frame is capped by MAX_PARTICLES.
+MAX_PARTICLES = 10000
+
+# Per-arena weather emitters: particles per frame, spawn edge, velocity ranges,
+# lifetime in frames, (width, height) in pixels and colors
+ARENA_WEATHER = {
+    "london": {"rate": 6, "edge": "top", "vx": (-1.5, -0.5), "vy": (9, 12), "gravity": 0,
+               "life": 90, "size": (1, 6), "colors": [(150, 160, 180), (180, 190, 210)]},
+    "giza": {"rate": 3, "edge": "right", "vx": (-9, -6), "vy": (-0.3, 0.3), "gravity": 0.01,
+             "life": 200, "size": (2, 2), "colors": [(222, 200, 140), (200, 175, 110)]}
+}
+
+class ParticleSystem:
+    def __init__(self, capacity=MAX_PARTICLES):
+        self.capacity = capacity
+        self.count = 0
+        self.dropped = 0
+        self.pos = np.zeros((capacity, 2), dtype=np.float32)
+        self.vel = np.zeros((capacity, 2), dtype=np.float32)
+        self.gravity = np.zeros(capacity, dtype=np.float32)
+        self.life = np.zeros(capacity, dtype=np.float32)
+        self.size = np.zeros((capacity, 2), dtype=np.int32)
+        self.color = np.zeros((capacity, 3), dtype=np.uint8)
+        self.rng = np.random.default_rng()
+        # For the render thread, allocated on the first snapshot
+        self.snapshots = None
+        self.next_snapshot = 0
+
+    def clear(self):
+        self.count = 0
+
+    def snapshot(self):
+        # Copies what draw() reads into the older of two alternating buffers.
+        # The pipelined renderer has at most one frame in flight when the next
+        # is described, so only the other buffer can still be being drawn.
+        if self.snapshots is None:
+            self.snapshots = [ParticleSnapshot(self.capacity), ParticleSnapshot(self.capacity)]
+        copy = self.snapshots[self.next_snapshot]
+        self.next_snapshot ^= 1
+        n = copy.count = self.count
+        np.copyto(copy.pos[:n], self.pos[:n])
+        np.copyto(copy.size[:n], self.size[:n])
+        np.copyto(copy.color[:n], self.color[:n])
+        return copy
+
+    def emit(self, x, y, n, vx, vy, life, colors, size=(2, 2), gravity=0.0):
+        # x and y may be scalars or arrays of length n; vx and vy are (min, max)
+        # ranges. Anything over the budget is dropped instead of growing.
+        requested = n
+        n = min(n, self.capacity - self.count)
+        self.dropped += requested - max(n, 0)
+        if n <= 0:
+            return 0
+        start, end = self.count, self.count + n
+        self.pos[start:end, 0] = x if np.isscalar(x) else x[:n]
+        self.pos[start:end, 1] = y if np.isscalar(y) else y[:n]
+        self.vel[start:end, 0] = self.rng.uniform(vx[0], vx[1], n)
+        self.vel[start:end, 1] = self.rng.uniform(vy[0], vy[1], n)
+        self.gravity[start:end] = gravity
+        self.life[start:end] = self.rng.uniform(life * 0.5, life, n)
+        self.size[start:end] = size
+        self.color[start:end] = np.asarray(colors, dtype=np.uint8)[self.rng.integers(0, len(colors), n)]
+        self.count = end
+        return n
+
+    def burst(self, x, y, n=20):
+        # Coin pickup sparkle
+        self.emit(x, y, n, (-3, 3), (-4, 1), 30, [GOLD, YELLOW, WHITE], size=(2, 2), gravity=0.2)
+
+    def dust(self, character):
+        if character.on_ground:
+            self.emit(character.x, character.y + 30, 2, (-SPEED * 0.6, -SPEED * 0.2), (-1.2, -0.2), 20,
+                      [(160, 140, 110), (190, 170, 130)], size=(2, 2), gravity=0.08)
+
+    def weather(self, arena_type):
+        config = ARENA_WEATHER.get(arena_type)
+        if config is None:
+            return
+        n = config["rate"]
+        if config["edge"] == "top":
+            x = self.rng.uniform(0, WIDTH + 100, n)
+            y = self.rng.uniform(-20, 0, n)
+        else:
+            x = self.rng.uniform(WIDTH, WIDTH + 20, n)
+            y = self.rng.uniform(GROUND_HEIGHT - 150, GROUND_HEIGHT, n)
+        self.emit(x, y, n, config["vx"], config["vy"], config["life"], config["colors"],
+                  size=config["size"], gravity=config["gravity"])
+
+    def update(self):
+        n = self.count
+        if n == 0:
+            return
+        pos, vel = self.pos[:n], self.vel[:n]
+        vel[:, 1] += self.gravity[:n]
+        pos += vel
+        self.life[:n] -= 1
+
+        # Cull dead, off-screen and grounded particles, keeping survivors packed
+        alive = (self.life[:n] > 0) & (pos[:, 0] > -10) & (pos[:, 0] < WIDTH + 120) & (pos[:, 1] < GROUND_HEIGHT)
+        keep = np.flatnonzero(alive)
+        if len(keep) < n:
+            for buffer in (self.pos, self.vel, self.gravity, self.life, self.size, self.color):
+                buffer[:len(keep)] = buffer[keep]
+            self.count = len(keep)
+
+    def draw(self, surface, scale=1):
+        n = self.count
+        if n == 0:
+            return
+        xs = (self.pos[:n, 0] * scale).astype(np.int32)
+        ys = (self.pos[:n, 1] * scale).astype(np.int32)
+        sizes, colors = self.size[:n], self.color[:n]
+        width, height = surface.get_size()
+        if surface.get_bytesize() == 1:
+            # Palettized frame: write palette indices, looked up once per distinct color
+            packed = pack_rgb(colors)
+            distinct, inverse = np.unique(packed, return_inverse=True)
+            indices = np.array([surface.map_rgb(rgb) for rgb in unpack_rgb(distinct)], dtype=np.uint8)
+            colors = indices[inverse.ravel()]
+            pixels = pygame.surfarray.pixels2d(surface)
+        else:
+            pixels = pygame.surfarray.pixels3d(surface)
+        # One vectorized write per pixel offset inside the largest particle
+        for dx in range(int(sizes[:, 0].max())):
+            for dy in range(int(sizes[:, 1].max())):
+                px, py = xs + dx, ys + dy
+                mask = (sizes[:, 0] > dx) & (sizes[:, 1] > dy) & (px >= 0) & (px < width) & (py >= 0) & (py < height)
+                pixels[px[mask], py[mask]] = colors[mask]
+        del pixels
+
+class ParticleSnapshot:
+    # The arrays ParticleSystem.draw() reads and nothing else: no velocities
+    # and no random generator
+    def __init__(self, capacity):
+        self.count = 0
+        self.pos = np.zeros((capacity, 2), dtype=np.float32)
+        self.size = np.zeros((capacity, 2), dtype=np.int32)
+        self.color = np.zeros((capacity, 3), dtype=np.uint8)
+
+    draw = ParticleSystem.draw
+
+particles = ParticleSystem()
+
+def draw_flag(nation, surface):
     flag_w, flag_h = 90, 60
     flag_x, flag_y = WIDTH - flag_w - 20, 20
     
     if nation == "egypt":
         # Red, White, Black horizontal stripes
-        pygame.draw.rect(screen, (206, 17, 38), (flag_x, flag_y, flag_w, flag_h//3))
-        pygame.draw.rect(screen, WHITE, (flag_x, flag_y + flag_h//3, flag_w, flag_h//3))
-        pygame.draw.rect(screen, BLACK, (flag_x, flag_y + 2*flag_h//3, flag_w, flag_h//3))
+        pygame.draw.rect(surface, (206, 17, 38), (flag_x, flag_y, flag_w, flag_h//3))
+        pygame.draw.rect(surface, WHITE, (flag_x, flag_y + flag_h//3, flag_w, flag_h//3))
+        pygame.draw.rect(surface, BLACK, (flag_x, flag_y + 2*flag_h//3, flag_w, flag_h//3))
         # Simplified Eagle of Saladin
-        pygame.draw.circle(screen, (192, 147, 0), (int(flag_x + flag_w/2), int(flag_y + flag_h/2)), 5)
+        pygame.draw.circle(surface, (192, 147, 0), (int(flag_x + flag_w/2), int(flag_y + flag_h/2)), 5)
     
     elif nation == "uk":
         # Blue field
-        pygame.draw.rect(screen, (1, 33, 105), (flag_x, flag_y, flag_w, flag_h))
+        pygame.draw.rect(surface, (1, 33, 105), (flag_x, flag_y, flag_w, flag_h))
         # White diagonals (St. Andrew's Saltire)
-        pygame.draw.line(screen, WHITE, (flag_x, flag_y), (flag_x + flag_w, flag_y + flag_h), 12)
-        pygame.draw.line(screen, WHITE, (flag_x, flag_y + flag_h), (flag_x + flag_w, flag_y), 12)
+        pygame.draw.line(surface, WHITE, (flag_x, flag_y), (flag_x + flag_w, flag_y + flag_h), 12)
+        pygame.draw.line(surface, WHITE, (flag_x, flag_y + flag_h), (flag_x + flag_w, flag_y), 12)
         # Red diagonals (St. Patrick's Saltire)
-        pygame.draw.line(screen, (206, 17, 38), (flag_x, flag_y), (flag_x + flag_w, flag_y + flag_h), 6)
-        pygame.draw.line(screen, (206, 17, 38), (flag_x, flag_y + flag_h), (flag_x + flag_w, flag_y), 6)
+        pygame.draw.line(surface, (206, 17, 38), (flag_x, flag_y), (flag_x + flag_w, flag_y + flag_h), 6)
+        pygame.draw.line(surface, (206, 17, 38), (flag_x, flag_y + flag_h), (flag_x + flag_w, flag_y), 6)
         # White cross
-        pygame.draw.rect(screen, WHITE, (flag_x, flag_y + flag_h//2 - 10, flag_w, 20))
-        pygame.draw.rect(screen, WHITE, (flag_x + flag_w//2 - 10, flag_y, 20, flag_h))
+        pygame.draw.rect(surface, WHITE, (flag_x, flag_y + flag_h//2 - 10, flag_w, 20))
+        pygame.draw.rect(surface, WHITE, (flag_x + flag_w//2 - 10, flag_y, 20, flag_h))
         # Red cross (St. George's Cross)
-        pygame.draw.rect(screen, (206, 17, 38), (flag_x, flag_y + flag_h//2 - 5, flag_w, 10))
-        pygame.draw.rect(screen, (206, 17, 38), (flag_x + flag_w//2 - 5, flag_y, 10, flag_h))
+        pygame.draw.rect(surface, (206, 17, 38), (flag_x, flag_y + flag_h//2 - 5, flag_w, 10))
+        pygame.draw.rect(surface, (206, 17, 38), (flag_x + flag_w//2 - 5, flag_y, 10, flag_h))
 
     elif nation == "france":
         # Blue, White, Red vertical stripes
-        pygame.draw.rect(screen, (0, 85, 164), (flag_x, flag_y, flag_w//3, flag_h))
-        pygame.draw.rect(screen, WHITE, (flag_x + flag_w//3, flag_y, flag_w//3, flag_h))
-        pygame.draw.rect(screen, (239, 65, 53), (flag_x + 2*flag_w//3, flag_y, flag_w//3, flag_h))
+        pygame.draw.rect(surface, (0, 85, 164), (flag_x, flag_y, flag_w//3, flag_h))
+        pygame.draw.rect(surface, WHITE, (flag_x + flag_w//3, flag_y, flag_w//3, flag_h))
+        pygame.draw.rect(surface, (239, 65, 53), (flag_x + 2*flag_w//3, flag_y, flag_w//3, flag_h))
 
     elif nation == "italy":
         # Green, White, Red vertical stripes
-        pygame.draw.rect(screen, (0, 146, 70), (flag_x, flag_y, flag_w//3, flag_h))
-        pygame.draw.rect(screen, WHITE, (flag_x + flag_w//3, flag_y, flag_w//3, flag_h))
-        pygame.draw.rect(screen, (206, 43, 55), (flag_x + 2*flag_w//3, flag_y, flag_w//3, flag_h))
+        pygame.draw.rect(surface, (0, 146, 70), (flag_x, flag_y, flag_w//3, flag_h))
+        pygame.draw.rect(surface, WHITE, (flag_x + flag_w//3, flag_y, flag_w//3, flag_h))
+        pygame.draw.rect(surface, (206, 43, 55), (flag_x + 2*flag_w//3, flag_y, flag_w//3, flag_h))
 
     elif nation == "usa":
         # Red and white stripes
         stripe_h = flag_h / 13
         for i in range(13):
             color = (210, 16, 52) if i % 2 == 0 else WHITE
-            pygame.draw.rect(screen, color, (flag_x, flag_y + i * stripe_h, flag_w, stripe_h))
+            pygame.draw.rect(surface, color, (flag_x, flag_y + i * stripe_h, flag_w, stripe_h))
         # Blue canton
-        pygame.draw.rect(screen, (60, 59, 110), (flag_x, flag_y, flag_w * 2//5, flag_h * 7//13))
+        pygame.draw.rect(surface, (60, 59, 110), (flag_x, flag_y, flag_w * 2//5, flag_h * 7//13))
         # Simplified stars
         for i in range(3):
             for j in range(3):
-                pygame.draw.circle(screen, WHITE, (flag_x + 10 + i*10, flag_y + 8 + j * 8), 1)
+                pygame.draw.circle(surface, WHITE, (flag_x + 10 + i*10, flag_y + 8 + j * 8), 1)
+
+# --- Parallax Backgrounds ---
+# Every arena is split into a static sky plus far, mid and near layers.  Each
+# layer is drawn once into a seamless strip surface, so per frame a layer costs
+# at most two blits no matter how much detail it has.
+PARALLAX_COLORKEY = (255, 0, 255)
+class ParallaxLayer:
+    def __init__(self, draw_func, factor, detail=True, scale=1, palette=None, name=None):
+        self.factor = factor
+        self.scale = scale
+        self.width = WIDTH
+        self.y = 0
+        bundled = asset_bundle.sprite(name) if asset_bundle is not None and name else None
+        if bundled is not None:
+            # Already baked: the strip is the mapped bundle data
+            self.strip, (_, self.y) = bundled
+        else:
+            self.strip = self.bake(draw_func, detail)
+        if palette is not None:
+            self.strip = palettize(self.strip, palette)
+        if scale != 1:
+            self.rescale(scale)
+
+    def cache_bytes(self):
+        return cache_bytes(self.strip)
+
+    def bake(self, draw_func, detail):
+        if self.factor == 0:
+            # Sky layer: opaque, never scrolls
+            strip = pygame.Surface((WIDTH, HEIGHT))
+            draw_func(strip, detail)
+            return strip.convert()
+
+        # Draw onto a double-width canvas and fold the right half back over the
+        # left half, so anything crossing the right edge wraps around
+        canvas = pygame.Surface((WIDTH * 2, HEIGHT))
+        canvas.fill(PARALLAX_COLORKEY)
+        canvas.set_colorkey(PARALLAX_COLORKEY)
+        draw_func(canvas, detail)
+
+        folded = pygame.Surface((WIDTH, HEIGHT))
+        folded.fill(PARALLAX_COLORKEY)
+        folded.set_colorkey(PARALLAX_COLORKEY)
+        folded.blit(canvas, (0, 0), (0, 0, WIDTH, HEIGHT))
+        folded.blit(canvas, (0, 0), (WIDTH, 0, WIDTH, HEIGHT))
+
+        # Keep only the rows the layer actually uses
+        bounds = folded.get_bounding_rect()
+        self.y = bounds.y
+        strip = folded.subsurface((0, bounds.y, WIDTH, max(1, bounds.height))).copy()
+        strip.set_colorkey(PARALLAX_COLORKEY, pygame.RLEACCEL)
+        return strip.convert()
+
+    def rescale(self, scale):
+        # Reduced render scale: shrink the baked strip with nearest-neighbour
+        # sampling so the colorkey never bleeds into the edges
+        width = max(1, int(self.width * scale))
+        height = max(1, int(self.strip.get_height() * scale))
+        colorkey = self.strip.get_colorkey()
+        self.strip = pygame.transform.scale(self.strip, (width, height))
+        if colorkey:
+            self.strip.set_colorkey(colorkey, pygame.RLEACCEL)
+        self.width = width
+        self.y = int(self.y * scale)
+
+    def draw(self, surface, scroll):
+        if self.factor == 0:
+            surface.blit(self.strip, (0, 0))
+            return
+        offset = int(scroll * self.factor * self.scale) % self.width
+        surface.blit(self.strip, (-offset, self.y))
+        if offset:
+            surface.blit(self.strip, (self.width - offset, self.y))
+
+def build_parallax_layers(arena_type, detail=True, scale=1):
+    # Every background is built here, on the main thread or the cache baker,
+    # so each one is read from the asset bundle when it is there and is
+    # 8-bit in the arena's palette when runs are palettized
+    palette = arena_palette(arena_type) if palettized else None
+    return [ParallaxLayer(draw_func, factor, detail, scale, palette, background_asset_name(arena_type, detail, index))
+            for index, (draw_func, factor) in enumerate(ARENA_LAYERS[arena_type])]
+
+def get_parallax_layers(arena_type, detail=True, scale=1):
+    key = (arena_type, detail, scale)
+    layers = surface_cache.get("background", key)
+    if layers is None:
+        layers = surface_cache.put("background", key, build_parallax_layers(arena_type, detail, scale))
+    return layers
+
+# --- Palettized Rendering ---
+# Low-memory mode for old hardware (play --palettized). Each arena gets one
+# 256-color palette: entry 0 is the parallax colorkey, then a ramp sampled
+# from the sky gradient, then the arena's flat colors, most used first, with
+# everything a run draws over the background (characters, obstacles, coins,
+# particles) always included. Background strips and the frame a run is drawn
+# into are 8-bit with that palette, a quarter of the 32-bit size, and only
+# become display colors when the frame is presented.
+PALETTE_SIZE = 256
+PALETTE_RAMP = 48
+# Drawn over every arena: coins and sparkles, running dust, the shield, clouds
+RUN_COLORS = [GOLD, YELLOW, WHITE, BLACK, (100, 200, 255), (160, 140, 110), (190, 170, 130)]
+# Colors every run draws must beat any amount of background
+RUN_COLOR_WEIGHT = WIDTH * HEIGHT
+palettized = False
+arena_palettes = {}
+
+def pack_rgb(rgb):
+    # (..., 3) array of colors -> (...) array of 0xRRGGBB
+    rgb = np.asarray(rgb, dtype=np.int32)
+    return (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+
+def unpack_rgb(packed):
+    return [((int(c) >> 16) & 255, (int(c) >> 8) & 255, int(c) & 255) for c in packed]
+
+def arena_palette(arena_type):
+    palette = arena_palettes.get(arena_type)
+    if palette is not None:
+        return palette
+    start = time.perf_counter()
+    counts = {}
+    ramp = []
+    gradient = set()
+    for detail in (True, False):
+        for index, (draw_func, factor) in enumerate(ARENA_LAYERS[arena_type]):
+            layer = ParallaxLayer(draw_func, factor, detail, name=background_asset_name(arena_type, detail, index))
+            packed = pack_rgb(pygame.surfarray.array3d(layer.strip))
+            if factor == 0 and detail:
+                # The sky gradient is the most common color of each row
+                rows = []
+                for y in range(packed.shape[1]):
+                    values, row_counts = np.unique(packed[:, y], return_counts=True)
+                    rows.append(int(values[row_counts.argmax()]))
+                rows = list(dict.fromkeys(rows))
+                if len(rows) > PALETTE_RAMP:
+                    ramp = [rows[round(i * (len(rows) - 1) / (PALETTE_RAMP - 1))] for i in range(PALETTE_RAMP)]
+                    gradient = set(rows)
+            values, value_counts = np.unique(packed, return_counts=True)
+            for value, count in zip(values.tolist(), value_counts.tolist()):
+                if value not in gradient:
+                    counts[value] = counts.get(value, 0) + count
+    
+    def use(color, weight=RUN_COLOR_WEIGHT):
+        value = int(pack_rgb(color[:3]))
+        counts[value] = counts.get(value, 0) + weight
+    
+    for character in CHARACTERS:
+        for leg_frame in range(4):
+            for packed_rgba in get_character_display_list(character["type"], leg_frame).colors:
+                use(unpack_rgb([packed_rgba >> 8])[0])
+    kinds = {}
+    for width, height, kind in chunk_library.obstacle_shapes():
+        kinds.setdefault(kind, (width, height, kind, 0))
+    for shape in kinds.values():
+        for packed_rgba in get_obstacle_display_list(Obstacle(0, arena_type, shape)).colors:
+            use(unpack_rgb([packed_rgba >> 8])[0])
+    for color in RUN_COLORS + ARENA_WEATHER.get(arena_type, {}).get("colors", []):
+        use(color)
+    
+    counts.pop(int(pack_rgb(PARALLAX_COLORKEY)), None)
+    flat = sorted(counts, key=lambda value: -counts[value])[:PALETTE_SIZE - 1 - len(ramp)]
+    palette = [PARALLAX_COLORKEY] + unpack_rgb(ramp) + unpack_rgb(flat)
+    palette += [BLACK] * (PALETTE_SIZE - len(palette))
+    arena_palettes[arena_type] = palette
+    logger.info("Palette for %s: %d-entry sky ramp, %d of %d flat colors, in %.0f ms", arena_type, len(ramp),
+                len(flat), len(counts), (time.perf_counter() - start) * 1000)
+    return palette
+
+def palettize(surface, palette):
+    # An 8-bit copy of a surface in the palette, each color going to its
+    # nearest entry; only the colorkey itself maps to entry 0
+    packed = pack_rgb(pygame.surfarray.array3d(surface))
+    values, inverse = np.unique(packed, return_inverse=True)
+    rgb = np.stack([(values >> 16) & 255, (values >> 8) & 255, values & 255], axis=1)
+    entries = np.asarray(palette[1:], dtype=np.int32)
+    nearest = ((rgb[:, None, :] - entries[None, :, :]) ** 2).sum(axis=2).argmin(axis=1) + 1
+    nearest[values == pack_rgb(PARALLAX_COLORKEY)] = 0
+    result = pygame.Surface(surface.get_size(), 0, 8)
+    result.set_palette(palette)
+    pygame.surfarray.blit_array(result, nearest[inverse.ravel()].reshape(packed.shape).astype(np.uint8))
+    if surface.get_colorkey() is not None:
+        result.set_colorkey(PARALLAX_COLORKEY, pygame.RLEACCEL)
+    return result
 
 # Function to draw different city backgrounds
-def draw_background(arena_type="giza"):
-    if arena_type == "giza":
-        draw_giza_background()
-    elif arena_type == "london":
-        draw_london_background()
-    elif arena_type == "paris":
-        draw_paris_background()
-    elif arena_type == "rome":
-        draw_rome_background()
-    elif arena_type == "newyork":
-        draw_newyork_background()
-
-def draw_giza_background():
+def draw_background(arena_type="giza", scroll=0, surface=None, detail=True, scale=1):
+    if surface is None:
+        surface = screen
+    for layer in get_parallax_layers(arena_type, detail, scale):
+        layer.draw(surface, scroll)
+
+def draw_giza_sky(surface, detail=True):
     # Modern gradient background
     for y in range(HEIGHT):
         color = (
@@ -1009,41 +1819,48 @@ def draw_giza_background():
             int(MODERN_GRADIENT_TOP[1] * (1 - y / HEIGHT) + MODERN_GRADIENT_BOTTOM[1] * (y / HEIGHT)),
             int(MODERN_GRADIENT_TOP[2] * (1 - y / HEIGHT) + MODERN_GRADIENT_BOTTOM[2] * (y / HEIGHT))
         )
-        pygame.draw.line(screen, color, (0, y), (WIDTH, y))
-    
-    draw_flag("egypt")
-    
+        pygame.draw.line(surface, color, (0, y), (WIDTH, y))
+
+    draw_flag("egypt", surface)
+
     # Sun
-    pygame.draw.circle(screen, YELLOW, (WIDTH - 180, 80), 40)
-    
+    pygame.draw.circle(surface, YELLOW, (WIDTH - 180, 80), 40)
+
+def draw_giza_far(surface, detail=True):
     # Parallax distant pyramids
-    pygame.draw.polygon(screen, (210, 180, 80), [(80, GROUND_HEIGHT), (180, GROUND_HEIGHT - 120), (280, GROUND_HEIGHT)])
-    pygame.draw.polygon(screen, (180, 150, 60), [(200, GROUND_HEIGHT), (320, GROUND_HEIGHT - 100), (440, GROUND_HEIGHT)])
+    pygame.draw.polygon(surface, (210, 180, 80), [(80, GROUND_HEIGHT), (180, GROUND_HEIGHT - 120), (280, GROUND_HEIGHT)])
+    pygame.draw.polygon(surface, (180, 150, 60), [(200, GROUND_HEIGHT), (320, GROUND_HEIGHT - 100), (440, GROUND_HEIGHT)])
+
+def draw_giza_mid(surface, detail=True):
     # Midground pyramids
-    pygame.draw.polygon(screen, (218, 165, 32), [(50, GROUND_HEIGHT), (200, GROUND_HEIGHT - 200), (350, GROUND_HEIGHT)])
-    pygame.draw.polygon(screen, (184, 134, 11), [(250, GROUND_HEIGHT), (400, GROUND_HEIGHT - 220), (550, GROUND_HEIGHT)])
-    pygame.draw.polygon(screen, (218, 165, 32), [(450, GROUND_HEIGHT), (550, GROUND_HEIGHT - 150), (650, GROUND_HEIGHT)])
-    # Foreground sand dunes
-    for i in range(0, WIDTH, 120):
-        pygame.draw.ellipse(screen, (210, 190, 120), (i, GROUND_HEIGHT + 30, 180, 60))
+    pygame.draw.polygon(surface, (218, 165, 32), [(50, GROUND_HEIGHT), (200, GROUND_HEIGHT - 200), (350, GROUND_HEIGHT)])
+    pygame.draw.polygon(surface, (184, 134, 11), [(250, GROUND_HEIGHT), (400, GROUND_HEIGHT - 220), (550, GROUND_HEIGHT)])
+    pygame.draw.polygon(surface, (218, 165, 32), [(450, GROUND_HEIGHT), (550, GROUND_HEIGHT - 150), (650, GROUND_HEIGHT)])
+
+def draw_giza_near(surface, detail=True):
     # Palm trees
     for i in range(3):
         base_x = 150 + i * 250
-        pygame.draw.rect(screen, (139, 69, 19), (base_x, GROUND_HEIGHT - 60, 10, 60))
+        pygame.draw.rect(surface, (139, 69, 19), (base_x, GROUND_HEIGHT - 60, 10, 60))
         for j in range(5):
             angle = j * 72
             end_x = base_x + 30 * math.cos(math.radians(angle))
             end_y = GROUND_HEIGHT - 60 + 30 * math.sin(math.radians(angle))
-            pygame.draw.line(screen, (34, 139, 34), (base_x + 5, GROUND_HEIGHT - 60), (end_x, end_y), 5)
+            pygame.draw.line(surface, (34, 139, 34), (base_x + 5, GROUND_HEIGHT - 60), (end_x, end_y), 5)
     # Sphinx (more detail)
-    pygame.draw.rect(screen, (184, 134, 11), (WIDTH - 200, GROUND_HEIGHT - 50, 100, 50))
-    pygame.draw.circle(screen, (184, 134, 11), (WIDTH - 200, GROUND_HEIGHT - 25), 25)
-    pygame.draw.rect(screen, (160, 120, 10), (WIDTH - 170, GROUND_HEIGHT - 30, 40, 20))
-    pygame.draw.circle(screen, (120, 80, 10), (WIDTH - 170, GROUND_HEIGHT - 20), 8)
-    # Ground (sand)
-    pygame.draw.rect(screen, (194, 178, 128), (0, GROUND_HEIGHT, WIDTH, HEIGHT - GROUND_HEIGHT))
-
-def draw_london_background():
+    pygame.draw.rect(surface, (184, 134, 11), (WIDTH - 200, GROUND_HEIGHT - 50, 100, 50))
+    pygame.draw.circle(surface, (184, 134, 11), (WIDTH - 200, GROUND_HEIGHT - 25), 25)
+    pygame.draw.rect(surface, (160, 120, 10), (WIDTH - 170, GROUND_HEIGHT - 30, 40, 20))
+    pygame.draw.circle(surface, (120, 80, 10), (WIDTH - 170, GROUND_HEIGHT - 20), 8)
+
+def draw_giza_ground(surface, detail=True):
+    # Foreground sand dunes
+    for i in range(0, WIDTH, 120):
+        pygame.draw.ellipse(surface, (210, 190, 120), (i, GROUND_HEIGHT + 30, 180, 60))
+    # Ground (sand), spanning the whole canvas so it also covers the dune that wraps around
+    pygame.draw.rect(surface, (194, 178, 128), (0, GROUND_HEIGHT, surface.get_width(), HEIGHT - GROUND_HEIGHT))
+
+def draw_london_sky(surface, detail=True):
     # Overcast sky gradient
     sky_top = (170, 180, 190)
     sky_bottom = (200, 210, 220)
@@ -1053,46 +1870,56 @@ def draw_london_background():
             int(sky_top[1] * (1 - y / HEIGHT) + sky_bottom[1] * (y / HEIGHT)),
             int(sky_top[2] * (1 - y / HEIGHT) + sky_bottom[2] * (y / HEIGHT))
         )
-        pygame.draw.line(screen, color, (0, y), (WIDTH, y))
-    draw_flag("uk")
+        pygame.draw.line(surface, color, (0, y), (WIDTH, y))
+    draw_flag("uk", surface)
+
+def draw_london_far(surface, detail=True):
     # Distant skyline (silhouettes)
     for i in range(6):
         x = 100 + i * 120
         w = 60 + (i % 2) * 30
         h = 80 + (i % 3) * 40
-        pygame.draw.rect(screen, (120, 120, 130), (x, GROUND_HEIGHT - h - 80, w, h))
+        pygame.draw.rect(surface, (120, 120, 130), (x, GROUND_HEIGHT - h - 80, w, h))
         for j in range(3):
-            pygame.draw.rect(screen, (180, 180, 200), (x + 10 + j * 15, GROUND_HEIGHT - h - 80 + 10, 10, 20))
+            pygame.draw.rect(surface, (180, 180, 200), (x + 10 + j * 15, GROUND_HEIGHT - h - 80 + 10, 10, 20))
     # The Shard Silhouette
     shard_color = (100, 105, 110)
-    pygame.draw.polygon(screen, shard_color, [(WIDTH-250, GROUND_HEIGHT), (WIDTH-220, GROUND_HEIGHT-300), (WIDTH-190, GROUND_HEIGHT)])
+    pygame.draw.polygon(surface, shard_color, [(WIDTH-250, GROUND_HEIGHT), (WIDTH-220, GROUND_HEIGHT-300), (WIDTH-190, GROUND_HEIGHT)])
+
+def draw_london_mid(surface, detail=True):
     # Big Ben in distance (with clock)
-    pygame.draw.rect(screen, (150, 150, 100), (WIDTH - 450, GROUND_HEIGHT - 200, 40, 200))
-    pygame.draw.rect(screen, (200, 200, 150), (WIDTH - 450, GROUND_HEIGHT - 220, 40, 20))
-    pygame.draw.circle(screen, (255,255,255), (WIDTH-430, GROUND_HEIGHT-210), 10)
-    pygame.draw.circle(screen, (0,0,0), (WIDTH-430, GROUND_HEIGHT-210), 8, 2)
+    pygame.draw.rect(surface, (150, 150, 100), (WIDTH - 450, GROUND_HEIGHT - 200, 40, 200))
+    pygame.draw.rect(surface, (200, 200, 150), (WIDTH - 450, GROUND_HEIGHT - 220, 40, 20))
+    if detail:
+        pygame.draw.circle(surface, (255,255,255), (WIDTH-430, GROUND_HEIGHT-210), 10)
+        pygame.draw.circle(surface, (0,0,0), (WIDTH-430, GROUND_HEIGHT-210), 8, 2)
     # Tower Bridge (with arches)
     bridge_color = (160, 140, 120)
-    pygame.draw.rect(screen, bridge_color, (100, GROUND_HEIGHT - 150, 60, 150))
-    pygame.draw.rect(screen, bridge_color, (240, GROUND_HEIGHT - 150, 60, 150))
-    pygame.draw.rect(screen, bridge_color, (100, GROUND_HEIGHT - 180, 200, 30))
-    for i in range(3):
-        pygame.draw.arc(screen, (120, 120, 120), (120 + i*60, GROUND_HEIGHT - 60, 40, 40), math.pi, 2*math.pi, 3)
+    pygame.draw.rect(surface, bridge_color, (100, GROUND_HEIGHT - 150, 60, 150))
+    pygame.draw.rect(surface, bridge_color, (240, GROUND_HEIGHT - 150, 60, 150))
+    pygame.draw.rect(surface, bridge_color, (100, GROUND_HEIGHT - 180, 200, 30))
+    if detail:
+        for i in range(3):
+            pygame.draw.arc(surface, (120, 120, 120), (120 + i*60, GROUND_HEIGHT - 60, 40, 40), math.pi, 2*math.pi, 3)
+
+def draw_london_near(surface, detail=True):
     # Lamp posts
     for i in range(4):
         lx = 180 + i*120
-        pygame.draw.rect(screen, (80,80,80), (lx, GROUND_HEIGHT - 60, 8, 60))
-        pygame.draw.circle(screen, (255,255,180), (lx+4, GROUND_HEIGHT - 60), 8)
+        pygame.draw.rect(surface, (80,80,80), (lx, GROUND_HEIGHT - 60, 8, 60))
+        pygame.draw.circle(surface, (255,255,180), (lx+4, GROUND_HEIGHT - 60), 8)
     # Double-decker bus decoration (with windows)
-    pygame.draw.rect(screen, (200,0,0), (WIDTH - 600, GROUND_HEIGHT - 40, 80, 40))
-    pygame.draw.rect(screen, (150,0,0), (WIDTH - 600, GROUND_HEIGHT - 25, 80, 15))
+    pygame.draw.rect(surface, (200,0,0), (WIDTH - 600, GROUND_HEIGHT - 40, 80, 40))
+    pygame.draw.rect(surface, (150,0,0), (WIDTH - 600, GROUND_HEIGHT - 25, 80, 15))
     for i in range(3):
-        pygame.draw.rect(screen, (255,255,255), (WIDTH-590+i*25, GROUND_HEIGHT-35, 20, 12))
+        pygame.draw.rect(surface, (255,255,255), (WIDTH-590+i*25, GROUND_HEIGHT-35, 20, 12))
+
+def draw_london_ground(surface, detail=True):
     # Ground (street)
-    pygame.draw.rect(screen, (100, 100, 100), (0, GROUND_HEIGHT, WIDTH, HEIGHT - GROUND_HEIGHT))
-    pygame.draw.line(screen, YELLOW, (0, GROUND_HEIGHT + 20), (WIDTH, GROUND_HEIGHT + 20), 2)
+    pygame.draw.rect(surface, (100, 100, 100), (0, GROUND_HEIGHT, WIDTH, HEIGHT - GROUND_HEIGHT))
+    pygame.draw.line(surface, YELLOW, (0, GROUND_HEIGHT + 20), (WIDTH, GROUND_HEIGHT + 20), 2)
 
-def draw_paris_background():
+def draw_paris_sky(surface, detail=True):
     # Dusky sky gradient
     sky_top = (70, 80, 120)
     sky_bottom = (230, 140, 160)
@@ -1102,44 +1929,52 @@ def draw_paris_background():
             int(sky_top[1] * (1 - y / HEIGHT) + sky_bottom[1] * (y / HEIGHT)),
             int(sky_top[2] * (1 - y / HEIGHT) + sky_bottom[2] * (y / HEIGHT))
         )
-        pygame.draw.line(screen, color, (0, y), (WIDTH, y))
-    draw_flag("france")
+        pygame.draw.line(surface, color, (0, y), (WIDTH, y))
+    draw_flag("france", surface)
+
+def draw_paris_far(surface, detail=True):
     # Distant skyline
     for i in range(5):
         x = 80 + i * 140
         w = 60 + (i % 2) * 20
         h = 70 + (i % 3) * 30
-        pygame.draw.rect(screen, (120, 120, 140), (x, GROUND_HEIGHT - h - 90, w, h))
+        pygame.draw.rect(surface, (120, 120, 140), (x, GROUND_HEIGHT - h - 90, w, h))
         for j in range(2):
-            pygame.draw.rect(screen, (200, 200, 220), (x + 10 + j * 20, GROUND_HEIGHT - h - 80, 12, 18))
+            pygame.draw.rect(surface, (200, 200, 220), (x + 10 + j * 20, GROUND_HEIGHT - h - 80, 12, 18))
+
+def draw_paris_mid(surface, detail=True):
     # Notre Dame (with towers)
     cathedral_color = (60, 60, 80)
-    pygame.draw.rect(screen, cathedral_color, (100, GROUND_HEIGHT - 180, 80, 180))
-    pygame.draw.rect(screen, cathedral_color, (110, GROUND_HEIGHT - 220, 20, 40))
-    pygame.draw.rect(screen, cathedral_color, (150, GROUND_HEIGHT - 220, 20, 40))
-    pygame.draw.circle(screen, (200,200,200), (140, GROUND_HEIGHT-200), 10)
+    pygame.draw.rect(surface, cathedral_color, (100, GROUND_HEIGHT - 180, 80, 180))
+    pygame.draw.rect(surface, cathedral_color, (110, GROUND_HEIGHT - 220, 20, 40))
+    pygame.draw.rect(surface, cathedral_color, (150, GROUND_HEIGHT - 220, 20, 40))
+    pygame.draw.circle(surface, (200,200,200), (140, GROUND_HEIGHT-200), 10)
     # Eiffel Tower in distance (with more detail)
     eiffel_color = (50, 50, 70)
-    pygame.draw.rect(screen, eiffel_color, (WIDTH - 150, GROUND_HEIGHT - 250, 10, 250))
-    pygame.draw.polygon(screen, eiffel_color, [(WIDTH - 170, GROUND_HEIGHT - 50), (WIDTH - 145, GROUND_HEIGHT - 250), (WIDTH - 120, GROUND_HEIGHT - 50)])
-    pygame.draw.rect(screen, eiffel_color, (WIDTH - 170, GROUND_HEIGHT - 150, 50, 10))
+    pygame.draw.rect(surface, eiffel_color, (WIDTH - 150, GROUND_HEIGHT - 250, 10, 250))
+    pygame.draw.polygon(surface, eiffel_color, [(WIDTH - 170, GROUND_HEIGHT - 50), (WIDTH - 145, GROUND_HEIGHT - 250), (WIDTH - 120, GROUND_HEIGHT - 50)])
+    pygame.draw.rect(surface, eiffel_color, (WIDTH - 170, GROUND_HEIGHT - 150, 50, 10))
     for i in range(3):
-        pygame.draw.line(screen, (80,80,100), (WIDTH-170+10*i, GROUND_HEIGHT-50), (WIDTH-145, GROUND_HEIGHT-250), 2)
+        pygame.draw.line(surface, (80,80,100), (WIDTH-170+10*i, GROUND_HEIGHT-50), (WIDTH-145, GROUND_HEIGHT-250), 2)
     # Louvre Museum (with glass pyramid)
     louvre_color = (80, 80, 100)
-    pygame.draw.rect(screen, louvre_color, (300, GROUND_HEIGHT - 120, 250, 120))
-    pygame.draw.polygon(screen, (180,180,220), [(425, GROUND_HEIGHT-120), (400, GROUND_HEIGHT-60), (450, GROUND_HEIGHT-60)])
+    pygame.draw.rect(surface, louvre_color, (300, GROUND_HEIGHT - 120, 250, 120))
+    pygame.draw.polygon(surface, (180,180,220), [(425, GROUND_HEIGHT-120), (400, GROUND_HEIGHT-60), (450, GROUND_HEIGHT-60)])
+
+def draw_paris_near(surface, detail=True):
     # River Seine
-    pygame.draw.rect(screen, (100, 120, 150), (0, GROUND_HEIGHT-20, WIDTH, 40))
+    pygame.draw.rect(surface, (100, 120, 150), (0, GROUND_HEIGHT-20, WIDTH, 40))
     # Street lamps
     for i in range(3):
         lx = 350 + i*120
-        pygame.draw.rect(screen, (80,80,80), (lx, GROUND_HEIGHT - 60, 8, 60))
-        pygame.draw.circle(screen, (255,255,180), (lx+4, GROUND_HEIGHT - 60), 8)
+        pygame.draw.rect(surface, (80,80,80), (lx, GROUND_HEIGHT - 60, 8, 60))
+        pygame.draw.circle(surface, (255,255,180), (lx+4, GROUND_HEIGHT - 60), 8)
+
+def draw_paris_ground(surface, detail=True):
     # Ground (street)
-    pygame.draw.rect(screen, (60, 60, 60), (0, GROUND_HEIGHT, WIDTH, HEIGHT - GROUND_HEIGHT))
+    pygame.draw.rect(surface, (60, 60, 60), (0, GROUND_HEIGHT, WIDTH, HEIGHT - GROUND_HEIGHT))
 
-def draw_rome_background():
+def draw_rome_sky(surface, detail=True):
     # Golden hour sky
     sky_top = (255, 180, 80)
     sky_bottom = (255, 120, 100)
@@ -1149,39 +1984,51 @@ def draw_rome_background():
             int(sky_top[1] * (1 - y / HEIGHT) + sky_bottom[1] * (y / HEIGHT)),
             int(sky_top[2] * (1 - y / HEIGHT) + sky_bottom[2] * (y / HEIGHT))
         )
-        pygame.draw.line(screen, color, (0, y), (WIDTH, y))
-    draw_flag("italy")
+        pygame.draw.line(surface, color, (0, y), (WIDTH, y))
+    draw_flag("italy", surface)
+
+def draw_rome_far(surface, detail=True):
     # Distant skyline
     for i in range(4):
         x = 120 + i * 180
         w = 70 + (i % 2) * 30
         h = 60 + (i % 3) * 40
-        pygame.draw.rect(screen, (160, 150, 130), (x, GROUND_HEIGHT - h - 100, w, h))
+        pygame.draw.rect(surface, (160, 150, 130), (x, GROUND_HEIGHT - h - 100, w, h))
         for j in range(2):
-            pygame.draw.rect(screen, (200, 200, 200), (x + 10 + j * 20, GROUND_HEIGHT - h - 90, 12, 18))
+            pygame.draw.rect(surface, (200, 200, 200), (x + 10 + j * 20, GROUND_HEIGHT - h - 90, 12, 18))
+
+def draw_rome_mid(surface, detail=True):
     # Pantheon Dome (with columns)
     pantheon_color = (160, 150, 130)
-    pygame.draw.ellipse(screen, pantheon_color, (100, GROUND_HEIGHT-150, 200, 150))
-    pygame.draw.rect(screen, pantheon_color, (100, GROUND_HEIGHT-75, 200, 75))
+    pygame.draw.ellipse(surface, pantheon_color, (100, GROUND_HEIGHT-150, 200, 150))
+    pygame.draw.rect(surface, pantheon_color, (100, GROUND_HEIGHT-75, 200, 75))
     for i in range(6):
-        pygame.draw.rect(screen, (200,200,200), (120+i*25, GROUND_HEIGHT-75, 10, 60))
+        pygame.draw.rect(surface, (200,200,200), (120+i*25, GROUND_HEIGHT-75, 10, 60))
     # Colosseum in distance (with arches)
     colosseum_color = (180, 160, 140)
-    pygame.draw.ellipse(screen, colosseum_color, (WIDTH - 300, GROUND_HEIGHT - 120, 180, 120))
-    pygame.draw.ellipse(screen, (0,0,0,50), (WIDTH - 300, GROUND_HEIGHT - 120, 180, 120), 10)
+    pygame.draw.ellipse(surface, colosseum_color, (WIDTH - 300, GROUND_HEIGHT - 120, 180, 120))
+    pygame.draw.ellipse(surface, (0,0,0,50), (WIDTH - 300, GROUND_HEIGHT - 120, 180, 120), 10)
     for i in range(5):
-        pygame.draw.arc(screen, (120,120,120), (WIDTH-280+i*30, GROUND_HEIGHT-40, 30, 30), math.pi, 2*math.pi, 3)
+        pygame.draw.arc(surface, (120,120,120), (WIDTH-280+i*30, GROUND_HEIGHT-40, 30, 30), math.pi, 2*math.pi, 3)
+
+def draw_rome_near(surface, detail=True):
     # Cypress Trees
     tree_color = (40, 80, 40)
-    pygame.draw.polygon(screen, tree_color, [(WIDTH-450, GROUND_HEIGHT), (WIDTH-420, GROUND_HEIGHT-150), (WIDTH-390, GROUND_HEIGHT)])
-    pygame.draw.polygon(screen, tree_color, [(WIDTH-520, GROUND_HEIGHT), (WIDTH-490, GROUND_HEIGHT-120), (WIDTH-460, GROUND_HEIGHT)])
+    pygame.draw.polygon(surface, tree_color, [(WIDTH-450, GROUND_HEIGHT), (WIDTH-420, GROUND_HEIGHT-150), (WIDTH-390, GROUND_HEIGHT)])
+    pygame.draw.polygon(surface, tree_color, [(WIDTH-520, GROUND_HEIGHT), (WIDTH-490, GROUND_HEIGHT-120), (WIDTH-460, GROUND_HEIGHT)])
+
+def draw_rome_ground(surface, detail=True):
     # Ground (cobblestone)
-    pygame.draw.rect(screen, (110, 110, 110), (0, GROUND_HEIGHT, WIDTH, HEIGHT - GROUND_HEIGHT))
+    pygame.draw.rect(surface, (110, 110, 110), (0, GROUND_HEIGHT, WIDTH, HEIGHT - GROUND_HEIGHT))
+    if not detail:
+        return
+    # Seeded, so every bake (and the asset bundle) lays the same stones
+    rng = random.Random(7)
     for i in range(0, WIDTH, 20):
         for j in range(GROUND_HEIGHT, HEIGHT, 20):
-            pygame.draw.rect(screen, (90,90,90), (i+random.randint(-2,2), j+random.randint(-2,2), 15, 15))
+            pygame.draw.rect(surface, (90,90,90), (i+rng.randint(-2,2), j+rng.randint(-2,2), 15, 15))
 
-def draw_newyork_background():
+def draw_newyork_sky(surface, detail=True):
     # Sky gradient (bright blue)
     for y in range(HEIGHT):
         color = (
@@ -1189,34 +2036,56 @@ def draw_newyork_background():
             int(149 * (1 - y / HEIGHT) + 206 * (y / HEIGHT)),
             int(237 * (1 - y / HEIGHT) + 250 * (y / HEIGHT))
         )
-        pygame.draw.line(screen, color, (0, y), (WIDTH, y))
-    draw_flag("usa")
+        pygame.draw.line(surface, color, (0, y), (WIDTH, y))
+    draw_flag("usa", surface)
+
+def draw_newyork_far(surface, detail=True):
     # Distant skyline
     for i in range(8):
         x = 80 + i * 100
         w = 40 + (i % 3) * 30
         h = 120 + (i % 2) * 60
-        pygame.draw.rect(screen, (80, 80, 100), (x, GROUND_HEIGHT - h - 120, w, h))
+        pygame.draw.rect(surface, (80, 80, 100), (x, GROUND_HEIGHT - h - 120, w, h))
         for j in range(4):
-            pygame.draw.rect(screen, (255, 255, 180), (x + 8 + j * 10, GROUND_HEIGHT - h - 100, 8, 18))
+            pygame.draw.rect(surface, (255, 255, 180), (x + 8 + j * 10, GROUND_HEIGHT - h - 100, 8, 18))
+
+def draw_newyork_mid(surface, detail=True):
     # Skyscrapers (midground)
-    pygame.draw.rect(screen, (100, 100, 100), (WIDTH - 200, GROUND_HEIGHT - 250, 40, 250))
-    pygame.draw.rect(screen, (120, 120, 120), (WIDTH - 300, GROUND_HEIGHT - 300, 30, 300))
-    pygame.draw.rect(screen, (80, 80, 80), (WIDTH - 400, GROUND_HEIGHT - 200, 25, 200))
+    pygame.draw.rect(surface, (100, 100, 100), (WIDTH - 200, GROUND_HEIGHT - 250, 40, 250))
+    pygame.draw.rect(surface, (120, 120, 120), (WIDTH - 300, GROUND_HEIGHT - 300, 30, 300))
+    pygame.draw.rect(surface, (80, 80, 80), (WIDTH - 400, GROUND_HEIGHT - 200, 25, 200))
     # Windows
+    if not detail:
+        return
+    # Seeded, so every bake (and the asset bundle) lights the same windows
+    rng = random.Random(7)
     for i in range(5):
         for j in range(10):
-            if random.random() > 0.3:  
-                pygame.draw.rect(screen, YELLOW, (WIDTH - 195 + i*8, GROUND_HEIGHT - 240 + j*25, 5, 15))
-                pygame.draw.rect(screen, YELLOW, (WIDTH - 295 + i*6, GROUND_HEIGHT - 290 + j*30, 4, 15))
-                pygame.draw.rect(screen, YELLOW, (WIDTH - 395 + i*5, GROUND_HEIGHT - 190 + j*20, 4, 10))
+            if rng.random() > 0.3:
+                pygame.draw.rect(surface, YELLOW, (WIDTH - 195 + i*8, GROUND_HEIGHT - 240 + j*25, 5, 15))
+                pygame.draw.rect(surface, YELLOW, (WIDTH - 295 + i*6, GROUND_HEIGHT - 290 + j*30, 4, 15))
+                pygame.draw.rect(surface, YELLOW, (WIDTH - 395 + i*5, GROUND_HEIGHT - 190 + j*20, 4, 10))
+
+def draw_newyork_near(surface, detail=True):
     # Statue of Liberty (with torch)
-    pygame.draw.rect(screen, (50, 150, 50), (WIDTH - 500, GROUND_HEIGHT - 150, 20, 150))
-    pygame.draw.circle(screen, (50, 150, 50), (WIDTH - 490, GROUND_HEIGHT - 160), 25)
-    pygame.draw.polygon(screen, (255, 215, 0), [(WIDTH-490, GROUND_HEIGHT-160), (WIDTH-480, GROUND_HEIGHT-180), (WIDTH-500, GROUND_HEIGHT-180)])
+    pygame.draw.rect(surface, (50, 150, 50), (WIDTH - 500, GROUND_HEIGHT - 150, 20, 150))
+    pygame.draw.circle(surface, (50, 150, 50), (WIDTH - 490, GROUND_HEIGHT - 160), 25)
+    pygame.draw.polygon(surface, (255, 215, 0), [(WIDTH-490, GROUND_HEIGHT-160), (WIDTH-480, GROUND_HEIGHT-180), (WIDTH-500, GROUND_HEIGHT-180)])
+
+def draw_newyork_ground(surface, detail=True):
     # Ground (street)
-    pygame.draw.rect(screen, (50, 50, 50), (0, GROUND_HEIGHT, WIDTH, HEIGHT - GROUND_HEIGHT))
-    pygame.draw.line(screen, WHITE, (0, GROUND_HEIGHT + 20), (WIDTH, GROUND_HEIGHT + 20), 2)
+    pygame.draw.rect(surface, (50, 50, 50), (0, GROUND_HEIGHT, WIDTH, HEIGHT - GROUND_HEIGHT))
+    pygame.draw.line(surface, WHITE, (0, GROUND_HEIGHT + 20), (WIDTH, GROUND_HEIGHT + 20), 2)
+
+# Layers per arena, back to front, with their scroll speed as a fraction of SPEED
+ARENA_LAYERS = {
+    "giza": [(draw_giza_sky, 0), (draw_giza_far, 0.1), (draw_giza_mid, 0.25), (draw_giza_near, 0.6), (draw_giza_ground, 1)],
+    "london": [(draw_london_sky, 0), (draw_london_far, 0.1), (draw_london_mid, 0.3), (draw_london_near, 0.6), (draw_london_ground, 1)],
+    "paris": [(draw_paris_sky, 0), (draw_paris_far, 0.1), (draw_paris_mid, 0.3), (draw_paris_near, 0.6), (draw_paris_ground, 1)],
+    "rome": [(draw_rome_sky, 0), (draw_rome_far, 0.1), (draw_rome_mid, 0.3), (draw_rome_near, 0.6), (draw_rome_ground, 1)],
+    "newyork": [(draw_newyork_sky, 0), (draw_newyork_far, 0.1), (draw_newyork_mid, 0.3), (draw_newyork_near, 0.6), (draw_newyork_ground, 1)]
+}
+
 
 # --- Modernize Colors ---
 MODERN_BG = (30, 32, 40)
@@ -1238,6 +2107,1235 @@ def logistic(x, k=0.01, x0=1000):
     """Logistic function for probability scaling."""
     return 1 / (1 + np.exp(-k * (x - x0)))
 
+# --- Adaptive Quality ---
+# Tiers are ordered from best looking to cheapest. The governor watches how
+# long each PLAYING frame takes to simulate and draw, steps down a tier when
+# frames overrun the budget and only steps back up once there is clear
+# headroom, so it does not flap between two tiers.
+QUALITY_TIERS = [
+    {"name": "full", "clouds": True, "detail": True, "weather": True, "shield_glow": True, "render_scale": 1},
+    {"name": "no clouds", "clouds": False, "detail": True, "weather": True, "shield_glow": True, "render_scale": 1},
+    {"name": "simple background", "clouds": False, "detail": False, "weather": False, "shield_glow": True, "render_scale": 1},
+    {"name": "no shield glow", "clouds": False, "detail": False, "weather": False, "shield_glow": False, "render_scale": 1},
+    {"name": "low resolution", "clouds": False, "detail": False, "weather": False, "shield_glow": False, "render_scale": 0.5}
+]
+
+class QualityGovernor:
+    def __init__(self, target_fps=FPS, window=60, degrade_at=1.0, restore_at=0.6, cooldown=180):
+        self.budget_ms = 1000 / target_fps
+        self.frame_times = deque(maxlen=window)
+        self.degrade_at = degrade_at
+        self.restore_at = restore_at
+        self.cooldown_frames = cooldown
+        self.cooldown = 0
+        self.level = 0
+        self.tier = QUALITY_TIERS[0]
+        self.switches = 0
+
+    def record(self, frame_ms):
+        self.frame_times.append(frame_ms)
+        if self.cooldown > 0:
+            self.cooldown -= 1
+            return
+        if len(self.frame_times) < self.frame_times.maxlen:
+            return
+
+        average = sum(self.frame_times) / len(self.frame_times)
+        if average > self.budget_ms * self.degrade_at and self.level < len(QUALITY_TIERS) - 1:
+            self.switch(self.level + 1, average)
+        elif average < self.budget_ms * self.restore_at and self.level > 0:
+            self.switch(self.level - 1, average)
+
+    def switch(self, level, average):
+        logger.info("Quality tier %d (%s) -> %d (%s): average frame %.1f ms against a %.1f ms budget",
+                    self.level, self.tier["name"], level, QUALITY_TIERS[level]["name"], average, self.budget_ms)
+        self.level = level
+        self.tier = QUALITY_TIERS[level]
+        self.switches += 1
+        # Judge the new tier on its own frames only
+        self.frame_times.clear()
+        self.cooldown = self.cooldown_frames
+
+quality_governor = QualityGovernor()
+def get_render_target(scale, arena_type=None):
+    # With an arena, an 8-bit target in that arena's palette
+    key = scale if arena_type is None else (scale, arena_type)
+    target = surface_cache.get("render targets", key)
+    if target is None:
+        size = (int(WIDTH * scale), int(HEIGHT * scale))
+        if arena_type is None:
+            target = pygame.Surface(size).convert()
+        else:
+            target = pygame.Surface(size, 0, 8)
+            target.set_palette(arena_palette(arena_type))
+        surface_cache.put("render targets", key, target)
+    return target
+
+# --- Input ---
+# Only the events the game reacts to are queued; mouse motion used to flood
+# every menu. Hover effects read pygame.mouse.get_pos(), which SDL keeps
+# current even while motion events are blocked.
+ALLOWED_EVENTS = [pygame.QUIT, pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN, pygame.VIDEORESIZE, pygame.WINDOWSIZECHANGED]
+
+def filter_events():
+    pygame.event.set_blocked(None)
+    pygame.event.set_allowed(ALLOWED_EVENTS)
+
+class InputQueue:
+    # Events are drained while the frame waits (see FramePacer.wait) and
+    # stamped as they arrive, so the physics step knows how long ago each key
+    # press really happened
+    def __init__(self):
+        self.events = []
+
+    def poll(self):
+        now = time.perf_counter()
+        for event in pygame.event.get():
+            self.events.append((now, event))
+
+    def drain(self):
+        self.poll()
+        events, self.events = self.events, []
+        return events
+
+def jump_lead(stamp, step_time, fps=FPS):
+    # How much of a frame had already gone by when the key went down, in the
+    # thousandths a replay stores it in
+    return round(min(max((step_time - stamp) * fps, 0.0), 0.999), 3)
+
+class LatencyProbe:
+    # --latency: time from a jump key press to the flip() that first shows it.
+    # The display's own scan-out delay comes on top and is not visible here.
+    def __init__(self):
+        self.pending = []
+        self.samples = []
+
+    def press(self, stamp):
+        self.pending.append(stamp)
+
+    def presented(self, described=None):
+        # `described`: when the frame just shown was handed to the render
+        # thread; presses after that are still on their way to the screen
+        if self.pending:
+            now = time.perf_counter()
+            shown = [stamp for stamp in self.pending if described is None or stamp < described]
+            self.samples.extend((now - stamp) * 1000 for stamp in shown)
+            self.pending = self.pending[len(shown):]
+
+    def report(self):
+        if not self.samples:
+            return "Latency: no jumps measured"
+        p50, p90, p99 = np.percentile(self.samples, [50, 90, 99])
+        return (f"Latency: {len(self.samples)} jumps, input to photon p50 {p50:.1f} ms, "
+                f"p90 {p90:.1f} ms, p99 {p99:.1f} ms, max {max(self.samples):.1f} ms")
+
+# --- Window ---
+# The window can be resized or switched to native-resolution fullscreen
+# (F11 or --fullscreen). A run is drawn straight into the window at the
+# largest multiple of WIDTH x HEIGHT that fits, in VIEW_SCALE_STEP steps, so
+# game logic keeps its fixed coordinates. Baked surfaces for a new size come
+# from a worker thread; until they are ready the old ones are stretched, so
+# resizing never stalls a frame on baking.
+VIEW_SCALE_STEP = 32
+
+class WindowLayout:
+    def __init__(self, size):
+        self.size = size
+        fit = min(size[0] / WIDTH, size[1] / HEIGHT)
+        self.scale = max(1, int(fit * VIEW_SCALE_STEP)) / VIEW_SCALE_STEP
+        width, height = int(WIDTH * self.scale), int(HEIGHT * self.scale)
+        self.viewport = pygame.Rect((size[0] - width) // 2, (size[1] - height) // 2, width, height)
+        # Letterbox bars around the viewport
+        self.bars = [rect for rect in (pygame.Rect(0, 0, size[0], self.viewport.top),
+                                       pygame.Rect(0, self.viewport.bottom, size[0], size[1] - self.viewport.bottom),
+                                       pygame.Rect(0, 0, self.viewport.left, size[1]),
+                                       pygame.Rect(self.viewport.right, 0, size[0] - self.viewport.right, size[1]))
+                     if rect.width > 0 and rect.height > 0]
+
+    def clear_bars(self, surface):
+        for rect in self.bars:
+            surface.fill(BLACK, rect)
+
+    def to_canvas(self, pos):
+        return (int((pos[0] - self.viewport.x) / self.scale), int((pos[1] - self.viewport.y) / self.scale))
+
+window_layout = None
+
+def current_layout():
+    global window_layout
+    size = pygame.display.get_surface().get_size()
+    if window_layout is None or window_layout.size != size:
+        old = window_layout
+        window_layout = WindowLayout(size)
+        logger.info("Window %dx%d, view scale %.3f", size[0], size[1], window_layout.scale)
+        if old is not None:
+            cache_baker.relayout(old.scale, window_layout.scale)
+    return window_layout
+
+def canvas_mouse_pos():
+    return current_layout().to_canvas(pygame.mouse.get_pos())
+
+def present():
+    # Fits the menu canvas into the window and shows it
+    layout = current_layout()
+    surface = pygame.display.get_surface()
+    if layout.viewport.size == screen.get_size():
+        surface.blit(screen, layout.viewport)
+    else:
+        pygame.transform.smoothscale(screen, layout.viewport.size, surface.subsurface(layout.viewport))
+    layout.clear_bars(surface)
+    pygame.display.flip()
+
+def toggle_fullscreen():
+    if pygame.display.get_surface().get_flags() & pygame.FULLSCREEN:
+        pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
+    else:
+        # (0, 0) asks for the desktop's native resolution
+        pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+
+class CacheBaker:
+    # Builds cache entries on a worker thread. Requests are tagged with the
+    # layout generation they were made for and skipped once the window has
+    # moved on, so dragging a window edge does not queue up stale work.
+    def __init__(self):
+        self.jobs = queue.Queue()
+        self.pending = set()
+        self.generation = 0
+        self.baked = 0
+        self.thread = None
+
+    def request(self, namespace, key, build):
+        if (namespace, key) in self.pending or surface_cache.contains(namespace, key):
+            return
+        self.pending.add((namespace, key))
+        self.jobs.put((self.generation, namespace, key, build))
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="cache-baker", daemon=True)
+            self.thread.start()
+
+    def request_background(self, arena_type, detail, scale):
+        self.request("background", (arena_type, detail, scale), lambda: build_parallax_layers(arena_type, detail, scale))
+
+    def relayout(self, old_view_scale, view_scale):
+        # Rebake the backgrounds a run was drawing with, at the new size
+        self.generation += 1
+        tier_scale = quality_governor.tier["render_scale"]
+        for arena_type, detail, scale in surface_cache.keys("background"):
+            if scale == tier_scale * old_view_scale:
+                self.request_background(arena_type, detail, tier_scale * view_scale)
+
+    def run(self):
+        while True:
+            generation, namespace, key, build = self.jobs.get()
+            try:
+                if generation == self.generation and not surface_cache.contains(namespace, key):
+                    surface_cache.put(namespace, key, build())
+                    self.baked += 1
+            except pygame.error as error:
+                logger.warning("Baking %s %r failed: %s", namespace, key, error)
+            finally:
+                self.pending.discard((namespace, key))
+
+cache_baker = CacheBaker()
+
+def background_scale(arena_type, detail, scale):
+    # The scale to draw a run's background at this frame: the one asked for
+    # once it is baked, meanwhile the closest one already in the cache
+    if surface_cache.contains("background", (arena_type, detail, scale)):
+        return scale
+    baked = [key[2] for key in surface_cache.keys("background") if key[:2] == (arena_type, detail)]
+    if not baked:
+        # Nothing to stand in: the first frame of an arena bakes in place, as it always did
+        return scale
+    cache_baker.request_background(arena_type, detail, scale)
+    return min(baked, key=lambda baked_scale: abs(baked_scale - scale))
+
+hud_font_cache = {}
+
+def hud_fonts(scale):
+    # (font, small_font) for text drawn straight into the scaled viewport
+    if scale == 1:
+        return font, small_font
+    fonts = hud_font_cache.get(scale)
+    if fonts is None:
+        fonts = (pygame.font.Font(None, round(36 * scale)), pygame.font.Font(None, round(24 * scale)))
+        hud_font_cache[scale] = fonts
+    return fonts
+
+def set_target_fps(fps):
+    # Display rate only: the world still advances FPS frames per second, and
+    # the quality governor budgets for the shorter frame
+    pacer.set_fps(fps)
+    quality_governor.budget_ms = 1000 / fps
+
+# --- Autopilot ---
+# A player that never sleeps, for soak tests and the attract-mode demo. Jump
+# arcs are simulated once per character type, and for every whole-pixel
+# clearance we store the first and last frame of the jump at which the feet
+# are at least that high. Deciding whether to jump is then a couple of table
+# lookups against the next obstacle.
+def jump_physics(character_type):
+    # Launch velocity and gravity for a jump off the ground
+    ability = CHARACTER_ABILITIES.get(character_type, CHARACTER_ABILITIES["default"])
+    return ability["jump_strength"], ability["gravity"]
+
+class JumpArc:
+    def __init__(self, character_type):
+        velocity, gravity = jump_physics(character_type)
+        # Height of the runner's feet above the ground on each frame after the jump
+        self.heights = [0]
+        lift = 0
+        while True:
+            velocity += gravity
+            lift -= velocity
+            if lift <= 0:
+                self.heights.append(0)
+                break
+            self.heights.append(lift)
+        self.airtime = len(self.heights) - 1
+        self.apex_frame = self.heights.index(max(self.heights))
+
+        self.rise = []
+        self.fall = []
+        for clearance in range(int(max(self.heights)) + 1):
+            frames = [t for t, lift in enumerate(self.heights) if lift >= clearance]
+            self.rise.append(frames[0])
+            self.fall.append(frames[-1])
+
+jump_arcs = {}
+
+def get_jump_arc(character_type):
+    arc = jump_arcs.get(character_type)
+    if arc is None:
+        arc = JumpArc(character_type)
+        jump_arcs[character_type] = arc
+    return arc
+
+class Autopilot:
+    def __init__(self):
+        self.decisions = 0
+        self.decision_ns = 0
+        self.jumps = 0
+
+    def should_jump(self, character, obstacles):
+        start = time.perf_counter_ns()
+        jump = self.decide(character, obstacles)
+        self.decision_ns += time.perf_counter_ns() - start
+        self.decisions += 1
+        if jump:
+            self.jumps += 1
+        return jump
+
+    def decide(self, character, obstacles):
+        # Only plan jumps from the ground (the alien never clears on_ground)
+        if character.y + character.height < GROUND_HEIGHT:
+            return False
+        for obstacle in obstacles:
+            if obstacle.x + obstacle.width > character.x:
+                break
+        else:
+            return False
+
+        arc = get_jump_arc(character.character_type)
+        # Frames (counting this one) during which the obstacle overlaps the runner horizontally
+        t_enter = math.floor((obstacle.x - character.x - character.width) / SPEED) + 1
+        t_exit = math.ceil((obstacle.x + obstacle.width - character.x) / SPEED) - 1
+        clearance = GROUND_HEIGHT - obstacle.y
+        if clearance >= len(arc.rise):
+            # Too tall to clear: at least be at the top of the arc when it arrives
+            return t_enter <= arc.apex_frame
+
+        # Jumping k frames from now clears it for earliest <= k <= latest;
+        # jump when the middle of that window comes round
+        latest = t_enter - arc.rise[clearance]
+        earliest = t_exit - arc.fall[clearance]
+        return earliest + latest <= 0
+
+    def average_decision_us(self):
+        return self.decision_ns / max(1, self.decisions) / 1000
+
+# --- Obstacle Chunks ---
+# Obstacles and coins arrive in short hand-off-able patterns instead of one
+# random obstacle at a time. A library of chunks is generated once at startup
+# (on a worker thread when launched from the command line) and every chunk is
+# checked against the jump arc of each kind of runner at every speed of its
+# difficulty level: taking each obstacle with a single jump from the ground,
+# as early as possible, there is always a window of at least
+# CHUNK_JUMP_WINDOW frames and the runner lands in time for the next chunk.
+# Runs then pick chunks with one list lookup.
+CHUNK_LEVELS = 12
+CHUNK_SPEED_BAND = 1.0
+CHUNKS_PER_LEVEL = 32
+CHUNK_JUMP_WINDOW = 3
+CHUNK_SEED = 1234
+
+class Chunk:
+    def __init__(self, obstacles, coins, length, level):
+        # obstacles: (frame, width, height, type, lift); coins: (frame, y);
+        # frames count from the start of the chunk
+        self.obstacles = obstacles
+        self.coins = coins
+        self.length = length
+        self.level = level
+
+    def build(self, arena_type, game_time, prime=False):
+        # The objects a run will spawn from this chunk, created ahead of time
+        obstacles = [(frame, Obstacle(game_time, arena_type, shape)) for frame, *shape in self.obstacles]
+        coins = [(frame, Coin(y)) for frame, y in self.coins]
+        if prime:
+            for frame, obstacle in obstacles:
+                obstacle.display_list = get_obstacle_display_list(obstacle)
+        return self.length, obstacles, coins
+
+def chunk_speeds(level):
+    # Speeds a chunk of this level must survive; the band overlaps the next
+    # one because SPEED keeps rising while a chunk plays out
+    low = 5 + level * CHUNK_SPEED_BAND
+    steps = int((CHUNK_SPEED_BAND + 0.5) / 0.25)
+    return [low + i * 0.25 for i in range(steps + 1)]
+
+def chunk_clearable(obstacles, length, arc, speed, runner_x=100, runner_width=30):
+    # Frame numbers below are those of the chunk: an obstacle spawned on
+    # frame f is over the runner for (f - 1 + enter / speed, f - 1 + leave / speed)
+    enter = WIDTH - runner_x - runner_width
+    # However the next chunk starts, none of its jumps need to begin before this
+    lead = math.floor(enter / speed) - arc.airtime
+    ready = lead
+    for frame, width, height, kind, lift in obstacles:
+        clearance = height + lift
+        if clearance >= len(arc.rise):
+            return False
+        first = math.floor(frame - 1 + enter / speed)
+        last = math.ceil(frame - 1 + (enter + runner_width + width) / speed)
+        # Jumping on frame k keeps the feet high enough from k - 1 + rise to k - 1 + fall
+        earliest = max(ready, last + 1 - arc.fall[clearance])
+        latest = first + 1 - arc.rise[clearance]
+        if latest - earliest < CHUNK_JUMP_WINDOW:
+            return False
+        ready = earliest + arc.airtime
+    return ready <= length + lead
+
+class ChunkLibrary:
+    def __init__(self, seed=CHUNK_SEED):
+        self.seed = seed
+        # jump physics -> one list of chunks per difficulty level
+        self.levels = {}
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        # Build on a worker so the first run doesn't have to
+        self.thread = threading.Thread(target=self.build, name="chunk-library", daemon=True)
+        self.thread.start()
+
+    def build(self):
+        with self.lock:
+            if self.levels:
+                return
+            start = time.perf_counter()
+            rng = random.Random(self.seed)
+            levels = {}
+            for character_type in CHARACTER_ABILITIES:
+                physics = jump_physics(character_type)
+                if physics not in levels:
+                    levels[physics] = self.generate(rng, get_jump_arc(character_type))
+            self.levels = levels
+            logger.info("Chunk library: %d chunks in %.0f ms",
+                        sum(len(level) for physics in levels.values() for level in physics),
+                        (time.perf_counter() - start) * 1000)
+
+    def generate(self, rng, arc):
+        apex = int(max(arc.heights))
+        levels = []
+        for level in range(CHUNK_LEVELS):
+            speeds = chunk_speeds(level)
+            # Gaps tighten with the level but never drop far below one airtime
+            shortest = max(30, 90 - 8 * level, arc.airtime - 5)
+            longest = max(shortest + 30, 180 - 12 * level)
+            chunks = []
+            for attempt in range(CHUNKS_PER_LEVEL * 50):
+                if len(chunks) == CHUNKS_PER_LEVEL:
+                    break
+                obstacles = []
+                frame = 0
+                for i in range(rng.randint(1, 4)):
+                    frame += rng.randint(shortest, longest)
+                    obstacles.append((frame,) + random_obstacle_shape(rng))
+                length = frame + rng.randint(shortest, longest)
+                if all(chunk_clearable(obstacles, length, arc, speed) for speed in speeds):
+                    coins = sorted((rng.randrange(length), GROUND_HEIGHT - 30 - rng.randint(0, apex))
+                                   for i in range(rng.randint(0, 3)))
+                    chunks.append(Chunk(obstacles, coins, length, level))
+            if not chunks:
+                # Nothing this tight can be cleared; keep the easier level's chunks
+                logger.warning("No clearable chunks at level %d", level)
+                chunks = levels[-1]
+            levels.append(chunks)
+        return levels
+
+    def levels_for(self, character_type):
+        # Waits for the worker if it is still going, builds here if it never started
+        self.build()
+        return self.levels[jump_physics(character_type)]
+
+    def obstacle_shapes(self):
+        # Every (width, height, type) any chunk can spawn
+        self.build()
+        return sorted({(width, height, kind) for physics in self.levels.values() for level in physics
+                       for chunk in level for frame, width, height, kind, lift in chunk.obstacles})
+
+chunk_library = ChunkLibrary()
+
+# --- Game Run ---
+# Everything that belongs to one run through an arena, advanced one frame at a
+# time. main() feeds it keyboard jumps; the attract-mode demo feeds it the
+# autopilot.
+class GameRun:
+    def __init__(self, arena_type, character_type, effects=True, particle_system=None, seed=None):
+        global SPEED
+        SPEED = 5
+        # Each run keeps its own speed so split-screen runs can take turns with the global
+        self.speed = SPEED
+        
+        # Everything random in a run comes from generators seeded here, so the
+        # seed plus the jumps replays it frame for frame
+        self.seed = random.randrange(1 << 32) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        
+        self.arena_type = arena_type
+        self.character = CartoonCharacter()
+        self.character.set_character_type(character_type)
+        self.character.reset()
+        self.character.rng = self.rng
+
+        self.obstacles = []
+        self.coins = []
+        self.clouds = []
+        self.score = 0
+        self.coins_collected = 0
+        self.game_time = 0
+        self.cloud_timer = 0
+        self.background_scroll = 0
+        self.over = False
+        # Frame (with fraction) at which the fatal hit happened
+        self.impact_time = None
+        # Particle effects are purely visual; headless runs switch them off
+        self.effects = effects
+        self.particles = particles if particle_system is None else particle_system
+        if effects:
+            self.particles.clear()
+            self.particles.rng = np.random.default_rng(self.seed)
+        
+        # Obstacles and coins come from the chunk library; the chunk after the
+        # current one is always already built
+        self.chunk_levels = chunk_library.levels_for(character_type)
+        self.chunk = self.prepare_chunk()
+        self.next_chunk = self.prepare_chunk()
+        self.chunk_frame = 0
+        self.next_obstacle = 0
+        self.next_coin = 0
+    
+    def prepare_chunk(self):
+        level = min(CHUNK_LEVELS - 1, int((SPEED - 5) / CHUNK_SPEED_BAND))
+        return self.rng.choice(self.chunk_levels[level]).build(self.arena_type, self.game_time, self.effects)
+    
+    def step(self, weather=True, frames=1):
+        # Advances the run by one or more frames. Spawning and speed-ups still
+        # happen frame by frame, anything spawned partway through a coarse
+        # step starts as far right as the frames it missed, and collisions are
+        # swept over the runner's per-frame path, so a coarse step ends the
+        # run at the same moment the single-frame steps would.
+        global SPEED
+        SPEED = self.speed
+        character = self.character
+        speeds = []
+        for frame in range(frames):
+            travelled = sum(speeds)
+            self.game_time += 1
+            
+            self.chunk_frame += 1
+            length, chunk_obstacles, chunk_coins = self.chunk
+            while self.next_obstacle < len(chunk_obstacles) and chunk_obstacles[self.next_obstacle][0] <= self.chunk_frame:
+                obstacle = chunk_obstacles[self.next_obstacle][1]
+                obstacle.x += travelled
+                self.obstacles.append(obstacle)
+                self.next_obstacle += 1
+            while self.next_coin < len(chunk_coins) and chunk_coins[self.next_coin][0] <= self.chunk_frame:
+                coin = chunk_coins[self.next_coin][1]
+                coin.x += travelled
+                self.coins.append(coin)
+                self.next_coin += 1
+            if self.chunk_frame >= length:
+                self.chunk = self.next_chunk
+                self.next_chunk = self.prepare_chunk()
+                self.chunk_frame = 0
+                self.next_obstacle = 0
+                self.next_coin = 0
+            
+            self.cloud_timer += 1
+            if self.cloud_timer >= 100:
+                cloud = Cloud(self.rng)
+                cloud.x += cloud.speed * frame
+                self.clouds.append(cloud)
+                self.cloud_timer = 0
+            
+            speeds.append(SPEED)
+            if self.game_time % 500 == 0:
+                SPEED += 0.25
+            self.background_scroll += SPEED
+        
+        path = [(character.y, character.shield_active)]
+        shield_start = character.shield_active, character.shield_timer
+        for frame in range(frames):
+            character.update()
+            path.append((character.y, character.shield_active))
+        distance = sum(speeds)
+        
+        if self.effects:
+            self.particles.dust(character)
+            if weather:
+                self.particles.weather(self.arena_type)
+        
+        # The run ends in the frame of the earliest hit and nothing later in
+        # the step counts towards the score. Coins are picked up in the order
+        # single steps would take them; a pickup ability can raise a shield,
+        # which covers the frames after the pickup, so the shield flags from
+        # there on are replayed and the obstacles swept again.
+        impact = self.first_impact(path, speeds)
+        pickups = None
+        for coin in self.coins:
+            t = coin.collide(character, path, speeds)
+            if t is not None:
+                if pickups is None:
+                    pickups = []
+                pickups.append((int(t), coin))
+        if pickups is not None:
+            pickups.sort(key=lambda pickup: pickup[0])
+            # The shield as it was at the end of frame `at` (-1: step start)
+            shield, at = shield_start, -1
+            for frame, coin in pickups:
+                if impact is not None and frame > int(impact):
+                    break
+                coin.collected = True
+                if character.on_coin_pickup is None:
+                    continue
+                # The ability sees the runner as it was in that frame
+                shield, at = shield_after(shield, frame - at), frame
+                character.shield_active, character.shield_timer = shield
+                character.on_coin_pickup(character)
+                if (character.shield_active, character.shield_timer) != shield:
+                    shield = character.shield_active, character.shield_timer
+                    replayed = shield
+                    for later in range(frame + 1, frames):
+                        replayed = shield_after(replayed, 1)
+                        path[later + 1] = (path[later + 1][0], replayed[0])
+                    impact = self.first_impact(path, speeds)
+            character.shield_active, character.shield_timer = shield_after(shield, frames - 1 - at)
+        if impact is not None:
+            self.impact_time = self.game_time - frames + impact
+            self.over = True
+            counted = int(impact) + 1
+        else:
+            counted = frames
+        counted_distance = sum(speeds[:counted])
+        
+        for obstacle in self.obstacles[:]:
+            scored = obstacle.x - counted_distance + obstacle.width < 0
+            obstacle.update(distance)
+            if obstacle.off_screen():
+                self.obstacles.remove(obstacle)
+                if scored and not obstacle.passed:
+                    self.score += 1
+                    obstacle.passed = True
+        
+        for coin in self.coins[:]:
+            coin.update(distance)
+            if coin.off_screen() and not coin.collected:
+                self.coins.remove(coin)
+            elif coin.collected:
+                self.coins_collected += 1
+                coin.collected = True
+                coin_sound.play()
+                if self.effects:
+                    self.particles.burst(coin.x + coin.width / 2, coin.y + coin.height / 2)
+                self.coins.remove(coin)
+        
+        for cloud in self.clouds[:]:
+            cloud.update(frames)
+            if cloud.off_screen():
+                self.clouds.remove(cloud)
+        
+        if self.effects:
+            self.particles.update()
+        self.speed = SPEED
+    
+    def first_impact(self, path, speeds):
+        # Earliest obstacle hit over the step, in frames from its start
+        impact = None
+        for obstacle in self.obstacles:
+            t = obstacle.collide(self.character, path, speeds)
+            if t is not None and (impact is None or t < impact):
+                impact = t
+        return impact
+    
+    def draw(self, surface, tier=QUALITY_TIERS[0], blend=0.0, view_scale=1):
+        # The world is drawn at the tier's render scale and stretched to the
+        # window; the HUD always stays at full resolution. Above FPS, frames
+        # fall between simulation steps: `blend` is how far into the next step
+        # this one is, and moving things are drawn that much further along.
+        scale = background_scale(self.arena_type, tier["detail"], tier["render_scale"] * view_scale)
+        ahead = self.speed * blend
+        if palettized:
+            frame = get_render_target(scale, self.arena_type)
+        elif surface.get_size() == (int(WIDTH * scale), int(HEIGHT * scale)):
+            frame = surface
+        else:
+            frame = get_render_target(scale)
+        
+        draw_background(self.arena_type, self.background_scroll + ahead, frame, tier["detail"], scale)
+        
+        if tier["clouds"]:
+            for cloud in self.clouds:
+                cloud.draw(frame, scale, -cloud.speed * blend)
+        
+        character = self.character
+        rise = 0
+        if blend and not character.on_ground:
+            rise = min((character.velocity_y + character.gravity) * blend, GROUND_HEIGHT - character.height - character.y)
+        character.draw(frame, scale, tier["shield_glow"], rise)
+        
+        for obstacle in self.obstacles:
+            obstacle.draw(frame, scale, -ahead)
+        
+        for coin in self.coins:
+            coin.draw(frame, scale, -ahead)
+        
+        if self.effects:
+            self.particles.draw(frame, scale)
+        
+        if frame is not surface:
+            if frame.get_size() == surface.get_size():
+                # A palettized frame becomes display colors here
+                surface.blit(frame, (0, 0))
+                return
+            if frame.get_bytesize() == 1:
+                staging = get_render_target(scale)
+                staging.blit(frame, (0, 0))
+                frame = staging
+            pygame.transform.scale(frame, surface.get_size(), surface)
+    
+    def draw_hud(self, surface, scale=1):
+        large, small = hud_fonts(scale)
+        blit_text(surface, f"Score: {self.score}", large, BLACK, (10 * scale, 10 * scale))
+        blit_text(surface, f"High Score: {highscore}", small, BLACK, (10 * scale, 40 * scale))
+        blit_text(surface, f"Coins: {self.coins_collected}", large, GOLD, (10 * scale, 70 * scale))
+        
+        if self.character.shield_active:
+            blit_text(surface, "SHIELD ACTIVE!", small, (0, 100, 255), ((WIDTH - 140) * scale, 10 * scale))
+
+# --- Pipelined Rendering ---
+# With --pipelined, a run's frame is drawn on a render thread while the main
+# thread simulates the next one. Each step the simulation hands over a
+# FrameDescription: shallow copies of everything GameRun.draw and draw_hud
+# read, under the same attribute names, so those methods draw it unchanged.
+# Two buffers alternate: the render thread composes frame N into one while
+# the main thread shows frame N-1 from the other, which adds a frame of latency.
+FrameDescription = namedtuple("FrameDescription", ["arena_type", "background_scroll", "speed", "effects", "particles",
+                                                   "clouds", "character", "obstacles", "coins", "score",
+                                                   "coins_collected", "ghost"])
+
+def describe_run(run, ghost=None):
+    return FrameDescription(run.arena_type, run.background_scroll, run.speed, run.effects,
+                            run.particles.snapshot() if run.effects else None,
+                            [copy.copy(cloud) for cloud in run.clouds], copy.copy(run.character),
+                            [copy.copy(obstacle) for obstacle in run.obstacles],
+                            [copy.copy(coin) for coin in run.coins], run.score, run.coins_collected,
+                            copy.copy(ghost) if ghost is not None else None)
+
+class PipelinedRenderer:
+    def __init__(self, buffers=2):
+        self.buffers = buffers
+        self.size = None
+        self.free = None
+        self.descriptions = queue.Queue(maxsize=1)
+        self.finished = queue.Queue()
+        self.in_flight = 0
+        self.composed = 0
+        self.compose_ms = 0.0
+        self.thread = threading.Thread(target=self.run, name="render", daemon=True)
+        self.thread.start()
+
+    def submit(self, frame, tier, blend, layout, overlay=False):
+        if layout.viewport.size != self.size:
+            # New window size: let the old buffers drain, then start a fresh pair
+            self.sync()
+            self.size = layout.viewport.size
+            self.free = queue.Queue()
+            for i in range(self.buffers):
+                self.free.put(pygame.Surface(self.size).convert())
+        self.descriptions.put((time.perf_counter(), frame, tier, blend, layout.scale, overlay, self.free))
+        self.in_flight += 1
+
+    def run(self):
+        while True:
+            stamp, frame, tier, blend, scale, overlay, free = self.descriptions.get()
+            buffer = free.get()
+            start = time.perf_counter()
+            GameRun.draw(frame, buffer, tier, blend, scale)
+            if frame.ghost is not None:
+                frame.ghost.draw(buffer, frame.character.x, scale)
+            GameRun.draw_hud(frame, buffer, scale)
+            if overlay:
+                draw_cache_overlay(buffer)
+            self.compose_ms += (time.perf_counter() - start) * 1000
+            self.composed += 1
+            self.finished.put((stamp, buffer, free))
+
+    def present(self, window, layout, keep=1):
+        # Blits the oldest finished frame into the window once more than
+        # `keep` frames are in flight; returns when that frame was described
+        if self.in_flight <= keep:
+            return None
+        stamp, buffer, free = self.finished.get()
+        self.in_flight -= 1
+        if buffer.get_size() == layout.viewport.size:
+            window.blit(buffer, layout.viewport)
+        else:
+            pygame.transform.scale(buffer, layout.viewport.size, window.subsurface(layout.viewport))
+        layout.clear_bars(window)
+        free.put(buffer)
+        return stamp
+
+    def sync(self):
+        # Waits out every frame in flight without showing it
+        while self.in_flight:
+            stamp, buffer, free = self.finished.get()
+            self.in_flight -= 1
+            free.put(buffer)
+
+def pipeline_benchmark(frames=1200, arena_type="giza", character_type="default"):
+    # Unpaced autopilot runs, drawn sequentially and then pipelined: frames
+    # per second, and latency from the end of a step to its flip
+    results = {}
+    for mode in ("sequential", "pipelined"):
+        random.seed(1)
+        run = GameRun(arena_type, character_type)
+        autopilot = Autopilot()
+        renderer = PipelinedRenderer() if mode == "pipelined" else None
+        latencies = []
+        shown = 0
+        start = time.perf_counter()
+        for frame in range(frames):
+            if run.over:
+                run = GameRun(arena_type, character_type)
+            if autopilot.should_jump(run.character, run.obstacles):
+                run.character.jump()
+            run.step()
+            stepped = time.perf_counter()
+            layout = current_layout()
+            window = pygame.display.get_surface()
+            if renderer is None:
+                view = window.subsurface(layout.viewport)
+                run.draw(view, quality_governor.tier, 0.0, layout.scale)
+                run.draw_hud(view, layout.scale)
+                del view
+            else:
+                renderer.submit(describe_run(run), quality_governor.tier, 0.0, layout)
+                stepped = renderer.present(window, layout)
+                if stepped is None:
+                    # Nothing finished yet: flipping would show a stale buffer
+                    continue
+            pygame.display.flip()
+            shown += 1
+            latencies.append((time.perf_counter() - stepped) * 1000)
+        elapsed = time.perf_counter() - start
+        if renderer is not None:
+            renderer.sync()
+        p50, p99 = np.percentile(latencies, [50, 99])
+        results[mode] = {"fps": shown / elapsed, "latency_p50_ms": p50, "latency_p99_ms": p99}
+        logger.info("Pipeline benchmark %s: %.0f fps, step to flip p50 %.2f ms, p99 %.2f ms",
+                    mode, shown / elapsed, p50, p99)
+    logger.info("Pipelined throughput x%.2f on %d cores", results["pipelined"]["fps"] / results["sequential"]["fps"],
+                os.cpu_count() or 1)
+    return results
+
+# Attract mode: after this long idle on the main menu, the autopilot plays a demo
+ATTRACT_DELAY_MS = 15000
+
+def attract_mode():
+    autopilot = Autopilot()
+    run = GameRun(random.choice(list(ARENA_LAYERS)), random.choice(CHARACTERS)["type"])
+    demo_text = font.render("DEMO - press any key", True, BLACK)
+    
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+            if event.type in (pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN):
+                return
+        
+        if autopilot.should_jump(run.character, run.obstacles):
+            run.character.jump()
+        run.step()
+        if run.over:
+            run = GameRun(random.choice(list(ARENA_LAYERS)), random.choice(CHARACTERS)["type"])
+        
+        run.draw(screen)
+        run.draw_hud(screen)
+        screen.blit(demo_text, (WIDTH // 2 - demo_text.get_width() // 2, HEIGHT // 4))
+        
+        present()
+        clock.tick(FPS)
+
+# --- Ghost Runner ---
+# The best run on each arena with each character is kept as a compact stream
+# and raced as a translucent ghost. The runner only ever moves vertically, so a
+# frame is its y (in twentieths of a pixel, which every character's gravity
+# divides exactly) plus whether a jump was pressed. y is
+# stored as the change in its per-frame change, which is constant for a whole
+# jump, and repeated samples are run-length encoded as varint pairs: a second
+# on the ground or in the middle of a jump costs a couple of bytes.
+GHOST_DIR = "ghosts"
+GHOST_MAGIC = b"CRG1"
+GHOST_MAX_BYTES = 32768
+GHOST_SUBPIXELS = 20
+GHOST_ALPHA = 110
+
+def write_varint(buffer, value):
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+def read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+class GhostRecorder:
+    def __init__(self, start_y):
+        self.start = round(start_y * GHOST_SUBPIXELS)
+        self.data = bytearray()
+        self.frames = 0
+        self.full = False
+        self.last = self.start
+        self.last_delta = 0
+        self.sample = None
+        self.repeat = 0
+
+    def record(self, y, jumped):
+        if self.full:
+            return
+        q = round(y * GHOST_SUBPIXELS)
+        delta = q - self.last
+        change = delta - self.last_delta
+        self.last, self.last_delta = q, delta
+        # Zigzag keeps small negative changes to one byte
+        sample = ((change << 1) ^ (change >> 63)) << 1 | jumped
+        if sample == self.sample:
+            self.repeat += 1
+        else:
+            self.flush()
+            self.sample, self.repeat = sample, 1
+        self.frames += 1
+
+    def flush(self):
+        if self.sample is not None:
+            write_varint(self.data, self.sample)
+            write_varint(self.data, self.repeat)
+            if len(self.data) >= GHOST_MAX_BYTES:
+                # Long enough; the ghost simply stops here
+                self.full = True
+        self.sample = None
+
+    def finish(self):
+        self.flush()
+        return bytes(self.data)
+
+class GhostPlayer:
+    def __init__(self, character_type, score, start, data):
+        self.character_type = character_type
+        self.score = score
+        self.start = start
+        self.data = data
+        self.rewind()
+
+    def rewind(self):
+        self.pos = 0
+        self.q = self.start
+        self.delta = 0
+        self.change = 0
+        self.jumped = False
+        self.remaining = 0
+        self.finished = False
+        self.run_animation_frame = 0
+
+    def step(self):
+        if self.remaining == 0:
+            if self.pos >= len(self.data):
+                self.finished = True
+                return
+            sample, self.pos = read_varint(self.data, self.pos)
+            self.remaining, self.pos = read_varint(self.data, self.pos)
+            zigzag = sample >> 1
+            self.change = (zigzag >> 1) ^ -(zigzag & 1)
+            self.jumped = bool(sample & 1)
+        self.remaining -= 1
+        self.delta += self.change
+        self.q += self.delta
+        if self.q >= (GROUND_HEIGHT - 40) * GHOST_SUBPIXELS:
+            self.run_animation_frame = (self.run_animation_frame + 0.2) % 4
+
+    def draw(self, surface, x, scale=1):
+        if self.finished:
+            return
+        sprite, (dx, dy) = get_ghost_sprite(self.character_type, int(self.run_animation_frame), scale)
+        surface.blit(sprite, (x * scale + dx, self.q / GHOST_SUBPIXELS * scale + dy))
+
+def get_ghost_sprite(character_type, leg_frame, scale=1):
+    # Rendered once from the character's display list, cropped and made
+    # translucent, so a ghost costs a single blit
+    key = (character_type, leg_frame, scale)
+    sprite = surface_cache.get("ghosts", key)
+    if sprite is None:
+        image, offset = render_sprite(get_character_display_list(character_type, leg_frame), (120, 140), (60, 70), scale)
+        image.set_alpha(GHOST_ALPHA)
+        sprite = (image, offset)
+        surface_cache.put("ghosts", key, sprite)
+    return sprite
+
+best_ghosts = {}
+
+def ghost_path(arena_type, character_type):
+    return os.path.join(GHOST_DIR, f"{arena_type}_{character_type}.ghost")
+
+def load_ghost(arena_type, character_type):
+    key = (arena_type, character_type)
+    if key not in best_ghosts:
+        ghost = None
+        try:
+            with open(ghost_path(arena_type, character_type), "rb") as file:
+                blob = file.read()
+            if blob[:4] == GHOST_MAGIC:
+                score, frames, start = struct.unpack_from("<IIi", blob, 4)
+                ghost = GhostPlayer(character_type, score, start, blob[16:])
+        except (OSError, struct.error):
+            pass
+        best_ghosts[key] = ghost
+    ghost = best_ghosts[key]
+    if ghost is not None:
+        ghost.rewind()
+    return ghost
+
+def save_ghost(arena_type, character_type, score, recorder):
+    # Keeps the run only if it beats the stored best for this arena and character
+    best = load_ghost(arena_type, character_type)
+    if best is not None and best.score >= score:
+        return False
+    data = recorder.finish()
+    try:
+        os.makedirs(GHOST_DIR, exist_ok=True)
+        with open(ghost_path(arena_type, character_type), "wb") as file:
+            file.write(GHOST_MAGIC + struct.pack("<IIi", score, recorder.frames, recorder.start) + data)
+    except OSError as error:
+        logger.warning("Could not save ghost: %s", error)
+    best_ghosts[(arena_type, character_type)] = GhostPlayer(character_type, score, recorder.start, data)
+    logger.info("New best ghost for %s/%s: score %d, %d frames in %d bytes",
+                arena_type, character_type, score, recorder.frames, len(data))
+    return True
+
+# --- Replays ---
+# A replay is a run's seed plus every jump: the frame it was applied before
+# and its sub-frame lead. Re-simulating those reproduces the run exactly, so
+# replays can be rendered offline (render_farm.py) at any resolution. The
+# last run played is always kept in REPLAY_DIR.
+REPLAY_DIR = "replays"
+REPLAY_VERSION = 1
+
+def save_replay(path, run, jumps):
+    replay = {"version": REPLAY_VERSION, "arena": run.arena_type, "character": run.character.character_type,
+              "seed": run.seed, "frames": run.game_time, "score": run.score, "jumps": jumps}
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as file:
+            json.dump(replay, file)
+    except OSError as error:
+        logger.warning("Could not save replay: %s", error)
+
+def load_replay(path):
+    with open(path) as file:
+        replay = json.load(file)
+    if replay.get("version") != REPLAY_VERSION:
+        raise ValueError(f"{path}: unsupported replay version {replay.get('version')}")
+    return replay
+
+class ReplayDriver:
+    # Steps a fresh run through a replay's inputs
+    def __init__(self, replay, effects=True):
+        self.replay = replay
+        self.run = GameRun(replay["arena"], replay["character"], effects, seed=replay["seed"])
+        self.jumps = {}
+        for frame, lead in replay["jumps"]:
+            self.jumps.setdefault(frame, []).append(lead)
+        self.frame = 0
+
+    def step(self):
+        for lead in self.jumps.get(self.frame, ()):
+            self.run.character.jump(lead)
+        self.run.step()
+        self.frame += 1
+
+    def skip_to(self, frame):
+        while self.frame < frame and not self.run.over:
+            self.step()
+
+def verify_replay(replay):
+    # Re-simulates without drawing; the run must end where it was recorded
+    driver = ReplayDriver(replay, effects=False)
+    driver.skip_to(replay["frames"])
+    run = driver.run
+    matched = run.game_time == replay["frames"] and run.score == replay["score"]
+    logger.log(logging.INFO if matched else logging.ERROR, "Replay %s: recorded %d frames, score %d; re-simulated %d frames, score %d",
+               "verified" if matched else "DIVERGED", replay["frames"], replay["score"], run.game_time, run.score)
+    return matched
+
+def watch_replay(replay):
+    # Plays a replay back in the window at normal speed; Escape stops it
+    driver = ReplayDriver(replay)
+    caption = font.render(f"REPLAY - {replay['arena']}, {replay['character']}", True, BLACK)
+    while driver.frame < replay["frames"] and not driver.run.over:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                return driver.run
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F11:
+                toggle_fullscreen()
+        driver.step()
+        driver.run.draw(screen)
+        driver.run.draw_hud(screen)
+        screen.blit(caption, (WIDTH // 2 - caption.get_width() // 2, HEIGHT // 4))
+        present()
+        clock.tick(FPS)
+    return driver.run
+
+# --- Two Players ---
+# Local head-to-head: two runs, each with its own obstacles and coins, drawn at
+# half scale into side-by-side or stacked viewports of the one window. Both
+# draw straight into their viewport and share the parallax layers, display
+# lists and HUD glyphs, so the second player costs little more than its own
+# entity blits.
+SPLIT_SCALE = 0.5
+SPLIT_LAYOUTS = [
+    ("side by side", ((0, HEIGHT // 4), (WIDTH // 2, HEIGHT // 4))),
+    ("stacked", ((WIDTH // 4, 0), (WIDTH // 4, HEIGHT // 2)))
+]
+PLAYER_KEYS = (pygame.K_w, pygame.K_UP)
+PLAYER_COLORS = ((200, 40, 40), (40, 80, 200))
+
+def blit_text(surface, text, text_font, color, pos):
+    # Text is assembled from cached glyphs, so changing numbers never render anything
+    x, y = pos
+    for char in text:
+        key = (text_font, char, color)
+        glyph = surface_cache.get("glyphs", key)
+        if glyph is None:
+            glyph = surface_cache.put("glyphs", key, text_font.render(char, True, color))
+        surface.blit(glyph, (x, y))
+        x += glyph.get_width()
+    return x
+
+def draw_cache_overlay(surface):
+    # F3 during a run: cache memory and hit rate per namespace
+    lines = surface_cache.report()
+    width, height = surface.get_size()
+    panel = pygame.Rect(width - 430, height - 20 * len(lines) - 20, 420, 20 * len(lines) + 10)
+    pygame.draw.rect(surface, WHITE, panel)
+    pygame.draw.rect(surface, BLACK, panel, 1)
+    for i, line in enumerate(lines):
+        blit_text(surface, line, small_font, BLACK, (panel.x + 6, panel.y + 5 + 20 * i))
+
+def split_viewports(layout):
+    width, height = int(WIDTH * SPLIT_SCALE), int(HEIGHT * SPLIT_SCALE)
+    screen.fill(BLACK)
+    return [screen.subsurface((x, y, width, height)) for x, y in SPLIT_LAYOUTS[layout][1]]
+
+def two_player_screen(arena_type, character_types):
+    runs = [GameRun(arena_type, character_type, particle_system=ParticleSystem(MAX_PARTICLES // 2))
+            for character_type in character_types]
+    layout = 0
+    viewports = split_viewports(layout)
+    
+    while not all(run.over for run in runs):
+        frame_start = time.perf_counter()
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+            if event.type == pygame.KEYDOWN:
+                if event.key in PLAYER_KEYS:
+                    runs[PLAYER_KEYS.index(event.key)].character.jump()
+                elif event.key == pygame.K_TAB:
+                    layout = (layout + 1) % len(SPLIT_LAYOUTS)
+                    viewports = split_viewports(layout)
+                elif event.key == pygame.K_ESCAPE:
+                    return MENU
+        
+        tier = quality_governor.tier
+        split_tier = dict(tier, render_scale=SPLIT_SCALE)
+        for player, (run, viewport) in enumerate(zip(runs, viewports)):
+            if not run.over:
+                run.step(tier["weather"])
+            run.draw(viewport, split_tier)
+            x = blit_text(viewport, f"P{player + 1}  ", font, PLAYER_COLORS[player], (8, 6))
+            x = blit_text(viewport, f"Score: {run.score}  ", small_font, BLACK, (x, 10))
+            blit_text(viewport, f"Coins: {run.coins_collected}", small_font, GOLD, (x, 10))
+            if run.over:
+                blit_text(viewport, "CRASHED", font, PLAYER_COLORS[player], (8, 40))
+        
+        present()
+        quality_governor.record((time.perf_counter() - frame_start) * 1000)
+        clock.tick(FPS)
+    
+    scores = [run.score for run in runs]
+    if scores[0] == scores[1]:
+        result = font.render(f"Draw! {scores[0]} each", True, WHITE)
+    else:
+        winner = scores.index(max(scores))
+        result = font.render(f"Player {winner + 1} wins {max(scores)} to {min(scores)}", True, PLAYER_COLORS[winner])
+    prompt = small_font.render("Press SPACE to return to the menu", True, WHITE)
+    screen.fill(BLACK)
+    screen.blit(result, (WIDTH // 2 - result.get_width() // 2, HEIGHT // 2 - 40))
+    screen.blit(prompt, (WIDTH // 2 - prompt.get_width() // 2, HEIGHT // 2 + 10))
+    present()
+    
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+            if event.type == pygame.KEYDOWN and event.key in (pygame.K_SPACE, pygame.K_ESCAPE):
+                return MENU
+        clock.tick(FPS)
+
+CHARACTERS = [
+    {"name": "Default", "type": "default", "cost": 0, "desc": "The basic runner."},
+    {"name": "Ninja", "type": "ninja", "cost": 0, "desc": "Chance to gain a shield."},
+    {"name": "Robot", "type": "robot", "cost": 0, "desc": "Heavy but strong."},
+    {"name": "Alien", "type": "alien", "cost": 0, "desc": "Jumps with low gravity."},
+    {"name": "Superhero", "type": "superhero", "cost": 0, "desc": "Can perform a double jump."},
+    {"name": "Flash", "type": "flash", "cost": 0, "desc": "A very fast runner."},
+    {"name": "Wizard", "type": "wizard", "cost": 0, "desc": "A magical runner."},
+    {"name": "Spy", "type": "spy", "cost": 0, "desc": "A stealthy agent."},
+    {"name": "Pirate", "type": "pirate", "cost": 0, "desc": "A swashbuckling adventurer."},
+    {"name": "Zombie", "type": "zombie", "cost": 0, "desc": "A spooky, shambling runner."},
+    {"name": "Hanya", "type": "curly_girl", "cost": 0, "desc": "ga3far."}
+]
+
 # Main Menu
 def main_menu(total_coins):
     button_height = 50
@@ -1249,10 +3347,22 @@ def main_menu(total_coins):
         {"text": "Start Game", "action": PLAYING, "y": button_y_start},
         {"text": "City Select", "action": ARENA_SELECT, "y": button_y_start + button_height + button_margin},
         {"text": "Character Shop", "action": SHOP, "y": button_y_start + 2*(button_height + button_margin)},
-        {"text": "Quit Game", "action": "quit", "y": button_y_start + 3*(button_height + button_margin)}
+        {"text": "Two Players", "action": TWO_PLAYER, "y": button_y_start + 3*(button_height + button_margin)},
+        {"text": "Quit Game", "action": "quit", "y": button_y_start + 4*(button_height + button_margin)}
     ]
     
+    idle_since = time.perf_counter()
+    mouse_at = pygame.mouse.get_pos()
+    
     while True:
+        # Motion events are filtered out, so watch the pointer itself
+        if pygame.mouse.get_pos() != mouse_at:
+            mouse_at = pygame.mouse.get_pos()
+            idle_since = time.perf_counter()
+        if (time.perf_counter() - idle_since) * 1000 > ATTRACT_DELAY_MS:
+            attract_mode()
+            idle_since = time.perf_counter()
+        
         screen.fill(WHITE)
         draw_background()
         
@@ -1273,14 +3383,16 @@ def main_menu(total_coins):
             text = font.render(button["text"], True, BLACK)
             screen.blit(text, (WIDTH // 2 - text.get_width() // 2, button["y"] + button_height // 2 - text.get_height() // 2))
         
-        pygame.display.flip()
+        present()
         
         for event in pygame.event.get():
+            if event.type in (pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN):
+                idle_since = time.perf_counter()
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
             if event.type == pygame.MOUSEBUTTONDOWN:
-                mouse_pos = pygame.mouse.get_pos()
+                mouse_pos = canvas_mouse_pos()
                 for button in buttons:
                     button_rect = pygame.Rect(WIDTH // 2 - button_width // 2, button["y"], button_width, button_height)
                     if button_rect.collidepoint(mouse_pos):
@@ -1293,6 +3405,10 @@ def main_menu(total_coins):
                     return PLAYING
                 elif event.key == pygame.K_s:
                     return SHOP
+                elif event.key == pygame.K_2:
+                    return TWO_PLAYER
+                elif event.key == pygame.K_F11:
+                    toggle_fullscreen()
                 elif event.key == pygame.K_q:
                     pygame.quit()
                     sys.exit()
@@ -1308,38 +3424,14 @@ def arena_select_screen():
     ]
     
     selected_index = 0
-    button_height = 60
-    button_width = 250
-    button_margin = 20
-    button_y_start = HEIGHT // 2 - 120
     
     while True:
-        screen.fill(WHITE)
-        # preview 
-        draw_background(cities[selected_index]["type"])
-        
-        title = font.render("SELECT CITY", True, BLACK)
-        back_text = font.render("Press B to Go Back", True, BLACK)
-        
-        screen.blit(title, (WIDTH // 2 - title.get_width() // 2, 30))
-        screen.blit(back_text, (WIDTH // 2 - back_text.get_width() // 2, HEIGHT - 50))
-
-        for i, city in enumerate(cities):
-            button_rect = pygame.Rect(WIDTH // 2 - button_width // 2, button_y_start + i*(button_height + button_margin), button_width, button_height)
-            
-            if i == selected_index:
-                pygame.draw.rect(screen, (200, 200, 0), button_rect)
-            else:
-                pygame.draw.rect(screen, (200, 200, 200, 180), button_rect)
-            
-            pygame.draw.rect(screen, BLACK, button_rect, 2)  
-            
-            text = font.render(city["name"], True, BLACK)
-            screen.blit(text, (WIDTH // 2 - text.get_width() // 2, button_y_start + i*(button_height + button_margin) + button_height // 2 - text.get_height() // 2))
-            
-            if not city["unlocked"]:
-                lock_text = small_font.render("LOCKED", True, (200, 0, 0))
-                screen.blit(lock_text, (WIDTH // 2 - lock_text.get_width() // 2, button_y_start + i*(button_height + button_margin) + button_height - 20))
+        # Everything but the highlight comes from one cached surface, laid
+        # out for the window's current size
+        window = pygame.display.get_surface()
+        grid, rects = get_city_grid(cities, window.get_size())
+        window.blit(grid, (0, 0))
+        pygame.draw.rect(window, (200, 200, 0), rects[selected_index].inflate(12, 12), 6)
         
         pygame.display.flip()
         
@@ -1350,32 +3442,86 @@ def arena_select_screen():
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_b:
                     return MENU, "giza"  
-                elif event.key == pygame.K_DOWN:
+                elif event.key in (pygame.K_DOWN, pygame.K_RIGHT):
                     selected_index = (selected_index + 1) % len(cities)
-                elif event.key == pygame.K_UP:
+                elif event.key in (pygame.K_UP, pygame.K_LEFT):
                     selected_index = (selected_index - 1) % len(cities)
                 elif event.key == pygame.K_RETURN:
                     selected_city = cities[selected_index]
                     if selected_city["unlocked"]:
                         return PLAYING, selected_city["type"]
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                for i, rect in enumerate(rects):
+                    if rect.collidepoint(event.pos) and cities[i]["unlocked"]:
+                        return PLAYING, cities[i]["type"]
+        
+        clock.tick(FPS)
     
     return MENU, "giza"
 
+# City select thumbnails: each arena is rendered once at full size and
+# smoothscaled down, and the whole screen minus the highlight is kept as one
+# surface per window size.
+def city_grid_layout(window_size, count, columns=3):
+    width, height = window_size
+    margin = width // 32
+    thumb_w = (width - margin * (columns + 1)) // columns
+    thumb_h = thumb_w * HEIGHT // WIDTH
+    rects = []
+    for i in range(count):
+        row, column = divmod(i, columns)
+        in_row = min(columns, count - row * columns)
+        # Partial rows are centred
+        left = (width - in_row * thumb_w - (in_row - 1) * margin) // 2
+        rects.append(pygame.Rect(left + column * (thumb_w + margin), 100 + row * (thumb_h + margin + 30), thumb_w, thumb_h))
+    return rects
+
+def bake_arena_thumbnail(arena_type, size):
+    full = pygame.Surface((WIDTH, HEIGHT)).convert()
+    draw_background(arena_type, 0, full)
+    return pygame.transform.smoothscale(full, size)
+
+def get_city_grid(cities, window_size):
+    cached = surface_cache.get("menus", ("city grid", window_size))
+    if cached is None:
+        # Thumbnails for a new size are baked in the background; until they
+        # are all in, the grid is drawn with placeholders and not kept
+        rects = city_grid_layout(window_size, len(cities))
+        thumbnails = []
+        for city, rect in zip(cities, rects):
+            thumbnails.append(surface_cache.get("thumbnails", (city["type"], rect.size)))
+            if thumbnails[-1] is None:
+                cache_baker.request("thumbnails", (city["type"], rect.size),
+                                    lambda arena_type=city["type"], size=rect.size: bake_arena_thumbnail(arena_type, size))
+        grid = pygame.Surface(window_size).convert()
+        grid.fill(WHITE)
+        width, height = window_size
+        
+        title = font.render("SELECT CITY", True, BLACK)
+        back_text = font.render("Press B to Go Back", True, BLACK)
+        grid.blit(title, (width // 2 - title.get_width() // 2, 30))
+        grid.blit(back_text, (width // 2 - back_text.get_width() // 2, height - 50))
+        
+        for city, rect, thumbnail in zip(cities, rects, thumbnails):
+            if thumbnail is None:
+                grid.fill((200, 200, 200), rect)
+            else:
+                grid.blit(thumbnail, rect)
+            pygame.draw.rect(grid, BLACK, rect, 2)
+            text = font.render(city["name"], True, BLACK)
+            grid.blit(text, (rect.centerx - text.get_width() // 2, rect.bottom + 6))
+            if not city["unlocked"]:
+                lock_text = small_font.render("LOCKED", True, (200, 0, 0))
+                grid.blit(lock_text, (rect.centerx - lock_text.get_width() // 2, rect.centery - lock_text.get_height() // 2))
+        
+        if None in thumbnails:
+            return grid, rects
+        cached = surface_cache.put("menus", ("city grid", window_size), (grid, rects))
+    return cached
+
 # Shop Screen with character preview
 def shop_screen(total_coins, current_character, owned_characters):
-    characters = [
-        {"name": "Default", "type": "default", "cost": 0, "desc": "The basic runner."},
-        {"name": "Ninja", "type": "ninja", "cost": 0, "desc": "Chance to gain a shield."},
-        {"name": "Robot", "type": "robot", "cost": 0, "desc": "Heavy but strong."},
-        {"name": "Alien", "type": "alien", "cost": 0, "desc": "Jumps with low gravity."},
-        {"name": "Superhero", "type": "superhero", "cost": 0, "desc": "Can perform a double jump."},
-        {"name": "Flash", "type": "flash", "cost": 0, "desc": "A very fast runner."},
-        {"name": "Wizard", "type": "wizard", "cost": 0, "desc": "A magical runner."},
-        {"name": "Spy", "type": "spy", "cost": 0, "desc": "A stealthy agent."},
-        {"name": "Pirate", "type": "pirate", "cost": 0, "desc": "A swashbuckling adventurer."},
-        {"name": "Zombie", "type": "zombie", "cost": 0, "desc": "A spooky, shambling runner."},
-        {"name": "Hanya", "type": "curly_girl", "cost": 0, "desc": "ga3far."}
-    ]
+    characters = CHARACTERS
 
     selected_index = 0
     
@@ -1413,7 +3559,8 @@ def shop_screen(total_coins, current_character, owned_characters):
             screen.blit(name_text, (list_x + 15, list_y + i * list_item_h + 10))
         
         selected_char_data = characters[selected_index]
-        preview_char.character_type = selected_char_data["type"]
+        if preview_char.character_type != selected_char_data["type"]:
+            preview_char.set_character_type(selected_char_data["type"])
         
         pedestal_w, pedestal_h = 150, 20
         pedestal_x, pedestal_y = preview_x - pedestal_w//2, preview_y + 20
@@ -1435,7 +3582,7 @@ def shop_screen(total_coins, current_character, owned_characters):
         screen.blit(status_text, (preview_x - status_text.get_width()//2, preview_y + 120))
 
 
-        pygame.display.flip()
+        present()
         
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -1488,14 +3635,14 @@ def pause_menu(current_coins):
             text = font.render(button["text"], True, BLACK)
             screen.blit(text, (WIDTH // 2 - text.get_width() // 2, button["y"] + button_height // 2 - text.get_height() // 2))
         
-        pygame.display.flip()
+        present()
         
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
             if event.type == pygame.MOUSEBUTTONDOWN:
-                mouse_pos = pygame.mouse.get_pos()
+                mouse_pos = canvas_mouse_pos()
                 for button in buttons:
                     button_rect = pygame.Rect(WIDTH // 2 - button_width // 2, button["y"], button_width, button_height)
                     if button_rect.collidepoint(mouse_pos):
@@ -1526,7 +3673,7 @@ def high_score_screen(score):
     screen.blit(score_text, (WIDTH // 2 - score_text.get_width() // 2, HEIGHT // 2))
     screen.blit(continue_text, (WIDTH // 2 - continue_text.get_width() // 2, HEIGHT // 2 + 50))
     
-    pygame.display.flip()
+    present()
     
     waiting = True
     while waiting:
@@ -1538,7 +3685,7 @@ def high_score_screen(score):
                 waiting = False
 
 # Game Over Screen
-def game_over_screen(score, coins_collected, total_coins, owned_characters):
+def game_over_screen(score, coins_collected, total_coins, owned_characters, submission=None):
     global highscore
     new_high_score = False
     
@@ -1549,6 +3696,12 @@ def game_over_screen(score, coins_collected, total_coins, owned_characters):
     total_coins += coins_collected
     save_data(highscore, total_coins, owned_characters)
     
+    # submission is (arena, character); queuing it never waits on the network
+    leaderboard_text = None
+    if submission is not None and score_client is not None:
+        score_client.submit(submission[0], submission[1], score)
+        leaderboard_text = small_font.render(f"Leaderboard: {score_client.status()}", True, BLACK)
+    
     lose_sound.play()
     screen.fill(WHITE)
     draw_background()
@@ -1574,6 +3727,8 @@ def game_over_screen(score, coins_collected, total_coins, owned_characters):
     screen.blit(high_score_text, (WIDTH // 2 - high_score_text.get_width() // 2, HEIGHT // 4 + 80))
     screen.blit(coins_text, (WIDTH // 2 - coins_text.get_width() // 2, HEIGHT // 4 + 120))
     screen.blit(total_coins_text, (WIDTH // 2 - total_coins_text.get_width() // 2, HEIGHT // 4 + 160))
+    if leaderboard_text is not None:
+        screen.blit(leaderboard_text, (WIDTH // 2 - leaderboard_text.get_width() // 2, HEIGHT // 4 + 200))
     
     for button in buttons:
         button_rect = pygame.Rect(WIDTH // 2 - button_width // 2, button["y"], button_width, button_height)
@@ -1583,7 +3738,7 @@ def game_over_screen(score, coins_collected, total_coins, owned_characters):
         text = font.render(button["text"], True, BLACK)
         screen.blit(text, (WIDTH // 2 - text.get_width() // 2, button["y"] + button_height // 2 - text.get_height() // 2))
     
-    pygame.display.flip()
+    present()
     
     waiting = True
     while waiting:
@@ -1592,7 +3747,7 @@ def game_over_screen(score, coins_collected, total_coins, owned_characters):
                 pygame.quit()
                 sys.exit()
             if event.type == pygame.MOUSEBUTTONDOWN:
-                mouse_pos = pygame.mouse.get_pos()
+                mouse_pos = canvas_mouse_pos()
                 for button in buttons:
                     button_rect = pygame.Rect(WIDTH // 2 - button_width // 2, button["y"], button_width, button_height)
                     if button_rect.collidepoint(mouse_pos):
@@ -1606,12 +3761,478 @@ def game_over_screen(score, coins_collected, total_coins, owned_characters):
     return MENU, total_coins
 
 
-def main():
-    global highscore, total_coins, owned_characters, SPEED
+# --- Soak Test ---
+# Kiosks run for days. soak_test() plays run after run with the autopilot,
+# going through the same high score and game over screens as main(), and
+# periodically checks resident memory, tracemalloc growth per subsystem and
+# how many game objects are still alive.
+def resident_memory_kb():
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, AttributeError):
+        # Not Linux: fall back to the peak, which still catches steady growth
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def source_spans():
+    # (first line, last line, name) of every top-level class and function in this file
+    with open(__file__, encoding="utf-8") as file:
+        tree = ast.parse(file.read())
+    return [(node.lineno, node.end_lineno, node.name) for node in tree.body
+            if isinstance(node, (ast.ClassDef, ast.FunctionDef))]
+
+def subsystem_of(frame, spans, this_file=os.path.abspath(__file__)):
+    if os.path.abspath(frame.filename) == this_file:
+        for first, last, name in spans:
+            if first <= frame.lineno <= last:
+                return name
+        return "module level"
+    parts = os.path.normpath(frame.filename).split(os.sep)
+    if "site-packages" in parts and parts.index("site-packages") + 1 < len(parts):
+        return parts[parts.index("site-packages") + 1]
+    return os.path.splitext(parts[-1])[0]
+
+def live_object_counts(run):
+    counts = {"Obstacle": 0, "Coin": 0, "Cloud": 0, "CartoonCharacter": 0, "GameRun": 0}
+    for obj in gc.get_objects():
+        name = type(obj).__name__
+        if name in counts:
+            counts[name] += 1
+    # Anything alive beyond what the current run holds has leaked from an
+    # earlier one. The run also holds the objects its current and next chunk
+    # were built with, spawned or not, and a spawned one is in both places.
+    chunks = (run.chunk, run.next_chunk)
+    held_obstacles = {id(obstacle) for obstacle in run.obstacles}
+    held_obstacles.update(id(obstacle) for _, obstacles, _ in chunks for _, obstacle in obstacles)
+    held_coins = {id(coin) for coin in run.coins}
+    held_coins.update(id(coin) for _, _, coins in chunks for _, coin in coins)
+    counts["leftover obstacles"] = counts["Obstacle"] - len(held_obstacles)
+    counts["leftover coins"] = counts["Coin"] - len(held_coins)
+    counts["leftover clouds"] = counts["Cloud"] - len(run.clouds)
+    counts["particles"] = particles.count
+    counts["parallax layer sets"] = surface_cache.count("background")
+    counts["character display lists"] = surface_cache.count("characters")
+    counts["obstacle display lists"] = surface_cache.count("obstacles")
+    counts["jump arcs"] = len(jump_arcs)
+    counts["render targets"] = surface_cache.count("render targets")
+    counts["cached KB"] = surface_cache.bytes // 1024
+    return counts
+
+def memory_slope(samples):
+    # Least-squares slope of (minutes, KB) samples, in KB per minute
+    n = len(samples)
+    mean_t = sum(t for t, _ in samples) / n
+    mean_m = sum(m for _, m in samples) / n
+    variance = sum((t - mean_t) ** 2 for t, _ in samples)
+    if variance == 0:
+        return 0.0
+    return sum((t - mean_t) * (m - mean_m) for t, m in samples) / variance
+
+def soak_test(duration=None, snapshot_interval=60, max_slope_kb_per_min=256, warmup_snapshots=2,
+              max_run_frames=3600, render=True):
+    global DATA_FILE, highscore, total_coins
+    # Never touch the player's real progress, nor leave a save file behind
+    saved_data_file = DATA_FILE
+    data_directory = tempfile.mkdtemp(prefix="city_runner_soak_")
+    DATA_FILE = os.path.join(data_directory, "gamedata.txt")
+    spans = source_spans()
+    tracemalloc.start()
+    
+    arenas = list(ARENA_LAYERS)
+    start = time.perf_counter()
+    deadline = None if duration is None else start + duration
+    next_snapshot = start + snapshot_interval
+    baseline = None
+    snapshots = 0
+    samples = []
+    runs = 0
+    frames = 0
+    passed = True
+    logger.info("Soak test started: snapshot every %gs, limit %d KB/min", snapshot_interval, max_slope_kb_per_min)
+    
+    try:
+        while deadline is None or time.perf_counter() < deadline:
+            run = GameRun(arenas[runs % len(arenas)], CHARACTERS[runs % len(CHARACTERS)]["type"], effects=render)
+            autopilot = Autopilot()
+            runs += 1
+            # Paced at the game's tick rate, so a minute of soak is a minute of
+            # play; restarted after the screens between runs
+            pacer.set_fps(FPS)
+            
+            while not run.over:
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        raise KeyboardInterrupt
+                # Past the run length limit the autopilot lets go, so the runner
+                # crashes into the next obstacle and the game over path runs
+                if run.game_time < max_run_frames and autopilot.should_jump(run.character, run.obstacles):
+                    run.character.jump()
+                run.step()
+                if run.game_time >= max_run_frames * 2:
+                    # A shielded runner may never crash; end the run anyway
+                    run.over = True
+                if render:
+                    run.draw(screen)
+                    run.draw_hud(screen)
+                    present()
+                frames += 1
+                pacer.wait()
+                
+                now = time.perf_counter()
+                if deadline is not None and now >= deadline:
+                    # A run can last minutes; stop mid-run rather than overrun
+                    break
+                if now < next_snapshot:
+                    continue
+                next_snapshot = now + snapshot_interval
+                
+                gc.collect()
+                snapshot = tracemalloc.take_snapshot()
+                snapshots += 1
+                rss = resident_memory_kb()
+                elapsed = (now - start) / 60
+                counts = live_object_counts(run)
+                logger.info("Soak %.1f min: %d runs, %d frames, RSS %d KB, %s", elapsed, runs, frames, rss,
+                            ", ".join(f"{name} {count}" for name, count in counts.items()))
+                if baseline is None:
+                    # The caches fill up over the first minutes of play; memory
+                    # is measured from the first snapshot after that, or once
+                    # the warm-up snapshots are over if they never fill
+                    if snapshots < warmup_snapshots and not surface_cache.full():
+                        logger.info("Soak warming up: %d KB cached of %d KB",
+                                    surface_cache.bytes // 1024, surface_cache.budget // 1024)
+                        continue
+                    baseline = snapshot
+                else:
+                    growth = {}
+                    for stat in snapshot.compare_to(baseline, "lineno"):
+                        subsystem = subsystem_of(stat.traceback[0], spans)
+                        growth[subsystem] = growth.get(subsystem, 0) + stat.size_diff
+                    top = sorted(growth.items(), key=lambda item: -item[1])[:8]
+                    logger.info("Soak growth since warm-up: %s",
+                                ", ".join(f"{name} {size / 1024:+.1f} KB" for name, size in top))
+                
+                samples.append((elapsed, rss))
+                if len(samples) >= 3:
+                    slope = memory_slope(samples)
+                    if slope > max_slope_kb_per_min:
+                        logger.error("Soak FAILED: resident memory growing %.1f KB/min (limit %d KB/min)",
+                                     slope, max_slope_kb_per_min)
+                        passed = False
+                        return passed
+            
+            if not run.over:
+                break
+            # Game over, the same way main() handles it
+            if run.score > highscore:
+                pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_SPACE))
+                high_score_screen(run.score)
+            pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_SPACE))
+            game_state, total_coins = game_over_screen(run.score, run.coins_collected, total_coins, owned_characters)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        tracemalloc.stop()
+        DATA_FILE = saved_data_file
+        shutil.rmtree(data_directory, ignore_errors=True)
+    
+    slope = memory_slope(samples) if len(samples) >= 2 else 0.0
+    if len(samples) < 2:
+        # Too short to fit a slope: nothing was measured, so nothing passed
+        logger.error("Soak FAILED: %d snapshots after warm-up, at least 2 are needed "
+                     "(lower --snapshot-interval or raise --duration)", len(samples))
+        passed = False
+    logger.info("Soak finished: %d runs, %d frames, %.1f min, RSS slope %.1f KB/min (limit %d) - %s",
+                runs, frames, (time.perf_counter() - start) / 60, slope, max_slope_kb_per_min,
+                "PASSED" if passed else "FAILED")
+    return passed
+
+# --- Simulation Benchmark ---
+# Catches slowdowns in the per-frame game logic before players do. Fixed-seed
+# autopilot runs are stepped headless (no drawing, no particles) for each
+# scenario: untraced for ticks per second, then under tracemalloc for the
+# memory allocated per tick. CPython has no running count of allocations, so
+# "allocated per tick" is how far the traced footprint peaks above where the
+# tick started; a tick that builds more temporaries peaks higher. The results
+# are compared with bench_baseline.json, recorded with bench --update.
+# Allocation is deterministic for fixed seeds and is the pass/fail gate.
+# Timing is not: even normalised by the reference loop, one scenario can swing
+# 25% between back-to-back runs on a shared machine, so speed is compared as
+# the median of the repeats against the baseline's median and spread, and
+# only ever reported.
+BENCH_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+BENCH_SEED = 1
+# Fast enough that every chunk comes from the hardest level
+BENCH_MAX_SPEED = 5 + (CHUNK_LEVELS - 1) * CHUNK_SPEED_BAND
+# Iterations of the fixed pure-Python loop timed around every repeat
+BENCH_REFERENCE_LOOPS = 200000
+# A scenario is reported slower once its median drops by more than this many
+# median absolute deviations (of the baseline and this run together)
+BENCH_SPEED_MADS = 4
+
+def bench_reference():
+    # Millions of reference loop iterations per CPU second. Shared and
+    # throttled machines change speed from one second to the next, so
+    # ticks are judged per reference iteration rather than per second.
+    start = time.process_time()
+    total = 0
+    for i in range(BENCH_REFERENCE_LOOPS):
+        total += i * i % 7
+    return BENCH_REFERENCE_LOOPS / (time.process_time() - start) / 1e6
+
+def bench_max_speed(run):
+    global SPEED
+    SPEED = run.speed = BENCH_MAX_SPEED
+    run.chunk = run.prepare_chunk()
+    run.next_chunk = run.prepare_chunk()
+
+def bench_coin_storm(run):
+    # A coin every third frame anywhere in the jump band, on top of the chunk's own
+    if run.game_time % 3 == 0:
+        run.coins.append(Coin(run.rng.randint(100, GROUND_HEIGHT - 30)))
+
+def bench_scenarios():
+    # name: (arena, character, run setup, per-tick hook)
+    scenarios = {"default density": ("giza", "default", None, None),
+                 "max speed": ("giza", "default", bench_max_speed, None),
+                 "coin storm": ("giza", "default", None, bench_coin_storm)}
+    for character in CHARACTERS:
+        scenarios["character " + character["type"]] = ("giza", character["type"], None, None)
+    return scenarios
+
+def bench_ticks(scenario, ticks, seed=BENCH_SEED, traced=False):
+    # Plays the scenario for a fixed number of ticks, starting a new run with
+    # the next seed whenever one ends. Returns ticks per second, bytes
+    # allocated per tick (traced only) and how many runs it took.
+    arena_type, character_type, setup, hook = scenario
+    run = None
+    runs = 0
+    allocated = 0
+    # CPU time, so whatever else the machine is doing doesn't count against us
+    start = time.process_time()
+    for tick in range(ticks):
+        if traced:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        if run is None or run.over:
+            run = GameRun(arena_type, character_type, effects=False, seed=seed + runs)
+            autopilot = Autopilot()
+            runs += 1
+            if setup is not None:
+                setup(run)
+        if hook is not None:
+            hook(run)
+        if autopilot.should_jump(run.character, run.obstacles):
+            run.character.jump()
+        run.step()
+        if traced:
+            allocated += tracemalloc.get_traced_memory()[1] - before
+    elapsed = time.process_time() - start
+    return ticks / elapsed, allocated / ticks, runs
+
+def simulation_benchmark(ticks=10000, repeats=5, speed_tolerance=0.1, allocation_tolerance=0.05, update=False,
+                         path=BENCH_BASELINE):
+    global jump_sound, coin_sound
+    # Sounds are not game logic, and a jump sound per tick at these rates
+    # keeps SDL's audio thread calling back into Python, which can crash
+    # while tracemalloc is being stopped
+    jump_sound = coin_sound = DummySound()
+    results = {}
+    for name, scenario in bench_scenarios().items():
+        # Warm the chunk, jump arc and display list caches first
+        bench_ticks(scenario, 500)
+        speeds = []
+        normalised = []
+        for _ in range(repeats):
+            reference = bench_reference()
+            ticks_per_s, _, runs = bench_ticks(scenario, ticks)
+            reference = (reference + bench_reference()) / 2
+            speeds.append(ticks_per_s)
+            normalised.append(ticks_per_s / reference)
+        per_reference = float(np.median(normalised))
+        spread = float(np.median(np.abs(np.array(normalised) - per_reference)))
+        tracemalloc.start()
+        try:
+            _, allocated, _ = bench_ticks(scenario, ticks, traced=True)
+        finally:
+            tracemalloc.stop()
+        results[name] = {"ticks_per_s": round(float(np.median(speeds)), 1), "ticks_per_reference": round(per_reference, 1),
+                         "ticks_per_reference_mad": round(spread, 1), "bytes_per_tick": round(allocated, 1),
+                         "runs": runs}
+        logger.info("Benchmark %-20s %9.0f ticks/s (%.0f +- %.0f per M reference loops) %8.0f bytes allocated per tick "
+                    "(%d runs)", name, np.median(speeds), per_reference, spread, allocated, runs)
     
-    game_state = MENU
-    current_character = "default"
-    current_city = "giza"
+    # Bytes per tick depend on how long the runs go on, so there is one
+    # baseline per --ticks value and runs of other lengths are never compared
+    environment = {"python": platform.python_version(), "machine": platform.machine()}
+    try:
+        with open(path) as file:
+            baseline = json.load(file)
+    except (OSError, ValueError):
+        baseline = None
+    if update:
+        if baseline is None or baseline.get("environment") != environment:
+            baseline = {"environment": environment, "ticks": {}}
+        baseline.setdefault("ticks", {})[str(ticks)] = results
+        with open(path, "w") as file:
+            json.dump(baseline, file, indent=2)
+        logger.info("Benchmark baseline for %d ticks written to %s", ticks, path)
+        return True
+    if baseline is None:
+        logger.warning("No benchmark baseline at %s; record one with bench --update", path)
+        return True
+    if baseline.get("environment") != environment:
+        logger.warning("Benchmark baseline was recorded on %s, this is %s", baseline.get("environment"), environment)
+    scenarios = baseline.get("ticks", {}).get(str(ticks))
+    if scenarios is None:
+        logger.warning("No benchmark baseline for %d ticks in %s (it has %s); record one with bench --ticks %d --update",
+                       ticks, path, ", ".join(sorted(baseline.get("ticks", {}), key=int)) or "none", ticks)
+        return True
+    
+    passed = True
+    for name, result in results.items():
+        base = scenarios.get(name)
+        if base is None:
+            logger.info("Benchmark %-20s not in the baseline", name)
+            continue
+        speed = result["ticks_per_reference"] / base["ticks_per_reference"] - 1
+        # Slower only past both the tolerance and the noise both runs showed
+        noise = BENCH_SPEED_MADS * (result["ticks_per_reference_mad"] + base.get("ticks_per_reference_mad", 0))
+        slower = speed < -speed_tolerance and base["ticks_per_reference"] - result["ticks_per_reference"] > noise
+        allocation = (result["bytes_per_tick"] - base["bytes_per_tick"]) / max(base["bytes_per_tick"], 1)
+        regressed = allocation > allocation_tolerance
+        passed = passed and not regressed
+        logger.log(logging.ERROR if regressed else logging.WARNING if slower else logging.INFO,
+                   "Benchmark %-20s ticks/s %+6.1f%%, bytes per tick %+6.1f%% vs baseline%s%s",
+                   name, speed * 100, allocation * 100, " - slower (timing is advisory)" if slower else "",
+                   " - REGRESSED" if regressed else "")
+    logger.info("Benchmark %s (limit: %d%% more allocated per tick; ticks/s reported past %d%% and %d MADs slower)",
+                "PASSED" if passed else "FAILED", allocation_tolerance * 100, speed_tolerance * 100, BENCH_SPEED_MADS)
+    return passed
+
+# --- Frame Capture ---
+# Records gameplay for QA and trailers without a screen recorder. Each frame
+# the display surface is read through a buffer view (no Python-level copy)
+# and copied with a single memcpy into a preallocated slot of a small ring; a
+# writer thread turns filled slots into files and hands them back. When the
+# writer falls behind there is no free slot and the frame is dropped rather
+# than waited for. Frame numbers in the output keep counting across drops,
+# and on from the last frame already there when a capture directory is reused.
+CAPTURE_SLOTS = 8
+
+class FrameCapture:
+    def __init__(self, directory, image_format="raw", slots=CAPTURE_SLOTS):
+        # image_format "raw" appends pixels to frames.raw and a line per frame
+        # to frames.txt; "png" writes one image per frame, which is far slower
+        self.directory = directory
+        self.image_format = image_format
+        self.slots = slots
+        self.layout = None
+        self.free = None
+        self.filled = queue.Queue()
+        self.frame = 0
+        self.captured = 0
+        self.dropped = 0
+        self.written = 0
+        self.closed = False
+        os.makedirs(directory, exist_ok=True)
+        self.frame = self.last_frame()
+        if self.frame:
+            logger.info("Capture: %s already has frames up to %d, numbering on from there", directory, self.frame)
+        self.thread = threading.Thread(target=self.write_frames, name="frame-capture", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def last_frame(self):
+        # Highest frame number an earlier capture left in the directory, or 0
+        if self.image_format == "raw":
+            last = 0
+            try:
+                with open(os.path.join(self.directory, "frames.txt")) as index:
+                    for line in index:
+                        if line.strip():
+                            last = int(line.split()[0])
+            except (OSError, ValueError):
+                pass
+            return last
+        return max((int(name[6:-4]) for name in os.listdir(self.directory)
+                    if name.startswith("frame_") and name.endswith(".png") and name[6:-4].isdigit()), default=0)
+
+    def capture(self, surface):
+        self.frame += 1
+        layout = (surface.get_size(), surface.get_pitch(), surface.get_masks())
+        if layout != self.layout:
+            # New window size: a fresh ring; slots of the old size are left to the writer
+            self.layout = layout
+            self.free = queue.Queue()
+            for i in range(self.slots):
+                self.free.put(np.empty(layout[1] * layout[0][1], dtype=np.uint8))
+        try:
+            slot = self.free.get_nowait()
+        except queue.Empty:
+            self.dropped += 1
+            return False
+        view = surface.get_view("1")
+        np.copyto(slot, np.frombuffer(view, dtype=np.uint8))
+        del view
+        self.filled.put((self.frame, layout, slot, self.free))
+        self.captured += 1
+        return True
+
+    def write_frames(self):
+        raw = index = None
+        target = target_layout = None
+        while True:
+            item = self.filled.get()
+            if item is None:
+                break
+            frame, layout, slot, free = item
+            (width, height), pitch, masks = layout
+            try:
+                if self.image_format == "raw":
+                    if raw is None:
+                        raw = open(os.path.join(self.directory, "frames.raw"), "ab")
+                        index = open(os.path.join(self.directory, "frames.txt"), "a")
+                    raw.write(slot)
+                    index.write(f"{frame} {width} {height} {pitch} {masks[0]:x} {masks[1]:x} {masks[2]:x}\n")
+                else:
+                    if target_layout != layout:
+                        target = pygame.Surface((width, height), 0, 32, masks)
+                        target_layout = layout
+                    view = target.get_view("1")
+                    np.copyto(np.frombuffer(view, dtype=np.uint8), slot)
+                    del view
+                    pygame.image.save(target, os.path.join(self.directory, f"frame_{frame:06d}.png"))
+                self.written += 1
+            except (OSError, pygame.error) as error:
+                logger.warning("Capture of frame %d failed: %s", frame, error)
+            free.put(slot)
+        if raw is not None:
+            raw.close()
+            index.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.filled.put(None)
+        self.thread.join()
+        logger.info("Capture: %d frames written to %s, %d dropped", self.written, self.directory, self.dropped)
+
+# Shared LAN leaderboard; scores queue on disk until the server takes them
+score_client = None
+
+def main(autopilot=None, capture=None, latency=None, renderer=None, arena=None, character=None):
+    global highscore, total_coins, owned_characters, score_client
+    
+    if score_client is None:
+        score_client = ScoreClient().start()
+    
+    # Picking an arena or character on the command line skips the menus
+    game_state = PLAYING if arena or character else MENU
+    current_character = character or "default"
+    current_city = arena or "giza"
     
     while True:
         if game_state == MENU:
@@ -1620,42 +4241,56 @@ def main():
         elif game_state == ARENA_SELECT:
             game_state, current_city = arena_select_screen()
         
+        elif game_state == TWO_PLAYER:
+            game_state = two_player_screen(current_city, (current_character, current_character))
+        
         elif game_state == SHOP:
             game_state, current_character, total_coins, owned_characters = shop_screen(total_coins, current_character, owned_characters)
             save_data(highscore, total_coins, owned_characters) 
         elif game_state == PLAYING:
-            SPEED = 5
-            
-            character = CartoonCharacter()
-            character.character_type = current_character
-            character.reset()
-
-            obstacles = []
-            coins = []
-            clouds = []
-            score = 0
-            coins_collected = 0
-            game_time = 0
-            obstacle_timer = 0
-            coin_timer = 0
-            cloud_timer = 0
+            run = GameRun(current_city, current_character)
+            character = run.character
+            ghost = load_ghost(current_city, current_character)
+            recorder = GhostRecorder(character.y)
+            # (frame, lead) for the replay: the frame is the step the jump precedes
+            jumps = []
+            # Jump key stamps waiting for the next simulation step; above FPS
+            # a display frame need not step at all
+            presses = []
             running = True
             paused = False
+            show_cache_stats = False
+            input_queue = InputQueue()
+            # Simulation frames owed; one display frame is worth FPS / pacer.fps of them
+            sim_due = 0.0
+            pacer.reset_stats()
+            logger.info("Run started at quality tier %d (%s)", quality_governor.level, quality_governor.tier["name"])
             
-            next_obstacle_time = random.randint(60, 180)
-            
+            jumped = False
             while running:
-                for event in pygame.event.get():
+                frame_start = time.perf_counter()
+                for stamp, event in input_queue.drain():
                     if event.type == pygame.QUIT:
                         save_data(highscore, total_coins, owned_characters)
+                        if capture is not None:
+                            capture.close()
+                        if latency is not None:
+                            logger.info(latency.report())
                         pygame.quit()
                         sys.exit()
                     if event.type == pygame.KEYDOWN:
                         if event.key == pygame.K_SPACE:
-                            character.jump()
+                            presses.append(stamp)
+                            if latency is not None:
+                                latency.press(stamp)
                         elif event.key == pygame.K_p:
                             paused = True
-                            game_state = pause_menu(coins_collected)
+                            if renderer is not None:
+                                renderer.sync()
+                            # The pause menu is drawn over the run on the menu canvas
+                            run.draw(screen, quality_governor.tier)
+                            run.draw_hud(screen)
+                            game_state = pause_menu(run.coins_collected)
                             if game_state != PLAYING:
                                 running = False
                             else:
@@ -1663,95 +4298,561 @@ def main():
                         elif event.key == pygame.K_ESCAPE:
                             running = False
                             game_state = MENU
+                        elif event.key == pygame.K_F3:
+                            show_cache_stats = not show_cache_stats
+                        elif event.key == pygame.K_F11:
+                            toggle_fullscreen()
                 
                 if paused:
                     continue
                 
-                game_time += 1
-                
-                obstacle_timer += 1
-                if obstacle_timer >= next_obstacle_time:
-                    obstacles.append(Obstacle(game_time, current_city))
-                    obstacle_timer = 0
-                    min_interval = max(30, 90 - score // 5)
-                    max_interval = max(60, 180 - score // 2)
-                    next_obstacle_time = random.randint(min_interval, max_interval)
-                
-                coin_timer += 1
-                if coin_timer >= 30 and random.random() < 0.1:
-                    coins.append(Coin())
-                    coin_timer = 0
-                
-                cloud_timer += 1
-                if cloud_timer >= 100:
-                    clouds.append(Cloud())
-                    cloud_timer = 0
-                
-                character.update()
-                
-                for obstacle in obstacles[:]:
-                    obstacle.update()
-                    if obstacle.off_screen():
-                        obstacles.remove(obstacle)
-                        if not obstacle.passed:
-                            score += 1
-                            obstacle.passed = True
-                    elif obstacle.collide(character):
+                tier = quality_governor.tier
+                sim_due += FPS / pacer.fps
+                if sim_due >= 1:
+                    # Targets are never below FPS, so this is at most one step
+                    sim_due -= 1
+                    # The lead is how long before this step the key went down
+                    step_time = time.perf_counter()
+                    for stamp in presses:
+                        lead = jump_lead(stamp, step_time)
+                        character.jump(lead)
+                        jumps.append((run.game_time, lead))
+                        jumped = True
+                    presses.clear()
+                    if autopilot is not None and autopilot.should_jump(character, run.obstacles):
+                        character.jump()
+                        jumps.append((run.game_time, 0.0))
+                        jumped = True
+                    
+                    run.step(tier["weather"])
+                    recorder.record(character.y, jumped)
+                    jumped = False
+                    if ghost is not None:
+                        ghost.step()
+                    if run.over:
                         running = False
+                        sim_due = 0.0
                 
-                for coin in coins[:]:
-                    coin.update()
-                    if coin.off_screen():
-                        coins.remove(coin)
-                    elif coin.collide(character):
-                        coins_collected += 1
-                        coin.collected = True
-                        coin_sound.play()
-                        coins.remove(coin)
-                
-                for cloud in clouds[:]:
-                    cloud.update()
-                    if cloud.off_screen():
-                        clouds.remove(cloud)
-                
-                if game_time % 500 == 0:
-                    SPEED += 0.25
-                
-                draw_background(current_city)
-                
-                for cloud in clouds:
-                    cloud.draw(screen)
-                
-                character.draw(screen)
-                
-                for obstacle in obstacles:
-                    obstacle.draw(screen)
-                
-                for coin in coins:
-                    coin.draw(screen)
-                
-                score_text = font.render(f"Score: {score}", True, BLACK)
-                high_score_text = small_font.render(f"High Score: {highscore}", True, BLACK)
-                coins_text = font.render(f"Coins: {coins_collected}", True, GOLD)
-                
-                screen.blit(score_text, (10, 10))
-                screen.blit(high_score_text, (10, 40))
-                screen.blit(coins_text, (10, 70))
-                
-                if character.shield_active:
-                    shield_text = small_font.render("SHIELD ACTIVE!", True, (0, 100, 255))
-                    screen.blit(shield_text, (WIDTH - 140, 10))
+                # Drawn straight into the window at its own resolution
+                layout = current_layout()
+                window = pygame.display.get_surface()
+                described = None
+                if renderer is not None:
+                    renderer.submit(describe_run(run, ghost), tier, sim_due, layout, show_cache_stats)
+                    described = renderer.present(window, layout) or 0.0
+                else:
+                    view = window.subsurface(layout.viewport)
+                    run.draw(view, tier, sim_due, layout.scale)
+                    if ghost is not None:
+                        ghost.draw(view, character.x, layout.scale)
+                    run.draw_hud(view, layout.scale)
+                    if show_cache_stats:
+                        draw_cache_overlay(view)
+                    layout.clear_bars(window)
+                    del view
                 
                 pygame.display.flip()
-                clock.tick(FPS)
+                if latency is not None:
+                    latency.presented(described)
+                if capture is not None:
+                    capture.capture(window)
+                quality_governor.record((time.perf_counter() - frame_start) * 1000)
+                pacer.wait(input_queue.poll)
             
+            if renderer is not None:
+                renderer.sync()
+                logger.info("Render thread: %d frames, %.2f ms per frame composing",
+                            renderer.composed, renderer.compose_ms / max(renderer.composed, 1))
+            if capture is not None:
+                logger.info("Capture: %d frames captured, %d dropped so far", capture.captured, capture.dropped)
+            logger.info("Run ended at quality tier %d (%s), %d tier switches so far",
+                        quality_governor.level, quality_governor.tier["name"], quality_governor.switches)
+            for line in pacer.report():
+                logger.info(line)
+            if latency is not None:
+                logger.info(latency.report())
+            if autopilot is not None:
+                logger.info("Autopilot: %d decisions, %d jumps, %.2f us per decision",
+                            autopilot.decisions, autopilot.jumps, autopilot.average_decision_us())
+            save_replay(os.path.join(REPLAY_DIR, "last_run.json"), run, jumps)
             if game_state == PLAYING: 
-                if score > highscore:
-                    high_score_screen(score)
-                game_state, total_coins = game_over_screen(score, coins_collected, total_coins, owned_characters)
+                save_ghost(current_city, current_character, run.score, recorder)
+                if run.score > highscore:
+                    high_score_screen(run.score)
+                game_state, total_coins = game_over_screen(run.score, run.coins_collected, total_coins, owned_characters,
+                                                           (current_city, current_character))
         
         else:
             game_state = MENU
 
+# --- Headless Runs ---
+# Autopilot runs with nothing drawn and no sound, for checking balance
+# changes and producing replays in bulk without a window.
+HEADLESS_MAX_FRAMES = 18000
+
+def headless_runs(runs=1, seed=None, arena_type="giza", character_type="default", max_frames=HEADLESS_MAX_FRAMES,
+                  replay_dir=None):
+    # Seeds count up from seed, so the same command line gives the same runs
+    results = []
+    start = time.perf_counter()
+    for index in range(runs):
+        run = GameRun(arena_type, character_type, effects=False, seed=None if seed is None else seed + index)
+        autopilot = Autopilot()
+        jumps = []
+        while not run.over and run.game_time < max_frames:
+            if autopilot.should_jump(run.character, run.obstacles):
+                run.character.jump()
+                jumps.append((run.game_time, 0.0))
+            run.step()
+        logger.info("Run %d: seed %d, %d frames, score %d, %d coins%s", index + 1, run.seed, run.game_time,
+                    run.score, run.coins_collected, "" if run.over else " (still running at the frame limit)")
+        if replay_dir is not None:
+            save_replay(os.path.join(replay_dir, f"seed_{run.seed}.json"), run, jumps)
+        results.append({"seed": run.seed, "frames": run.game_time, "score": run.score,
+                        "coins": run.coins_collected, "over": run.over})
+    elapsed = time.perf_counter() - start
+    frames = sum(result["frames"] for result in results)
+    logger.info("%d headless runs: %d frames in %.2f s (%.0f frames/s), mean score %.1f", len(results), frames,
+                elapsed, frames / max(elapsed, 1e-9), sum(result["score"] for result in results) / max(len(results), 1))
+    return results
+
+def always_shield(character):
+    # A shield from every coin: the step check's worst case for pickups
+    # that change what the obstacle sweep must let through
+    character.shield_active = True
+    character.shield_timer = 180
+
+def coarse_step_check(frames=10, seeds=100, character_type="ninja", jump_every=60, max_frames=HEADLESS_MAX_FRAMES):
+    # Runs each seed in single steps and in steps of `frames`, jumping at the
+    # same step boundaries, with a shield from every coin; a coarse step must
+    # end the run at the same moment with the same score and coins
+    mismatched = 0
+    for seed in range(seeds):
+        endings = []
+        for step_frames in (1, frames):
+            run = GameRun("giza", character_type, effects=False, seed=seed)
+            run.character.on_coin_pickup = always_shield
+            while not run.over and run.game_time < max_frames:
+                if run.game_time % jump_every == 0:
+                    run.character.jump()
+                run.step(frames=step_frames)
+            endings.append((run.over, run.impact_time and round(run.impact_time, 6), run.score, run.coins_collected))
+        if endings[0] != endings[1]:
+            mismatched += 1
+            logger.error("Seed %d: single steps ended %s, steps of %d frames %s (over, impact frame, score, coins)",
+                         seed, endings[0], frames, endings[1])
+    logger.info("Coarse step check: %d of %d seeds end the same in steps of %d frames", seeds - mismatched, seeds, frames)
+    return mismatched == 0
+
+# --- Asset Bundle ---
+# bake-assets also writes every baked asset, plus the decoded samples of the
+# sound files, into one versioned file: a fixed header, the pixel and sample
+# data (each entry 64-byte aligned) and a JSON index at the end. At launch
+# the file is memory-mapped and surfaces are made straight over the mapped
+# bytes with pygame.image.frombuffer, so nothing is drawn or copied and every
+# game process on the machine shares the same pages. Assets with at most 256
+# colors (all of them, so far) are stored 8-bit with their own palette: a
+# quarter of the size, lossless, and a colorkeyed 8-bit blit needs no
+# converted copy (a run's background costs about 0.1 ms more a frame than
+# with converted RLE strips). Anything else is stored RGBX. The index records
+# a hash of this file and of the sounds, and a bundle baked from other code
+# or other sounds is ignored.
+ASSET_BUNDLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets.bundle")
+BUNDLE_MAGIC = b"CRBUNDLE"
+BUNDLE_VERSION = 1
+BUNDLE_HEADER = struct.Struct("<8sIQQ")  # magic, version, index offset, index size
+BUNDLE_ALIGN = 64
+BUNDLE_SOUNDS = ("jump.wav", "coin.wav", "lose.wav", "high_score.wav", "background.wav")
+asset_bundle = None
+
+def bundle_sound_path(filename):
+    # Sounds are bundled from beside the script, like the bundle itself, so
+    # baking or launching from another directory sees the same files
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+
+def asset_fingerprint():
+    # What a bundle is baked from: this file and whichever sounds exist
+    digest = hashlib.sha1()
+    with open(os.path.abspath(__file__), "rb") as source:
+        digest.update(source.read())
+    for filename in BUNDLE_SOUNDS:
+        if os.path.exists(bundle_sound_path(filename)):
+            with open(bundle_sound_path(filename), "rb") as sound:
+                digest.update(filename.encode() + sound.read())
+    return digest.hexdigest()
+
+def encode_surface(surface):
+    # (format, palette, pixels, colorkey) with the pixels row by row: 8-bit
+    # indices into the surface's own colors when it has few enough, else
+    # RGBX. An 8-bit colorkey is the key color's palette index, and None when
+    # no pixel has it: keying by color would snap to the nearest entry and
+    # make a real color transparent.
+    packed = pack_rgb(pygame.surfarray.array3d(surface).transpose(1, 0, 2))
+    values, inverse = np.unique(packed, return_inverse=True)
+    colorkey = surface.get_colorkey()
+    if len(values) <= PALETTE_SIZE:
+        palette = np.stack([(values >> 16) & 255, (values >> 8) & 255, values & 255], axis=1).astype(np.uint8)
+        key_index = None
+        if colorkey is not None:
+            found = np.flatnonzero(values == pack_rgb(colorkey[:3]))
+            key_index = int(found[0]) if len(found) else None
+        return "P", palette.tobytes(), inverse.reshape(-1).astype(np.uint8).tobytes(), key_index
+    return "RGBX", None, pygame.image.tostring(surface, "RGBX"), colorkey and tuple(colorkey)[:3]
+
+def write_asset_bundle(assets, path=ASSET_BUNDLE):
+    # assets are (name, surface, offset) as baked_assets() yields them; the
+    # bundle is written beside path and renamed over it when complete
+    index = {"fingerprint": asset_fingerprint(), "surfaces": {}, "sounds": {}}
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as bundle:
+        bundle.write(bytes(BUNDLE_HEADER.size))
+        
+        def append(data):
+            bundle.write(bytes(-bundle.tell() % BUNDLE_ALIGN))
+            at = bundle.tell()
+            bundle.write(data)
+            return at
+        
+        for name, surface, offset in assets:
+            pixel_format, palette, data, colorkey = encode_surface(surface)
+            # Palettes go with the pixels and entries are plain lists, so the
+            # index stays quick to parse at every launch: [pixels at, width,
+            # height, palette at or None for RGBX, colors, colorkey (palette
+            # index, RGB or None), offset x, offset y]
+            palette_at = append(palette) if pixel_format == "P" else None
+            pixels_at = append(data)
+            index["surfaces"][name] = [pixels_at, *surface.get_size(), palette_at, len(palette or b"") // 3,
+                                       colorkey, *offset]
+        for filename in BUNDLE_SOUNDS:
+            if not os.path.exists(bundle_sound_path(filename)):
+                continue
+            try:
+                with wave.open(bundle_sound_path(filename), "rb") as source:
+                    params = source.getparams()
+                    data = source.readframes(params.nframes)
+            except (wave.Error, EOFError) as error:
+                logger.warning("Not bundling %s: %s", filename, error)
+                continue
+            index["sounds"][filename] = {"at": append(data), "bytes": len(data), "rate": params.framerate,
+                                         "channels": params.nchannels, "width": params.sampwidth}
+        index_data = json.dumps(index).encode()
+        index_at = append(index_data)
+        bundle.seek(0)
+        bundle.write(BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, index_at, len(index_data)))
+    os.replace(temporary, path)
+    logger.info("Asset bundle %s: %d surfaces, %d sounds, %d KB", path, len(index["surfaces"]),
+                len(index["sounds"]), os.path.getsize(path) // 1024)
+
+class AssetBundle:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as source:
+            # A private mapping: the pages stay shared with every other
+            # process mapping the file unless something writes to them
+            self.map = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_COPY)
+        magic, version, index_at, index_size = BUNDLE_HEADER.unpack_from(self.map)
+        if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+            raise ValueError(f"{path} is not a version {BUNDLE_VERSION} asset bundle")
+        self.index = json.loads(self.map[index_at:index_at + index_size])
+        self.view = memoryview(self.map)
+        self.sprites = {}
+
+    def sprite(self, name):
+        # (surface, offset) over the mapped bytes, or None if name is not
+        # bundled. Surfaces are made on first use and shared by every caller.
+        sprite = self.sprites.get(name)
+        if sprite is not None:
+            return sprite
+        entry = self.index["surfaces"].get(name)
+        if entry is None:
+            return None
+        at, width, height, palette_at, colors, colorkey, dx, dy = entry
+        if palette_at is not None:
+            surface = pygame.image.frombuffer(self.view[at:at + width * height], (width, height), "P")
+            surface.set_palette(list(struct.iter_unpack("3B", self.view[palette_at:palette_at + colors * 3])))
+        else:
+            surface = pygame.image.frombuffer(self.view[at:at + width * height * 4], (width, height), "RGBX")
+        if colorkey is not None:
+            # A palette index on 8-bit surfaces, so it is the exact entry.
+            # Not RLE: that would re-encode the pixels into every process.
+            surface.set_colorkey(colorkey)
+        sprite = (surface, (dx, dy))
+        self.sprites[name] = sprite
+        return sprite
+
+    def sound(self, filename):
+        # The mixer copies samples into its own buffer, so sounds still cost
+        # memory per process; what the bundle saves is reading and decoding
+        # the file. None when the samples don't fit the mixer's format.
+        entry = self.index["sounds"].get(filename)
+        mixer = pygame.mixer.get_init()
+        if entry is None or mixer is None:
+            return None
+        rate, size, channels = mixer
+        if entry["rate"] != rate or entry["width"] != 2 or size != -16:
+            return None
+        samples = np.frombuffer(self.view[entry["at"]:entry["at"] + entry["bytes"]], dtype="<i2")
+        if entry["channels"] != channels:
+            if entry["channels"] != 1:
+                return None
+            samples = np.repeat(samples, channels)
+        return pygame.mixer.Sound(buffer=samples)
+
+def load_asset_bundle(path=ASSET_BUNDLE):
+    # Maps the bundle if there is a current one; without it everything is
+    # drawn from code as before
+    global asset_bundle
+    if not os.path.exists(path):
+        return None
+    start = time.perf_counter()
+    try:
+        bundle = AssetBundle(path)
+    except (OSError, ValueError, struct.error) as error:
+        logger.warning("Ignoring the asset bundle: %s", error)
+        return None
+    if bundle.index["fingerprint"] != asset_fingerprint():
+        logger.warning("%s was baked from other code or sounds; run bake-assets to refresh it", path)
+        return None
+    asset_bundle = bundle
+    logger.info("Mapped %s: %d surfaces, %d sounds in %.1f ms", path, len(bundle.index["surfaces"]),
+                len(bundle.index["sounds"]), (time.perf_counter() - start) * 1000)
+    return bundle
+
+def verify_asset_bundle(path=ASSET_BUNDLE, scrolls=(0, 517)):
+    # Draws every arena at both detail levels, with its obstacles and every
+    # character over the background, once from code and once from the
+    # bundle; the frames must match pixel for pixel
+    global asset_bundle
+    bundle = AssetBundle(path)
+    saved_bundle = asset_bundle
+    characters = []
+    for index, character in enumerate(CHARACTERS):
+        model = CartoonCharacter(x=60 + index * 90, y=GROUND_HEIGHT - 40)
+        model.character_type = character["type"]
+        model.run_animation_frame = index % 4
+        characters.append(model)
+    checked = 0
+    mismatched = 0
+    try:
+        for arena_type in ARENA_LAYERS:
+            obstacles = []
+            for index, (width, height, kind) in enumerate(chunk_library.obstacle_shapes()):
+                obstacle = Obstacle(0, arena_type, (width, height, kind, 0))
+                obstacle.x = 40 + index * 97 % (WIDTH - 100)
+                obstacles.append(obstacle)
+            for detail in (True, False):
+                for scroll in scrolls:
+                    frames = []
+                    for source in (None, bundle):
+                        asset_bundle = source
+                        surface_cache.clear("background")
+                        frame = pygame.Surface((WIDTH, HEIGHT)).convert()
+                        draw_background(arena_type, scroll, frame, detail)
+                        for sprite in obstacles + characters:
+                            sprite.draw(frame)
+                        frames.append(pygame.surfarray.array3d(frame))
+                    checked += 1
+                    differing = int((frames[0] != frames[1]).any(axis=2).sum())
+                    if differing:
+                        mismatched += 1
+                        logger.error("Bundle frame for %s (%s, scroll %d) differs from code in %d pixels", arena_type,
+                                     "detail" if detail else "simple", scroll, differing)
+    finally:
+        asset_bundle = saved_bundle
+        surface_cache.clear("background")
+    logger.info("Verified %s: %d of %d frames match the code", path, checked - mismatched, checked)
+    return mismatched == 0
+
+# --- Asset Baking ---
+# Everything drawn from code that can be rendered ahead of time: the parallax
+# layers of every arena at both detail levels, each character's running
+# frames and the look of every obstacle the chunk library can spawn.
+def background_asset_name(arena_type, detail, index):
+    return f"background/{arena_type}/{'detail' if detail else 'simple'}/{index}"
+
+def character_asset_name(character_type, leg_frame):
+    return f"character/{character_type}/{leg_frame}"
+
+def obstacle_asset_name(arena_type, kind, width, height):
+    return f"obstacle/{arena_type}/{kind}_{width}x{height}"
+
+def baked_assets():
+    # (name, surface, offset) for every asset, rendered the way the game
+    # renders it; offset is where the surface's top left sits relative to
+    # the layer, sprite or obstacle origin
+    for arena_type in ARENA_LAYERS:
+        for detail in (True, False):
+            for index, layer in enumerate(get_parallax_layers(arena_type, detail)):
+                yield background_asset_name(arena_type, detail, index), layer.strip, (0, layer.y)
+    for character in CHARACTERS:
+        for leg_frame in range(4):
+            image, offset = render_sprite(get_character_display_list(character["type"], leg_frame), (120, 140), (60, 70))
+            yield character_asset_name(character["type"], leg_frame), image, offset
+    for arena_type in ARENA_LAYERS:
+        for width, height, kind in chunk_library.obstacle_shapes():
+            model = Obstacle(0, arena_type, (width, height, kind, 0))
+            image, offset = render_sprite(get_obstacle_display_list(model), (width + 40, height + 40), (20, 20))
+            yield obstacle_asset_name(arena_type, kind, width, height), image, offset
+
+def bake_assets(directory=None, bundle=ASSET_BUNDLE):
+    # Renders every asset and reports what that costs. They are written to
+    # the asset bundle, and with a directory each one is also written out
+    # as a PNG for review.
+    start = time.perf_counter()
+    count = 0
+    total = 0
+    
+    def assets():
+        nonlocal count, total
+        for name, surface, offset in baked_assets():
+            count += 1
+            total += cache_bytes(surface)
+            if directory is not None:
+                path = os.path.join(directory, name + ".png")
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                pygame.image.save(surface, path)
+            yield name, surface, offset
+    
+    if bundle is not None:
+        write_asset_bundle(assets(), bundle)
+    else:
+        for _ in assets():
+            pass
+    written = [target for target in (bundle, directory) if target is not None]
+    logger.info("Baked %d assets (%d KB of pixels) in %.0f ms%s", count, total // 1024,
+                (time.perf_counter() - start) * 1000, ", written to " + " and ".join(written) if written else "")
+    return count
+
+# --- Command Line ---
+# Each command brings up only the pygame subsystems it uses: play opens the
+# window and the mixer, bake-assets a hidden window for convert(), and
+# headless, bench and replay --verify neither. With no command, or only
+# options, the game is played.
+COMMANDS = ("play", "headless", "bench", "soak", "replay", "bake-assets")
+
+def render_scale_arg(value):
+    scale = float(value)
+    if not 0 < scale <= 2:
+        raise argparse.ArgumentTypeError("must be above 0 and at most 2")
+    return scale
+
+def command_line(argv=None):
+    global palettized
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] not in COMMANDS + ("-h", "--help"):
+        argv = ["play"] + argv
+    characters = [character["type"] for character in CHARACTERS]
+    parser = argparse.ArgumentParser(prog="stickruncode.py", description="City Runner")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    play = commands.add_parser("play", help="play the game (the default)")
+    play.add_argument("--arena", choices=list(ARENA_LAYERS), help="go straight into a run in this arena")
+    play.add_argument("--character", choices=characters, help="go straight into a run as this character")
+    play.add_argument("--fps", type=int, choices=TARGET_FPS, default=FPS, help="display rate")
+    play.add_argument("--render-scale", type=render_scale_arg, metavar="SCALE",
+                      help="draw the world at this scale at every quality tier")
+    play.add_argument("--pacing", choices=STRATEGIES, default=pacer.strategy, help="how the frame pacer waits")
+    play.add_argument("--palettized", action="store_true", help="draw runs in 8-bit with a palette per arena")
+    play.add_argument("--fullscreen", action="store_true")
+    play.add_argument("--capture", nargs="?", const="capture", metavar="DIR", help="record every frame of every run")
+    play.add_argument("--capture-png", action="store_true", help="capture PNG images instead of raw frames")
+    play.add_argument("--autopilot", action="store_true", help="let the autopilot play the runs")
+    play.add_argument("--latency", action="store_true", help="measure jump press to display latency")
+    play.add_argument("--pipelined", action="store_true", help="draw frames on a separate render thread")
+    play.add_argument("--no-bundle", action="store_true", help="draw every asset from code, ignoring the asset bundle")
+    
+    headless = commands.add_parser("headless", help="simulate autopilot runs without a window or sound")
+    headless.add_argument("--seed", type=int, help="seed of the first run; later runs count up from it")
+    headless.add_argument("--runs", type=int, default=1)
+    headless.add_argument("--arena", choices=list(ARENA_LAYERS), default="giza")
+    headless.add_argument("--character", choices=characters, default="default")
+    headless.add_argument("--max-frames", type=int, default=HEADLESS_MAX_FRAMES,
+                          help="stop runs the autopilot is still surviving after this many frames")
+    headless.add_argument("--replays", metavar="DIR", help="save a replay of every run here")
+    headless.add_argument("--coarse-check", action="store_true",
+                          help="check that runs simulated several frames per step end as in single steps")
+    
+    bench = commands.add_parser("bench", help="simulation throughput against the stored baseline")
+    bench.add_argument("--ticks", type=int, default=10000, help="ticks per scenario")
+    bench.add_argument("--update", action="store_true", help="record a new baseline instead of comparing")
+    bench.add_argument("--pipeline", action="store_true", help="benchmark the pipelined renderer instead (opens a window)")
+    
+    soak = commands.add_parser("soak", help="autopilot runs through every screen while watching memory")
+    soak.add_argument("--duration", type=float, help="seconds to run (default: until the window is closed)")
+    soak.add_argument("--snapshot-interval", type=float, default=60, metavar="SECONDS",
+                      help="seconds between memory snapshots; the first two are warm-up and two more are needed")
+    soak.add_argument("--no-bundle", action="store_true", help="draw every asset from code, ignoring the asset bundle")
+    
+    replay = commands.add_parser("replay", help="watch a saved replay")
+    replay.add_argument("file")
+    replay.add_argument("--verify", action="store_true", help="re-simulate without a window and check it ends as recorded")
+    replay.add_argument("--no-bundle", action="store_true", help="draw every asset from code, ignoring the asset bundle")
+    
+    bake = commands.add_parser("bake-assets", help="render every background, character frame and obstacle look")
+    bake.add_argument("--out", metavar="DIR", help="also write them out as PNG images")
+    bake.add_argument("--bundle", default=ASSET_BUNDLE, metavar="FILE", help="where to write the asset bundle")
+    
+    args = parser.parse_args(argv)
+    chunk_library.start()
+    
+    if args.command == "headless":
+        if args.coarse_check:
+            return 0 if coarse_step_check(character_type=args.character) else 1
+        headless_runs(args.runs, args.seed, args.arena, args.character, args.max_frames, args.replays)
+        return 0
+    if args.command == "bench":
+        if args.pipeline:
+            init_video()
+            pipeline_benchmark()
+            return 0
+        return 0 if simulation_benchmark(args.ticks, update=args.update) else 1
+    if args.command == "replay":
+        try:
+            replay = load_replay(args.file)
+        except (OSError, ValueError) as error:
+            logger.error("Cannot load replay: %s", error)
+            return 1
+        if args.verify:
+            return 0 if verify_replay(replay) else 1
+        init_video()
+        if not args.no_bundle:
+            load_asset_bundle()
+        init_audio()
+        watch_replay(replay)
+        return 0
+    if args.command == "bake-assets":
+        init_video(hidden=True)
+        bake_assets(args.out, args.bundle)
+        return 0 if verify_asset_bundle(args.bundle) else 1
+    
+    init_video()
+    if not args.no_bundle:
+        load_asset_bundle()
+    init_audio()
+    if args.command == "soak":
+        return 0 if soak_test(args.duration, args.snapshot_interval) else 1
+    
+    set_target_fps(args.fps)
+    pacer.strategy = args.pacing
+    palettized = args.palettized
+    if args.render_scale is not None:
+        # The governor still sheds clouds, detail and weather, never resolution
+        for tier in QUALITY_TIERS:
+            tier["render_scale"] = args.render_scale
+    if args.fullscreen:
+        toggle_fullscreen()
+    capture = None
+    if args.capture is not None:
+        capture = FrameCapture(args.capture, "png" if args.capture_png else "raw")
+    renderer = None
+    if args.pipelined:
+        if (os.cpu_count() or 1) < 2:
+            logger.warning("--pipelined on a single core: the render thread can only slow things down")
+        renderer = PipelinedRenderer()
+    main(Autopilot() if args.autopilot else None, capture, LatencyProbe() if args.latency else None, renderer,
+         args.arena, args.character)
+    return 0
+
 if __name__ == "__main__":
-    main()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    sys.exit(command_line())